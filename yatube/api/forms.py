@@ -0,0 +1,10 @@
+from django import forms
+
+from posts.forms import PostForm
+from posts.models import Group
+
+
+class ApiPostForm(PostForm):
+    # В API группа задаётся адресом (slug), как и отдаётся в ответах
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(), to_field_name='slug', required=False)
@@ -0,0 +1,83 @@
+"""Сборка JSON-ответов API без экземпляров моделей.
+
+Строки читаются через `.values()` только с запрошенными колонками
+(`?fields=id,text`), а словари ответа собираются вручную: ни моделей,
+ни сериализатора на каждый объект.
+"""
+from posts.models import Post
+
+
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+}
+
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+USER_FIELDS = {
+    'id': 'id',
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def _image_url(name):
+    return Post.image.field.storage.url(name) if name else None
+
+
+CONVERTERS = {
+    'pub_date': lambda value: value.isoformat(),
+    'created': lambda value: value.isoformat(),
+    'image': _image_url,
+}
+
+
+def requested_fields(request, available):
+    """Поля из ?fields= в порядке запроса; без параметра — все."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    fields = list(dict.fromkeys(
+        field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in available]
+    if unknown or not fields:
+        raise FieldsError(
+            f'Неизвестные поля: {", ".join(unknown) or raw}. '
+            f'Доступны: {", ".join(available)}.')
+    return fields
+
+
+def values(queryset, mapping, fields, extra=()):
+    """Запрос .values() только с колонками для `fields` и ключами `extra`."""
+    paths = [mapping[field] for field in fields]
+    return queryset.values(*dict.fromkeys(paths + list(extra)))
+
+
+def serialize(row, mapping, fields):
+    result = {}
+    for field in fields:
+        value = row[mapping[field]]
+        convert = CONVERTERS.get(field)
+        if convert is not None and value is not None:
+            value = convert(value)
+        result[field] = value
+    return result
@@ -0,0 +1,275 @@
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.test_thumbnails import jpeg
+
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(API_PAGE_SIZE=2)
+class ApiReadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='test-group', slug='test-slug')
+        cls.posts = [
+            Post.objects.create(
+                text=f'test-post {index}', author=cls.user,
+                group=cls.group if index % 2 else None)
+            for index in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='test-comment')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def collect(self, client, url):
+        # Пройти ленту по ссылкам `next` до конца
+        ids = []
+        while url:
+            data = client.get(url).json()
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+        return ids
+
+    def test_index_pages(self):
+        ids = self.collect(self.guest_client, reverse('api:post_list'))
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+
+    def test_previous_link(self):
+        first = self.guest_client.get(reverse('api:post_list')).json()
+        second = self.guest_client.get(first['next']).json()
+        self.assertIsNone(first['previous'])
+        back = self.guest_client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_post_fields(self):
+        post = self.posts[0]
+        response = self.guest_client.get(
+            reverse('api:post_detail', kwargs={'post_id': post.pk}))
+        self.assertEqual(response.json(), {
+            'id': post.pk,
+            'text': post.text,
+            'pub_date': post.pub_date.isoformat(),
+            'author': 'test-user',
+            'group': None,
+            'image': None,
+            'comment_count': 1,
+        })
+
+    def test_sparse_fields(self):
+        response = self.guest_client.get(
+            reverse('api:post_list'), {'fields': 'text,id'})
+        self.assertEqual(
+            list(response.json()['results'][0]), ['text', 'id'])
+
+        response = self.guest_client.get(
+            reverse('api:post_list'), {'fields': 'text,password'})
+        self.assertEqual(response.status_code, 400)
+
+    # Лента читается одним запросом без экземпляров моделей
+    def test_feed_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.guest_client.get(reverse('api:post_list'))
+
+    def test_group_and_user_feeds(self):
+        urls = {
+            reverse('api:group_posts', kwargs={'slug': 'test-slug'}): [
+                post.pk for post in reversed(self.posts) if post.group],
+            reverse('api:user_posts', kwargs={'username': 'test-user'}): [
+                post.pk for post in reversed(self.posts)],
+            reverse('api:user_posts', kwargs={'username': 'reader'}): [],
+        }
+        for url, expected in urls.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.collect(self.guest_client, url), expected)
+
+    def test_comments(self):
+        response = self.guest_client.get(reverse(
+            'api:comment_list', kwargs={'post_id': self.posts[0].pk}))
+        self.assertEqual(
+            [(item['author'], item['text'])
+             for item in response.json()['results']],
+            [('reader', 'test-comment')])
+
+    def test_user_detail(self):
+        Follow.objects.create(user=self.reader, author=self.user)
+        url = reverse('api:user_detail', kwargs={'username': 'test-user'})
+        data = self.authorized_client.get(url).json()
+        self.assertEqual(data['posts_count'], 5)
+        self.assertEqual(data['followers_count'], 1)
+        self.assertTrue(data['following'])
+        self.assertFalse(self.guest_client.get(url).json()['following'])
+
+    def test_follow_feed(self):
+        url = reverse('api:follow_feed')
+        self.assertEqual(self.guest_client.get(url).status_code, 401)
+        self.assertEqual(self.collect(self.authorized_client, url), [])
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(
+            self.collect(self.authorized_client, url),
+            [post.pk for post in reversed(self.posts)])
+
+    def test_etag(self):
+        url = reverse('api:post_list')
+        response = self.guest_client.get(url)
+        etag = response['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Post.objects.create(text='new-post', author=self.user)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_found(self):
+        urls = (
+            reverse('api:post_detail', kwargs={'post_id': 404}),
+            reverse('api:group_posts', kwargs={'slug': 'unknown'}),
+            reverse('api:user_detail', kwargs={'username': 'unknown'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', response.json())
+
+    def test_bad_parameters(self):
+        url = reverse('api:post_list')
+        for params in ({'limit': 0}, {'limit': 'x'}, {'limit': 101}):
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.guest_client.get(url, params).status_code, 400)
+        # Испорченный курсор — первая страница
+        response = self.guest_client.get(url, {'after': '!!!'})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ApiWriteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='test-group', slug='test-slug')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def send(self, method, url, data, client=None):
+        client = client or self.authorized_client
+        return getattr(client, method)(
+            url, json.dumps(data), content_type='application/json')
+
+    def test_writes_need_login(self):
+        response = self.send(
+            'post', reverse('api:post_list'), {'text': 'test'},
+            client=self.guest_client)
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Post.objects.exists())
+
+    def test_create_post(self):
+        response = self.send(
+            'post', reverse('api:post_list'),
+            {'text': 'test-post', 'group': 'test-slug'})
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get()
+        self.assertEqual(response.json()['id'], post.pk)
+        self.assertEqual(response.json()['group'], 'test-slug')
+        self.assertEqual((post.author, post.group), (self.user, self.group))
+        self.assertEqual(response['Location'], reverse(
+            'api:post_detail', kwargs={'post_id': post.pk}))
+
+    def test_create_post_with_image(self):
+        response = self.authorized_client.post(
+            reverse('api:post_list'), {'text': 'test', 'image': jpeg()})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json()['image'], Post.objects.get().image.url)
+
+    def test_invalid_post(self):
+        response = self.send(
+            'post', reverse('api:post_list'), {'group': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            set(response.json()['errors']), {'text', 'group'})
+
+        response = self.authorized_client.post(
+            reverse('api:post_list'), '[1', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_edit_post(self):
+        post = Post.objects.create(
+            text='test-post', author=self.user, group=self.group)
+        url = reverse('api:post_detail', kwargs={'post_id': post.pk})
+        response = self.send('patch', url, {'text': 'edited'})
+        self.assertEqual(response.json()['text'], 'edited')
+        self.assertEqual(response.json()['group'], 'test-slug')
+
+        response = self.send('patch', url, {'group': None})
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.group), ('edited', None))
+
+    def test_edit_foreign_post(self):
+        post = Post.objects.create(text='test-post', author=self.author)
+        response = self.send(
+            'patch', reverse('api:post_detail', kwargs={'post_id': post.pk}),
+            {'text': 'edited'})
+        self.assertEqual(response.status_code, 403)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'test-post')
+
+    def test_add_comment(self):
+        post = Post.objects.create(text='test-post', author=self.author)
+        response = self.send(
+            'post', reverse('api:comment_list', kwargs={'post_id': post.pk}),
+            {'text': 'test-comment'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['author'], 'test-user')
+        self.assertEqual(post.comments.get().text, 'test-comment')
+
+    def test_follow_and_unfollow(self):
+        url = reverse('api:follow', kwargs={'username': 'author'})
+        self.assertEqual(self.authorized_client.post(url).status_code, 201)
+        self.assertEqual(self.authorized_client.post(url).status_code, 200)
+        self.assertTrue(Follow.objects.filter(
+            user=self.user, author=self.author).exists())
+
+        response = self.authorized_client.delete(url)
+        self.assertEqual(response.json(), {'following': False})
+        self.assertFalse(Follow.objects.exists())
+
+        response = self.authorized_client.post(
+            reverse('api:follow', kwargs={'username': 'test-user'}))
+        self.assertEqual(response.status_code, 400)
+
+    def test_method_not_allowed(self):
+        response = self.authorized_client.delete(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET, POST')
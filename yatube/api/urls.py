@@ -0,0 +1,18 @@
+from django.urls import path
+from . import views
+
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.post_list, name='post_list'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comment_list, name='comment_list'),
+    path('groups/<slug:slug>/posts/', views.group_posts, name='group_posts'),
+    path('follow/', views.follow_feed, name='follow_feed'),
+    path('users/<str:username>/', views.user_detail, name='user_detail'),
+    path('users/<str:username>/posts/', views.user_posts, name='user_posts'),
+    path('users/<str:username>/follow/', views.follow, name='follow'),
+]
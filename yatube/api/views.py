@@ -0,0 +1,296 @@
+"""JSON API лент, записей, комментариев и подписок.
+
+Чтение повторяет страницы приложения posts, но без шаблонов: строки
+берутся через `.values()` (api/serializers.py), ленты листаются курсорами
+`?after=`/`?before=` и кэшируются теми же поколениями, что и страницы.
+GET-ответы получают ETag, повтор с If-None-Match получает 304.
+Запись — от имени пользователя сессии сайта с CSRF-токеном; тело — JSON
+или multipart (для картинки новой записи).
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, set_response_etag
+
+from posts.counters import user_stats
+from posts.feed_cache import cache_feed, group_scope
+from posts.forms import CommentForm
+from posts.models import Comment, Follow, Group, Post
+from posts.paginators import KeysetPaginator
+from posts.timeline import feed_for
+from posts.uploads import bounded_uploads
+
+from .forms import ApiPostForm
+from .serializers import (
+    COMMENT_FIELDS, POST_FIELDS, USER_FIELDS, FieldsError, requested_fields,
+    serialize, values)
+
+
+User = get_user_model()
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data, status=status,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def error(status, detail, **extra):
+    return json_response({'detail': detail, **extra}, status=status)
+
+
+def _call(view, request, *args, **kwargs):
+    try:
+        return view(request, *args, **kwargs)
+    except ApiError as exc:
+        return error(exc.status, exc.detail)
+    except FieldsError as exc:
+        return error(400, str(exc))
+    except Http404:
+        return error(404, 'Не найдено.')
+    except PermissionDenied:
+        return error(403, 'Недостаточно прав.')
+
+
+def _conditional(request, response):
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    set_response_etag(response)
+    return get_conditional_response(
+        request, etag=response['ETag'], response=response)
+
+
+def api_view(*methods, login=False):
+    """Обёртка представления API.
+
+    Проверяет метод и вход (для записи или всегда при `login`), отдаёт
+    ошибки в JSON и ставит ETag на успешные GET-ответы.
+    """
+    allowed = set(methods) | ({'HEAD'} if 'GET' in methods else set())
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in allowed:
+                response = error(405, 'Метод не разрешён.')
+                response['Allow'] = ', '.join(methods)
+                return response
+            if ((login or request.method in WRITE_METHODS)
+                    and not request.user.is_authenticated):
+                return error(401, 'Нужно войти.')
+            return _conditional(
+                request, _call(view, request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def payload(request):
+    """Данные и файлы запроса на запись: JSON-объект или форма."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'Тело запроса — не JSON.')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'Ожидается JSON-объект.')
+        return data, None
+    if request.method != 'POST':
+        raise ApiError(415, 'Ожидается application/json.')
+    return request.POST, request.FILES
+
+
+def invalid(form):
+    return error(
+        400, 'Данные не прошли проверку.', errors=form.errors.get_json_data())
+
+
+def page_size(request):
+    limit = request.GET.get('limit')
+    if limit is None:
+        return settings.API_PAGE_SIZE
+    if not limit.isdigit() or not (
+            1 <= int(limit) <= settings.API_MAX_PAGE_SIZE):
+        raise ApiError(
+            400, f'limit — число от 1 до {settings.API_MAX_PAGE_SIZE}.')
+    return int(limit)
+
+
+def link(request, name, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params[name] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+def page(request, queryset, mapping, keys=('pub_date', 'id')):
+    """Страница ленты: `results` и ссылки `next`/`previous` с курсорами."""
+    fields = requested_fields(request, mapping)
+    paginator = KeysetPaginator(
+        values(queryset, mapping, fields, keys), page_size(request), keys)
+    current = paginator.get_page(
+        after=request.GET.get('after'), before=request.GET.get('before'))
+    return json_response({
+        'results': [serialize(row, mapping, fields) for row in current],
+        'next': link(request, 'after', current.next_cursor),
+        'previous': link(request, 'before', current.previous_cursor),
+    })
+
+
+def one(request, queryset, mapping):
+    fields = requested_fields(request, mapping)
+    row = values(queryset, mapping, fields).first()
+    if row is None:
+        raise Http404
+    return serialize(row, mapping, fields)
+
+
+def created(request, data, location):
+    response = json_response(data, status=201)
+    response['Location'] = location
+    return response
+
+
+@api_view('GET', 'POST')
+@bounded_uploads
+@cache_feed('index')
+def post_list(request):
+    if request.method == 'POST':
+        return create_post(request)
+    return page(request, Post.objects.all(), POST_FIELDS)
+
+
+def create_post(request):
+    data, files = payload(request)
+    form = ApiPostForm(
+        data, files=files, upload_errors=request.upload_errors)
+    if not form.is_valid():
+        return invalid(form)
+    post = form.save(commit=False)
+    post.author = request.user
+    post.save()
+    return created(
+        request, one(request, Post.objects.filter(pk=post.pk), POST_FIELDS),
+        reverse('api:post_detail', kwargs={'post_id': post.pk}))
+
+
+@api_view('GET', 'PATCH')
+def post_detail(request, post_id):
+    if request.method == 'PATCH':
+        return edit_post(request, post_id)
+    return json_response(
+        one(request, Post.objects.filter(pk=post_id), POST_FIELDS))
+
+
+def edit_post(request, post_id):
+    post = get_object_or_404(Post.objects.select_related('group'), pk=post_id)
+    if post.author_id != request.user.pk:
+        raise PermissionDenied
+    data, _ = payload(request)
+    # PATCH меняет только переданные поля
+    current = {'text': post.text, 'group': post.group and post.group.slug}
+    form = ApiPostForm({**current, **data}, instance=post)
+    if not form.is_valid():
+        return invalid(form)
+    form.save()
+    return json_response(
+        one(request, Post.objects.filter(pk=post.pk), POST_FIELDS))
+
+
+@api_view('GET')
+@cache_feed(group_scope)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return page(request, Post.objects.filter(group=group), POST_FIELDS)
+
+
+@api_view('GET', 'POST')
+def comment_list(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.method == 'GET':
+        return page(
+            request, post.comments.all(), COMMENT_FIELDS,
+            keys=('created', 'id'))
+
+    data, _ = payload(request)
+    form = CommentForm(data)
+    if not form.is_valid():
+        return invalid(form)
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post = post
+    comment.save()
+    return created(
+        request,
+        one(request, Comment.objects.filter(pk=comment.pk), COMMENT_FIELDS),
+        reverse('api:comment_list', kwargs={'post_id': post.pk}))
+
+
+@api_view('GET')
+def user_detail(request, username):
+    fields = requested_fields(request, [*USER_FIELDS, 'following'])
+    columns = [field for field in fields if field in USER_FIELDS]
+    row = values(
+        User.objects.filter(username=username), USER_FIELDS, columns,
+        extra=['id', 'stats__posts_count']).first()
+    if row is None:
+        raise Http404
+    if row['stats__posts_count'] is None:
+        # Строки счётчиков ещё нет: user_stats пересчитает её
+        stats = user_stats(User(pk=row['id']))
+        for field, path in USER_FIELDS.items():
+            if path.startswith('stats__'):
+                row[path] = getattr(stats, path[len('stats__'):])
+
+    data = serialize(row, USER_FIELDS, columns)
+    if 'following' in fields:
+        data['following'] = request.user.is_authenticated and (
+            Follow.objects.filter(
+                user=request.user, author_id=row['id']).exists())
+    return json_response(data)
+
+
+@api_view('GET')
+def user_posts(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return page(request, Post.objects.filter(author=author), POST_FIELDS)
+
+
+@api_view('GET', login=True)
+def follow_feed(request):
+    return page(
+        request, feed_for(request.user), POST_FIELDS,
+        keys=('feed_date', 'feed_id'))
+
+
+@api_view('POST', 'DELETE')
+def follow(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    if author == request.user:
+        raise ApiError(400, 'Нельзя подписаться на самого себя.')
+
+    if request.method == 'POST':
+        _, is_new = Follow.objects.get_or_create(
+            author=author, user=request.user)
+        return json_response(
+            {'following': True}, status=201 if is_new else 200)
+
+    Follow.objects.filter(author=author, user=request.user).delete()
+    return json_response({'following': False})
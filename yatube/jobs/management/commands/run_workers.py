@@ -0,0 +1,94 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs import queue
+
+
+def work(stop, batch_size, poll_interval, once=False):
+    """Цикл воркера: выполнять задачи, пока не выставлен `stop`."""
+    pruned = 0
+    while not stop.is_set():
+        taken = queue.run_pending(batch_size)
+        close_old_connections()
+        if taken:
+            continue
+        if once:
+            return
+        if time.monotonic() - pruned > settings.TASKS_PRUNE_INTERVAL:
+            queue.prune()
+            pruned = time.monotonic()
+        stop.wait(poll_interval)
+
+
+def _child(stop, batch_size, poll_interval):
+    # Останавливает родитель через `stop`; Ctrl+C в терминале получает
+    # вся группа процессов
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    work(stop, batch_size, poll_interval)
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает процессы, выполняющие отложенные задачи из очереди '
+        'jobs (счётчики, ленты подписок, поиск, картинки).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.TASKS_WORKERS)
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TASKS_BATCH_SIZE,
+            help='Сколько задач воркер берёт за раз.')
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.TASKS_POLL_INTERVAL,
+            help='Пауза между проверками пустой очереди, секунд.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи в этом процессе и выйти.')
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        if options['once']:
+            work(stop, options['batch_size'], options['poll_interval'],
+                 once=True)
+            return
+
+        # Дочерние процессы не должны делить соединения родителя
+        connections.close_all()
+        processes = [
+            context.Process(
+                target=_child, name=f'jobs-worker-{number}',
+                args=(stop, options['batch_size'], options['poll_interval']))
+            for number in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Запущено воркеров: {len(processes)}')
+
+        # Обработчик только ставит флаг: stop.set() внутри stop.wait()
+        # ждал бы блокировку, которую держит сам этот поток
+        stopping = []
+
+        def shutdown(signum, frame):
+            stopping.append(signum)
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+        try:
+            while not stopping and all(
+                    process.is_alive() for process in processes):
+                time.sleep(0.5)
+        finally:
+            # Текущие задачи доделываются, новые не берутся
+            stop.set()
+            for process in processes:
+                process.join()
+        self.stdout.write('Воркеры остановлены')
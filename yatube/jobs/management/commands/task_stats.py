@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jobs import queue
+
+
+def _ms(value):
+    return '—' if value is None else f'{value * 1000:.0f}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает по каждой задаче очереди число выполненных, упавших и '
+        'ждущих вызовов и задержки: ожидание в очереди и выполнение, мс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutes', type=int, default=60,
+            help='За какой период учитывать завершённые задачи.')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(minutes=options['minutes'])
+        self.stdout.write(
+            'задача\tвыполнено\tупало\tждёт\t'
+            'ожидание p50/p95\tвыполнение p50/p95')
+        for name, item in sorted(queue.stats(since).items()):
+            self.stdout.write(
+                f"{name}\t{item['done']}\t{item['failed']}\t"
+                f"{item['pending']}\t"
+                f"{_ms(item['wait_p50'])}/{_ms(item['wait_p95'])}\t"
+                f"{_ms(item['run_p50'])}/{_ms(item['run_p95'])}")
@@ -0,0 +1,207 @@
+"""Очередь отложенных задач в базе данных.
+
+Задача — функция, объявленная декоратором `task` в модуле tasks.py
+приложения. `enqueue` записывает её вызов в таблицу Job в той же
+транзакции, что и изменения запроса (откат транзакции отменяет и задачу),
+а выполняют задачи процессы `manage.py run_workers`. При TASKS_EAGER
+задача выполняется сразу в вызывающем потоке, кроме задач с eager=False.
+
+* Ключ идемпотентности склеивает одинаковые ещё не начатые задачи:
+  пять комментариев подряд переиндексируют запись один раз.
+* Воркер берёт задачу в аренду на TASKS_LEASE секунд; задачу упавшего
+  воркера после этого берёт другой.
+* Задача с atomic=True выполняется в одной транзакции с отметкой о
+  выполнении: повтор после сбоя не применит её изменения дважды.
+* Упавшая задача повторяется с экспоненциальной паузой, после
+  TASKS_MAX_ATTEMPTS попыток остаётся в статусе failed.
+* По времени постановки, начала и конца считаются задержки (`stats`).
+"""
+import json
+import logging
+import statistics
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(atomic=False, max_attempts=None, eager=True):
+    """Объявить функцию задачей очереди.
+
+    atomic — выполнять в одной транзакции с отметкой о выполнении (для
+    задач, которые только пишут в базу); max_attempts — вместо
+    TASKS_MAX_ATTEMPTS; eager=False — ставить в очередь и при
+    TASKS_EAGER (работа, которой не место в запросе).
+    """
+    def decorator(function):
+        function.task_name = f'{function.__module__}.{function.__qualname__}'
+        function.atomic = atomic
+        function.max_attempts = max_attempts
+        function.eager = eager
+        _registry[function.task_name] = function
+        return function
+    return decorator
+
+
+def enqueue(function, *args, key=None, delay=0):
+    """Поставить вызов `function(*args)` в очередь.
+
+    Аргументы должны сериализоваться в JSON. Если ждущая задача с ключом
+    `key` уже есть, новая не добавляется.
+    """
+    if settings.TASKS_EAGER and function.eager:
+        function(*args)
+        return
+    Job.objects.bulk_create([Job(
+        name=function.task_name, args=json.dumps(args), key=key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )], ignore_conflicts=True)
+
+
+def claim(limit, names=None):
+    """Взять в аренду до `limit` готовых задач, при `names` — только их."""
+    now = timezone.now()
+    ready = (Q(status=Job.PENDING, run_at__lte=now)
+             | Q(status=Job.RUNNING, locked_until__lt=now))
+    if names is not None:
+        ready &= Q(name__in=names)
+    ids = list(Job.objects.filter(ready).order_by(
+        'run_at', 'pk').values_list('pk', flat=True)[:limit])
+    if not ids:
+        return []
+    lease = uuid.uuid4().hex
+    # Условие повторяется в UPDATE: задачу, которую успел взять другой
+    # воркер, этот уже не получит
+    Job.objects.filter(ready, pk__in=ids).update(
+        status=Job.RUNNING, lease=lease, started=now,
+        locked_until=now + timedelta(seconds=settings.TASKS_LEASE),
+        attempts=F('attempts') + 1)
+    return list(Job.objects.filter(lease=lease).order_by('run_at', 'pk'))
+
+
+class LeaseLost(Exception):
+    """Аренда истекла, и задачу взял другой воркер."""
+
+
+def _finish(job):
+    updated = Job.objects.filter(
+        pk=job.pk, lease=job.lease, status=Job.RUNNING).update(
+        status=Job.DONE, finished=timezone.now(), error='')
+    if not updated:
+        raise LeaseLost(job.pk)
+
+
+def _retry(job, error):
+    function = _registry.get(job.name)
+    max_attempts = (
+        getattr(function, 'max_attempts', None)
+        or settings.TASKS_MAX_ATTEMPTS)
+    mine = Job.objects.filter(pk=job.pk, lease=job.lease, status=Job.RUNNING)
+    if job.attempts >= max_attempts:
+        mine.update(
+            status=Job.FAILED, finished=timezone.now(), error=error,
+            lease='')
+        return
+    delay = min(
+        settings.TASKS_RETRY_DELAY * 2 ** (job.attempts - 1),
+        settings.TASKS_MAX_RETRY_DELAY)
+    try:
+        mine.update(
+            status=Job.PENDING, error=error, lease='',
+            run_at=timezone.now() + timedelta(seconds=delay))
+    except IntegrityError:
+        # Уже ждёт задача с тем же ключом: она и сделает эту работу
+        mine.delete()
+
+
+def execute(job):
+    """Выполнить взятую задачу; True, если она завершилась успешно."""
+    function = _registry.get(job.name)
+    try:
+        if function is None:
+            raise LookupError(f'Неизвестная задача {job.name}')
+        args = json.loads(job.args)
+        if function.atomic:
+            with transaction.atomic():
+                function(*args)
+                _finish(job)
+        else:
+            function(*args)
+            _finish(job)
+    except LeaseLost:
+        logger.warning('Задачу %s взял другой воркер', job)
+        return False
+    except Exception:
+        logger.exception('Задача %s завершилась ошибкой', job)
+        _retry(job, traceback.format_exc())
+        return False
+    return True
+
+
+def run_pending(limit, names=None):
+    """Выполнить до `limit` готовых задач; вернуть число взятых."""
+    jobs = claim(limit, names)
+    for job in jobs:
+        execute(job)
+    return len(jobs)
+
+
+def prune():
+    """Удалить выполненные задачи старше TASKS_KEEP_DONE секунд."""
+    border = timezone.now() - timedelta(seconds=settings.TASKS_KEEP_DONE)
+    return Job.objects.filter(
+        status=Job.DONE, finished__lt=border).delete()[0]
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return None, None
+    return (statistics.median(values),
+            values[max(int(len(values) * 0.95) - 1, 0)])
+
+
+def stats(since=None):
+    """Задержки задач по именам: ожидание в очереди и выполнение, секунды.
+
+    Возвращает `{name: {'done', 'failed', 'pending', 'wait_p50',
+    'wait_p95', 'run_p50', 'run_p95'}}` по задачам, завершённым после
+    `since`, и всем ждущим.
+    """
+    finished = Job.objects.filter(status__in=[Job.DONE, Job.FAILED])
+    if since is not None:
+        finished = finished.filter(finished__gte=since)
+    result = {}
+
+    def entry(name):
+        return result.setdefault(name, {
+            'done': 0, 'failed': 0, 'pending': 0, 'waits': [], 'runs': []})
+
+    rows = finished.values_list(
+        'name', 'status', 'created', 'started', 'finished')
+    for name, status, created, started, ended in rows.iterator():
+        item = entry(name)
+        item[status] += 1
+        if status == Job.DONE:
+            item['waits'].append((started - created).total_seconds())
+            item['runs'].append((ended - started).total_seconds())
+    waiting = Job.objects.filter(
+        status__in=[Job.PENDING, Job.RUNNING]).values_list('name', flat=True)
+    for name in waiting.iterator():
+        entry(name)['pending'] += 1
+
+    for item in result.values():
+        item['wait_p50'], item['wait_p95'] = _percentiles(item.pop('waits'))
+        item['run_p50'], item['run_p95'] = _percentiles(item.pop('runs'))
+    return result
@@ -0,0 +1,170 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from posts.models import Group
+
+from .. import queue
+from ..models import Job
+
+
+calls = []
+
+
+@queue.task()
+def remember(value):
+    calls.append(value)
+
+
+@queue.task(eager=False)
+def remember_later(value):
+    calls.append(value)
+
+
+@queue.task(max_attempts=2)
+def broken():
+    raise ValueError('test-error')
+
+
+@queue.task(atomic=True)
+def create_group_and_fail(slug):
+    Group.objects.create(title='test-group', slug=slug)
+    raise ValueError('test-error')
+
+
+@queue.task(atomic=True)
+def create_group(slug):
+    Group.objects.create(title='test-group', slug=slug)
+
+
+@override_settings(TASKS_EAGER=False)
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        queue.enqueue(remember, 'first')
+        queue.enqueue(remember, 'second')
+        self.assertEqual(calls, [])
+        self.assertEqual(queue.run_pending(10), 2)
+        self.assertEqual(calls, ['first', 'second'])
+        job = Job.objects.first()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertLessEqual(job.created, job.started)
+        self.assertLessEqual(job.started, job.finished)
+        self.assertEqual(queue.run_pending(10), 0)
+
+    def test_idempotency_key(self):
+        for _ in range(3):
+            queue.enqueue(remember, 'value', key='test-key')
+        self.assertEqual(Job.objects.count(), 1)
+
+        # Начатая задача не склеивается с новой: новая работа не потеряется
+        queue.claim(1)
+        queue.enqueue(remember, 'value', key='test-key')
+        self.assertEqual(Job.objects.filter(status=Job.PENDING).count(), 1)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_delay(self):
+        queue.enqueue(remember, 'later', delay=60)
+        self.assertEqual(queue.run_pending(10), 0)
+
+    @override_settings(TASKS_RETRY_DELAY=10)
+    def test_retries(self):
+        queue.enqueue(broken)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_pending(10)
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertIn('test-error', job.error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_pending(10)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_atomic_task_rolls_back(self):
+        queue.enqueue(create_group_and_fail, 'test-slug')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_pending(10)
+        self.assertFalse(Group.objects.exists())
+        self.assertEqual(Job.objects.get().status, Job.PENDING)
+
+    def test_expired_lease(self):
+        queue.enqueue(create_group, 'test-slug')
+        stale, = queue.claim(1)
+        self.assertEqual(queue.claim(1), [])
+
+        # Воркер пропал: после аренды задачу берёт другой
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        fresh, = queue.claim(1)
+        self.assertEqual(fresh.attempts, 2)
+        # Опоздавший воркер не применяет изменения второй раз
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(queue.execute(stale))
+        self.assertTrue(queue.execute(fresh))
+        self.assertEqual(Group.objects.count(), 1)
+
+    def test_unknown_task(self):
+        Job.objects.create(name='no.such.task')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_pending(10)
+        self.assertIn('no.such.task', Job.objects.get().error)
+
+    def test_stats(self):
+        queue.enqueue(remember, 'value')
+        queue.enqueue(broken)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.run_pending(10)
+        queue.enqueue(remember, 'value')
+        stats = queue.stats()
+        name = remember.task_name
+        self.assertEqual(stats[name]['done'], 1)
+        self.assertEqual(stats[name]['pending'], 1)
+        self.assertGreaterEqual(stats[name]['run_p95'], 0)
+        self.assertEqual(stats[broken.task_name]['pending'], 1)
+        self.assertIsNone(stats[broken.task_name]['wait_p50'])
+
+        out = StringIO()
+        call_command('task_stats', stdout=out)
+        self.assertIn(name, out.getvalue())
+
+    def test_prune(self):
+        queue.enqueue(remember, 'value')
+        queue.run_pending(10)
+        self.assertEqual(queue.prune(), 0)
+        Job.objects.update(finished=timezone.now() - timedelta(days=2))
+        self.assertEqual(queue.prune(), 1)
+
+    def test_run_workers_once(self):
+        for number in range(3):
+            queue.enqueue(remember, number)
+        call_command('run_workers', once=True, batch_size=2)
+        self.assertEqual(calls, [0, 1, 2])
+
+
+class EagerTests(TestCase):
+    @override_settings(TASKS_EAGER=True)
+    def test_runs_immediately(self):
+        calls.clear()
+        queue.enqueue(remember, 'value')
+        self.assertEqual(calls, ['value'])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_false_is_queued(self):
+        calls.clear()
+        queue.enqueue(remember_later, 'value')
+        self.assertEqual(calls, [])
+        queue.run_pending(10, names=['no.such.task'])
+        self.assertEqual(calls, [])
+        queue.run_pending(10, names=[remember_later.task_name])
+        self.assertEqual(calls, ['value'])
@@ -0,0 +1,146 @@
+"""Асинхронные версии страниц только для чтения (для yatube/asgi.py).
+
+Под ASGI index, group_posts, profile и post_view не держат поток на весь
+запрос: работа с базой идёт в пуле из ASYNC_DB_THREADS потоков, а
+независимые части страницы (автор со счётчиками, записи, комментарии,
+подписка) запрашиваются одновременно. Контекст страниц собирают те же
+функции posts/views.py, поэтому ответы те же, что у синхронных
+представлений, включая кэш лент и условные GET.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.shortcuts import get_object_or_404, render
+
+from . import views
+from .conditional import evaluate, post_state, profile_state, set_etag
+from .models import Post
+from .paginators import get_page
+
+
+User = get_user_model()
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_THREADS,
+                thread_name_prefix='db')
+        return _executor
+
+
+def _release_connections():
+    """Закрыть испорченные соединения потока пула.
+
+    В отличие от close_old_connections, исправные соединения не
+    закрываются по CONN_MAX_AGE: одна страница делает в пуле несколько
+    вызовов, а соединений и так не больше ASYNC_DB_THREADS.
+    """
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        autocommit = connection.settings_dict['AUTOCOMMIT']
+        if (connection.get_autocommit() != autocommit
+                or connection.errors_occurred
+                and not connection.is_usable()):
+            connection.close()
+        else:
+            connection.errors_occurred = False
+
+
+def _call(function, args, kwargs):
+    try:
+        return function(*args, **kwargs)
+    finally:
+        _release_connections()
+
+
+async def run_db(function, *args, **kwargs):
+    """Выполнить синхронную работу с базой в пуле потоков.
+
+    При ASYNC_DB_THREADS = 0 — прямо в потоке цикла (тесты, отладка).
+    Контекстные переменные запроса (выбранная реплика) видны в пуле.
+    """
+    if not settings.ASYNC_DB_THREADS:
+        return function(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _pool(), context.run, _call, function, args, kwargs)
+
+
+def _page(request, posts, view_name):
+    page = get_page(request, posts, view_name)
+    # Записи читаются здесь, в пуле, а не при рендеринге
+    list(page)
+    return page
+
+
+async def _render(request, template, context, etag):
+    response = await run_db(render, request, template, context)
+    set_etag(response, etag)
+    return response
+
+
+async def index(request):
+    # У ленты нет независимых частей: кэш страницы и её сборка
+    # выполняются в пуле целиком
+    return await run_db(views.index, request)
+
+
+async def group_posts(request, slug):
+    return await run_db(views.group_posts, request, slug)
+
+
+async def profile(request, username):
+    etag, response = await run_db(
+        evaluate, request, profile_state, username)
+    if response is not None:
+        return response
+
+    author, page, following = await asyncio.gather(
+        run_db(
+            get_object_or_404, User.objects.select_related('stats'),
+            username=username),
+        run_db(_page, request, views.profile_posts(username), 'profile'),
+        run_db(views.is_following, request.user, username),
+    )
+    context = await run_db(views.profile_context, author, page, following)
+    return await _render(request, 'posts/profile.html', context, etag)
+
+
+async def post_view(request, username, post_id):
+    etag, response = await run_db(
+        evaluate, request, post_state, username, post_id)
+    if response is not None:
+        return response
+
+    post, comments, following = await asyncio.gather(
+        run_db(
+            get_object_or_404,
+            Post.objects.for_feed().select_related('author__stats'),
+            author__username=username, pk=post_id),
+        run_db(list, views.post_comments(username, post_id)),
+        run_db(views.is_following, request.user, username),
+    )
+    context = await run_db(views.post_context, post, comments, following)
+    return await _render(request, 'posts/post.html', context, etag)
+
+
+# Синхронное представление из urls.py -> его асинхронная версия
+VIEWS = {
+    views.index: index,
+    views.group_posts: group_posts,
+    views.profile: profile,
+    views.post_view: post_view,
+}
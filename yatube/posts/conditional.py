@@ -0,0 +1,108 @@
+"""Условные GET (ETag) для страниц записи, профиля и группы.
+
+Валидатор страницы не требует её сборки: это слепок строк базы, из
+которых она собирается. У группы и профиля это одна строка с версией
+(Group.version, UserStats.version), которую сигналы posts/signals.py
+поднимают вместе со сбросом кэша лент, у записи — её версия, счётчики
+автора и комментарии. Слепок читается одним запросом и одинаков во
+всех процессах, в отличие от поколений кэша лент, которые при кэше в
+памяти процесса у каждого воркера свои. Повторный запрос браузера или
+поисковика с If-None-Match получает 304 без рендеринга.
+
+Если реплика ещё не видела изменений областей кэша страницы, слепок и
+страница читаются с основной базы (yatube/replicas.py).
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+from . import feed_cache
+from .models import Group, Post
+
+
+User = get_user_model()
+
+AUTHOR_STATS = (
+    'stats__posts_count', 'stats__followers_count', 'stats__following_count')
+
+
+def page_etag(state):
+    """`state` — функция от аргументов URL: слепок страницы или None."""
+    def etag(request, *args, **kwargs):
+        values = state(*args, **kwargs)
+        if values is None:
+            return None
+        # Страница зависит и от зрителя: меню, кнопка подписки
+        viewer = request.user.pk if request.user.is_authenticated else 0
+        value = f'{viewer}:{request.get_full_path()}:{values}'
+        return hashlib.md5(value.encode()).hexdigest()
+    return etag
+
+
+def conditional_page(state):
+    """Отвечать 304 на повторные запросы неизменившейся страницы.
+
+    `state` — функция от аргументов URL, возвращающая слепок строк,
+    из которых собирается страница, или None, если страницы нет.
+    """
+    return condition(etag_func=page_etag(state))
+
+
+def evaluate(request, state, *args, **kwargs):
+    """ETag страницы и ответ 304, если она не изменилась.
+
+    То же, что `conditional_page`, для асинхронных представлений
+    (posts/async_views.py), которые собирают ответ сами.
+    """
+    etag = page_etag(state)(request, *args, **kwargs)
+    etag = etag and quote_etag(etag)
+    return etag, get_conditional_response(request, etag=etag)
+
+
+def set_etag(response, etag):
+    if etag:
+        response.setdefault('ETag', etag)
+
+
+def _fresh(query, scopes):
+    """Слепок `query()` с реплики, которая видела изменения `scopes`."""
+    values = query().first()
+    if values is not None and feed_cache.require(scopes(values)):
+        # Реплика отстала: слепок должен совпасть со страницей,
+        # которая теперь читается с основной базы
+        values = query().first()
+    return values
+
+
+def group_state(slug):
+    return _fresh(
+        lambda: Group.objects.filter(slug=slug).values_list(
+            'pk', 'title', 'description', 'version'),
+        lambda values: [feed_cache.group_scope(slug)])
+
+
+def profile_state(username):
+    return _fresh(
+        lambda: User.objects.filter(username=username).values_list(
+            'pk', 'stats__version', *AUTHOR_STATS),
+        lambda values: [feed_cache.author_scope(values[0])])
+
+
+def post_state(username, post_id):
+    # Карточка автора на странице записи меняется вместе с его профилем
+    return _fresh(
+        lambda: Post.objects.filter(
+            pk=post_id, author__username=username,
+        ).values_list(
+            'author_id', 'version',
+            *(f'author__{field}' for field in AUTHOR_STATS),
+        ).annotate(
+            comments=Count('comments'), last_comment=Max('comments__pk'),
+        ),
+        lambda values: [
+            feed_cache.post_scope(post_id), feed_cache.author_scope(values[0]),
+        ])
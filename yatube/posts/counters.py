@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserStats
+
+
+User = get_user_model()
+
+STATS_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def recount_comments(post_id):
+    """Пересчитать `comment_count` одной записи по таблице комментариев."""
+    Post.objects.filter(pk=post_id).update(
+        comment_count=comment_counts_subquery(), version=F('version') + 1)
+
+
+def user_stats(user):
+    """Вернуть счётчики пользователя, пересчитав их при отсутствии строки."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        rebuild_user_stats([user.pk])
+        return UserStats.objects.get(user=user)
+
+
+def _counts(queryset, field, user_ids):
+    rows = (
+        queryset.filter(**{f'{field}__in': user_ids})
+        .values(field).annotate(total=Count('pk'))
+        .values_list(field, 'total')
+    )
+    return dict(rows)
+
+
+def actual_user_stats(user_ids):
+    """Посчитать счётчики по исходным таблицам для пачки пользователей."""
+    posts = _counts(Post.objects.all(), 'author', user_ids)
+    followers = _counts(Follow.objects.all(), 'author', user_ids)
+    following = _counts(Follow.objects.all(), 'user', user_ids)
+    return {
+        user_id: {
+            'posts_count': posts.get(user_id, 0),
+            'followers_count': followers.get(user_id, 0),
+            'following_count': following.get(user_id, 0),
+        }
+        for user_id in user_ids
+    }
+
+
+def rebuild_user_stats(user_ids, dry_run=False, create=True):
+    """Привести счётчики пачки пользователей к фактическим значениям.
+
+    create=False — не создавать недостающие строки: после удаления они
+    могли уйти каскадом вместе с пользователем. Возвращает число строк,
+    которые расходились с данными.
+    """
+    actual = actual_user_stats(user_ids)
+    existing = UserStats.objects.in_bulk(user_ids)
+    to_create, to_update = [], []
+
+    for user_id, values in actual.items():
+        stats = existing.get(user_id)
+        if stats is None:
+            if not create:
+                continue
+            to_create.append(UserStats(user_id=user_id, **values))
+            continue
+        if any(getattr(stats, key) != value for key, value in values.items()):
+            for key, value in values.items():
+                setattr(stats, key, value)
+            to_update.append(stats)
+
+    if not dry_run:
+        UserStats.objects.bulk_create(to_create, ignore_conflicts=True)
+        UserStats.objects.bulk_update(to_update, STATS_FIELDS)
+    return len(to_create) + len(to_update)
+
+
+def comment_counts_subquery():
+    return Coalesce(Subquery(
+        Comment.objects.filter(post=OuterRef('pk'))
+        .values('post').annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def rebuild_comment_counts(dry_run=False):
+    """Пересчитать `Post.comment_count`, вернуть число расхождений."""
+    stale = Post.objects.annotate(
+        actual=comment_counts_subquery()).exclude(comment_count=F('actual'))
+    if dry_run:
+        return stale.count()
+    return Post.objects.filter(pk__in=stale.values('pk')).update(
+        comment_count=comment_counts_subquery(), version=F('version') + 1)
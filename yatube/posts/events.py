@@ -0,0 +1,230 @@
+"""Уведомления о новых записях и комментариях (Server-Sent Events).
+
+После коммита сигналы публикуют события в каналы, названные как области
+кэша лент: `index`, `group:<slug>`, `author:<id>`, `post:<id>`. Страница
+ленты подписывается на свой канал через EventSource и предлагает
+обновиться, вместо того чтобы пользователь обновлял её сам. Поток
+событий обслуживает асинхронная часть yatube/asgi.py без отдельного
+потока на клиента; под WSGI адрес потока отвечает 204, и браузер
+не переподключается.
+
+Брокер по умолчанию живёт в памяти процесса. Для нескольких процессов
+его заменяют общим (Redis pub/sub и т. п.) настройкой EVENTS_BROKER:
+нужны методы `publish(channels, event)` и `subscribe(channels)`.
+"""
+import asyncio
+import json
+import re
+import threading
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from . import feed_cache
+from .models import Follow
+
+
+CHANNEL = re.compile(r'^(index|follow|group:[-\w]+|author:\d+|post:\d+)$')
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """Очередь событий одного клиента в его цикле asyncio."""
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def deliver(self, event):
+        # Публикуют из потоков запросов, очередь живёт в цикле клиента
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Цикл уже закрыт: клиент отключился
+            self.close()
+
+    def _put(self, event):
+        if self.queue.full():
+            # Медленный клиент теряет самые старые события
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Брокер в памяти процесса; публиковать можно из любого потока."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, channels, event):
+        with self._lock:
+            subscriptions = {
+                subscription for channel in channels
+                for subscription in self._subscriptions.get(channel, ())
+            }
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscriptions = self._subscriptions.get(channel)
+                if subscriptions is None:
+                    continue
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[channel]
+
+
+def broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.EVENTS_BROKER)()
+        return _broker
+
+
+def publish(channels, event):
+    """Опубликовать событие после коммита текущей транзакции."""
+    channels = list(channels)
+    transaction.on_commit(lambda: broker().publish(channels, event))
+
+
+def publish_post(post):
+    channels = ['index', feed_cache.author_scope(post.author_id)]
+    if post.group_id:
+        channels.append(feed_cache.group_scope(post.group.slug))
+    publish(channels, {
+        'type': 'post',
+        'id': post.pk,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+    })
+
+
+def publish_comment(comment):
+    publish([feed_cache.post_scope(comment.post_id)], {
+        'type': 'comment',
+        'id': comment.pk,
+        'post': comment.post_id,
+        'author': comment.author.username,
+    })
+
+
+def followed_channels(headers):
+    """Каналы авторов, на которых подписан владелец сессии из cookie."""
+    cookie = SimpleCookie()
+    for name, value in headers:
+        if name == b'cookie':
+            cookie.load(value.decode('latin1'))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return []
+    try:
+        engine = import_module(settings.SESSION_ENGINE)
+        user_id = engine.SessionStore(morsel.value).get(SESSION_KEY)
+        if user_id is None:
+            return []
+        authors = Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True)
+        return [feed_cache.author_scope(pk) for pk in authors]
+    finally:
+        close_old_connections()
+
+
+async def channels_for(scope):
+    """Каналы из ?channel=…; `follow` раскрывается в каналы авторов."""
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    requested = [
+        channel for channel in query.get('channel', [])
+        if CHANNEL.match(channel)
+    ][:settings.EVENTS_MAX_CHANNELS]
+    channels = [channel for channel in requested if channel != 'follow']
+    if 'follow' in requested:
+        loop = asyncio.get_running_loop()
+        channels += await loop.run_in_executor(
+            None, followed_channels, scope.get('headers', []))
+    return list(dict.fromkeys(channels))
+
+
+def format_event(event):
+    data = json.dumps(event, ensure_ascii=False)
+    return f"event: {event['type']}\ndata: {data}\n\n".encode()
+
+
+async def _disconnected(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream(scope, receive, send):
+    """ASGI-приложение потока событий text/event-stream."""
+    channels = await channels_for(scope)
+    if not channels:
+        # 204 останавливает переподключения EventSource
+        await send({'type': 'http.response.start', 'status': 204,
+                    'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    subscription = broker().subscribe(channels)
+    disconnected = asyncio.ensure_future(_disconnected(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body', 'more_body': True,
+            'body': f'retry: {settings.EVENTS_RETRY_MS}\n\n'.encode(),
+        })
+        while True:
+            event = asyncio.ensure_future(subscription.get())
+            await asyncio.wait(
+                {event, disconnected}, timeout=settings.EVENTS_KEEPALIVE,
+                return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                event.cancel()
+                break
+            if event.done():
+                body = format_event(event.result())
+            else:
+                event.cancel()
+                # Комментарий SSE не даёт прокси закрыть тихое соединение
+                body = b': keepalive\n\n'
+            await send({
+                'type': 'http.response.body', 'body': body,
+                'more_body': True,
+            })
+    finally:
+        subscription.close()
+        disconnected.cancel()
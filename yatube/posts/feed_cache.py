@@ -0,0 +1,215 @@
+"""Кэш страниц лент с версионными ключами.
+
+Каждая лента (`index`, `group:<slug>`) имеет счётчик поколений. Ключ
+страницы включает текущее поколение, поэтому публикация, правка,
+комментарий или удаление делают старые страницы недостижимыми сразу,
+без ожидания TTL. Пересборку страницы выполняет один запрос: остальные
+ждут её результат или отдают ещё живую копию.
+
+Вместе с поколением запоминается время последнего изменения ленты: по
+нему запрос не читает такую ленту с отставшей реплики (yatube/replicas.py).
+Области `post:<id>` и `author:<id>` страниц записи и профиля не кэшируются,
+а только отмечают изменения.
+
+Поколения видны всем воркерам только в общем кэше. С кэшем в памяти
+процесса (YATUBE_CACHE=locmem) правка в одном воркере не сбрасывает
+страницы других, поэтому страница живёт там не дольше
+FEED_CACHE_LOCAL_TIMEOUT.
+"""
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.http import HttpResponse
+
+from yatube import replicas
+
+
+def _generation_key(scope):
+    return f'feed-gen:{scope}'
+
+
+def _modified_key(scope):
+    return f'feed-mod:{scope}'
+
+
+def _new_generation():
+    # Опираемся на время: после вытеснения счётчика из кэша новое
+    # поколение не совпадёт ни с одним из прежних ключей
+    return int(time.time() * 1000)
+
+
+def generation(scope):
+    key = _generation_key(scope)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _new_generation(), None)
+        value = cache.get(key)
+    return value
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _new_generation(), None)
+    now = time.time()
+    cache.set_many({_modified_key(scope): now for scope in scopes}, None)
+
+
+def bump(*scopes):
+    """Сделать устаревшими закэшированные страницы перечисленных лент."""
+    _bump(scopes)
+    if connection.in_atomic_block:
+        # Повторяем после коммита, чтобы не закэшировать данные,
+        # прочитанные параллельным запросом до завершения транзакции
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def validators(scopes):
+    """Поколения перечисленных лент и время их последнего изменения."""
+    keys = [
+        key for scope in scopes
+        for key in (_generation_key(scope), _modified_key(scope))
+    ]
+    values = cache.get_many(keys)
+    generations, modified = [], []
+    for scope in scopes:
+        generation_key, modified_key = (
+            _generation_key(scope), _modified_key(scope))
+        if generation_key not in values:
+            # Поколение вытеснено: прежним отметкам времени верить нельзя
+            values[generation_key] = generation(scope)
+            values[modified_key] = time.time()
+            cache.set(modified_key, values[modified_key], None)
+        elif modified_key not in values:
+            cache.add(modified_key, time.time(), None)
+            values[modified_key] = cache.get(modified_key)
+        generations.append(values[generation_key])
+        modified.append(values[modified_key])
+    return generations, max(modified)
+
+
+def require(scopes):
+    """Не читать страницу лент `scopes` с реплики, не видевшей их изменений.
+
+    Возвращает True, если для этого запрос переключился на основную базу.
+    """
+    _, modified = validators(scopes)
+    return replicas.require(modified)
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def post_scope(pk):
+    return f'post:{pk}'
+
+
+def author_scope(pk):
+    return f'author:{pk}'
+
+
+def page_key(scope, request):
+    (current,), modified = validators([scope])
+    # Страница этого поколения не может собираться с реплики, которая
+    # ещё не видела его изменений
+    replicas.require(modified)
+    viewer = request.user.pk if request.user.is_authenticated else 'anon'
+    query = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'feed-page:{scope}:{current}:{viewer}:{query}'
+
+
+def _is_fresh(entry):
+    # Вероятностное досрочное обновление (XFetch): чем ближе срок
+    # жизни и чем дольше сборка, тем выше шанс пересобрать заранее
+    jitter = -entry['delta'] * settings.FEED_CACHE_BETA * math.log(
+        1 - random.random())
+    return time.time() + jitter < entry['expires']
+
+
+def page_timeout():
+    """Срок жизни страницы в кэше."""
+    if isinstance(caches['default'], LocMemCache):
+        return min(
+            settings.FEED_CACHE_TIMEOUT, settings.FEED_CACHE_LOCAL_TIMEOUT)
+    return settings.FEED_CACHE_TIMEOUT
+
+
+def _from_entry(entry):
+    response = HttpResponse(entry['content'])
+    for header, value in entry['headers']:
+        response[header] = value
+    return response
+
+
+def _render_and_store(key, render):
+    started = time.time()
+    response = render()
+    if response.status_code == 200 and not response.streaming:
+        timeout = page_timeout()
+        cache.set(key, {
+            'content': response.content,
+            # Длину посчитает сам ответ, cookies в заголовки не входят
+            'headers': [
+                (header, value) for header, value in response.items()
+                if header.lower() != 'content-length'
+            ],
+            'delta': time.time() - started,
+            'expires': time.time() + timeout,
+        }, timeout)
+    return response
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + settings.FEED_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_render(key, render):
+    """Отдать страницу из кэша или собрать её в единственном экземпляре."""
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry):
+        return _from_entry(entry)
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, settings.FEED_CACHE_LOCK_TIMEOUT):
+        try:
+            return _render_and_store(key, render)
+        finally:
+            cache.delete(lock_key)
+
+    if entry is None:
+        entry = _wait_for(key)
+    if entry is not None:
+        return _from_entry(entry)
+    return render()
+
+
+def cache_feed(scope):
+    """Кэшировать ленту; `scope` — имя ленты или функция от аргументов URL."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            name = scope(*args, **kwargs) if callable(scope) else scope
+            return get_or_render(
+                page_key(name, request),
+                lambda: view(request, *args, **kwargs))
+        return wrapper
+    return decorator
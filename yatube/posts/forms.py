@@ -4,6 +4,17 @@ from .models import Post, Comment
 
 
 class PostForm(ModelForm):
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файлы, отклонённые при загрузке (см. posts/uploads.py)
+        self.upload_errors = upload_errors or {}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field, message in self.upload_errors.items():
+            self.add_error(field, message)
+        return cleaned_data
+
     class Meta:
         model = Post
         fields = ['group', 'text', 'image']
@@ -0,0 +1,136 @@
+import asyncio
+import statistics
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.sqlite3.base import SQLiteCursorWrapper
+from django.urls import reverse
+
+from posts import async_views
+from posts.models import Group, Post
+from yatube.asgi import wsgi_application
+from yatube.asgi_bridge import AsyncViews, WsgiToAsgi
+
+
+User = get_user_model()
+
+
+def _scope(path):
+    return {
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+        'headers': [], 'server': ('localhost', 80),
+        'client': ('127.0.0.1', 0),
+    }
+
+
+async def _request(application, path):
+    """Выполнить запрос и вернуть код ответа."""
+    status = None
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(_scope(path), receive, send)
+    return status
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность страниц только для чтения '
+        'под WSGI (поток на запрос) и под ASGI с асинхронными '
+        'представлениями при одновременных клиентах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 4, 8, 32],
+            help='Сколько клиентов отправляют запросы одновременно; '
+                 'каждое значение замеряется отдельно.')
+        parser.add_argument(
+            '--threads', type=int, default=settings.ASYNC_DB_THREADS,
+            help='Потоков у WSGI-пути; ASGI-путь использует '
+                 'ASYNC_DB_THREADS.')
+        parser.add_argument(
+            '--db-latency', type=float, default=0.002,
+            help='Задержка каждого SQL-запроса в секундах (сетевая база).')
+
+    def paths(self):
+        post = Post.objects.select_related('author').order_by('-pk').first()
+        group = Group.objects.order_by('pk').first()
+        if post is None or group is None:
+            raise CommandError(
+                'В базе нет записей или групп: запустите seed_yatube')
+        return [
+            reverse('index'),
+            reverse('group_posts', args=[group.slug]),
+            reverse('profile', args=[post.author.username]),
+            reverse('post', args=[post.author.username, post.pk]),
+        ]
+
+    async def load(self, application, paths, total, concurrency):
+        latencies = []
+        errors = 0
+        queue = iter(range(total))
+
+        async def client():
+            nonlocal errors
+            for number in queue:
+                started = time.perf_counter()
+                status = await _request(
+                    application, paths[number % len(paths)])
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - started, latencies, errors
+
+    def report(self, name, concurrency, elapsed, latencies, errors):
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f'{name} x{concurrency:<3}: '
+            f'{len(latencies) / elapsed:8.1f} запр/с, '
+            f'p50 {statistics.median(latencies) * 1000:7.1f} мс, '
+            f'p95 {p95 * 1000:7.1f} мс, ошибок {errors}')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or min(options['concurrency']) < 1:
+            raise CommandError('Нужен хотя бы один запрос и один клиент')
+        paths = self.paths()
+        wsgi = WsgiToAsgi(wsgi_application, options['threads'])
+        applications = [
+            ('WSGI', wsgi),
+            ('ASGI', AsyncViews(
+                async_views.VIEWS, async_views.run_db, fallback=wsgi)),
+        ]
+
+        latency = options['db_latency']
+        execute = SQLiteCursorWrapper.execute
+
+        def slow_execute(cursor, *args, **kwargs):
+            time.sleep(latency)
+            return execute(cursor, *args, **kwargs)
+
+        # Асинхронные страницы быстрее, пока в пуле есть свободные потоки
+        # для одновременных запросов одной страницы; под полной нагрузкой
+        # оба пути упираются в одни и те же потоки
+        with mock.patch.object(SQLiteCursorWrapper, 'execute', slow_execute):
+            for concurrency in options['concurrency']:
+                for name, application in applications:
+                    # Прогрев: кэш лент и соединения пулов
+                    asyncio.run(self.load(
+                        application, paths, len(paths), concurrency))
+                    self.report(name, concurrency, *asyncio.run(self.load(
+                        application, paths, options['requests'],
+                        concurrency)))
@@ -0,0 +1,129 @@
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections, transaction
+
+
+BACKENDS = [
+    # Как было: журнал отката, новое соединение на каждый запрос
+    ('django.db.backends.sqlite3', 0),
+    ('yatube.db_backend', 600),
+]
+
+SCHEMA = [
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT, '
+    'comments INTEGER NOT NULL DEFAULT 0)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, '
+    'post_id INTEGER NOT NULL REFERENCES post (id), text TEXT)',
+    'CREATE INDEX comment_post ON comment (post_id)',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает обычный бэкенд SQLite и yatube.db_backend (WAL, прагмы, '
+        'постоянные соединения, очередь писателей) на смеси читающих '
+        'и пишущих запросов из нескольких потоков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.2,
+            help='Доля запросов, которые добавляют комментарий.')
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['threads'] < 1:
+            raise CommandError('Нужен хотя бы один запрос и один поток')
+        directory = tempfile.mkdtemp()
+        try:
+            for engine, max_age in BACKENDS:
+                alias = f'bench-{engine}'
+                connections.databases[alias] = {
+                    'ENGINE': engine, 'CONN_MAX_AGE': max_age,
+                    'NAME': os.path.join(directory, f'{engine}.sqlite3'),
+                }
+                try:
+                    self.prepare(alias, options['posts'])
+                    self.report(engine, *self.run(alias, options))
+                finally:
+                    del connections.databases[alias]
+        finally:
+            shutil.rmtree(directory)
+
+    def prepare(self, alias, posts):
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany(
+                'INSERT INTO post (text) VALUES (%s)',
+                [(f'post {number}',) for number in range(posts)])
+        connection.close()
+
+    def request(self, alias, write, post_id):
+        """Один запрос страницы: комментарий к записи или её чтение."""
+        connection = connections[alias]
+        started = time.perf_counter()
+        try:
+            if write:
+                # Как add_comment: прочитать запись, добавить комментарий
+                # и обновить счётчик в одной транзакции
+                with transaction.atomic(using=alias):
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            'SELECT id FROM post WHERE id = %s', [post_id])
+                        cursor.fetchone()
+                        cursor.execute(
+                            'INSERT INTO comment (post_id, text) '
+                            'VALUES (%s, %s)', [post_id, 'comment'])
+                        cursor.execute(
+                            'UPDATE post SET comments = comments + 1 '
+                            'WHERE id = %s', [post_id])
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT post.id, post.text, post.comments, '
+                        'comment.text FROM post LEFT JOIN comment '
+                        'ON comment.post_id = post.id WHERE post.id = %s '
+                        'ORDER BY comment.id DESC LIMIT 20', [post_id])
+                    cursor.fetchall()
+            failed = False
+        except DatabaseError:
+            failed = True
+        finally:
+            # Конец запроса: как close_old_connections
+            connection.close_if_unusable_or_obsolete()
+        return time.perf_counter() - started, failed
+
+    def run(self, alias, options):
+        generator = random.Random(options['seed'])
+        workload = [
+            (generator.random() < options['write_ratio'],
+             generator.randint(1, options['posts']))
+            for _ in range(options['requests'])
+        ]
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            started = time.perf_counter()
+            results = list(pool.map(
+                lambda item: self.request(alias, *item), workload))
+            elapsed = time.perf_counter() - started
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(failed for _, failed in results)
+        return elapsed, latencies, errors
+
+    def report(self, name, elapsed, latencies, errors):
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f'{name}: {len(latencies) / elapsed:8.1f} запр/с, '
+            f'p50 {statistics.median(latencies) * 1000:7.2f} мс, '
+            f'p95 {p95 * 1000:7.2f} мс, ошибок {errors}')
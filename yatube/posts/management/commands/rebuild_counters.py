@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import counters, media
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики подписчиков, подписок, записей, '
+        'комментариев и ссылок на файлы картинок по исходным таблицам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить счётчики, ничего не меняя.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько пользователей пересчитывать за один проход.')
+
+    def handle(self, *args, **options):
+        dry_run = options['check']
+        batch_size = options['batch_size']
+
+        stale_users = 0
+        batch = []
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) == batch_size:
+                stale_users += counters.rebuild_user_stats(batch, dry_run)
+                batch = []
+        if batch:
+            stale_users += counters.rebuild_user_stats(batch, dry_run)
+
+        stale_posts = counters.rebuild_comment_counts(dry_run)
+        stale_files = media.rebuild_refs(dry_run)
+
+        verb = 'Расходится' if dry_run else 'Исправлено'
+        self.stdout.write(
+            f'{verb}: пользователей {stale_users}, записей {stale_posts}, '
+            f'файлов {stale_files}')
+        if dry_run and (stale_users or stale_posts or stale_files):
+            raise CommandError('Счётчики расходятся с данными')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Заново собирает полнотекстовый индекс записей и комментариев.'
+
+    def handle(self, *args, **options):
+        total = search.rebuild()
+        self.stdout.write(f'Записей в поисковом индексе: {total}')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Заново раскладывает записи по лентам подписок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', dest='usernames', default=[],
+            help='Пересобрать ленту только этого пользователя.')
+        parser.add_argument(
+            '--read-through', action='store_true',
+            help='Не раскладывать старые записи: лента читает их '
+                 'запросом по подпискам.')
+
+    def handle(self, *args, **options):
+        if options['read_through']:
+            total = timeline.read_through(options['usernames'])
+            self.stdout.write(f'Подписок без ленты: {total}')
+            return
+        total = timeline.rebuild(options['usernames'])
+        self.stdout.write(f'Записей в лентах: {total}')
@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from yatube import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик REPLICA_DATABASES '
+        'раз в REPLICA_SYNC_INTERVAL секунд (замена настоящей репликации '
+        'для локальной проверки чтения с реплик).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Синхронизировать один раз и выйти.')
+        parser.add_argument(
+            '--interval', type=float, default=settings.REPLICA_SYNC_INTERVAL,
+            help='Пауза между синхронизациями, секунд; больше паузы — '
+                 'больше отставание реплик.')
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError(
+                'Реплик нет: задайте их число в YATUBE_REPLICAS')
+        paths = [
+            connections[alias].settings_dict['NAME']
+            for alias in settings.REPLICA_DATABASES
+        ]
+        source = sqlite3.connect(connections['default'].settings_dict['NAME'])
+        try:
+            while True:
+                started = time.monotonic()
+                replicas.sync(source, paths)
+                if options['once'] or options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'Реплики синхронизированы за '
+                        f'{time.monotonic() - started:.2f} с')
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            source.close()
@@ -0,0 +1,76 @@
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, записями, '
+        'комментариями и подписками для нагрузочных тестов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows-per-user', type=int, default=20,
+            help='Среднее число подписок; распределение с тяжёлым хвостом.')
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='Сколько разных картинок сгенерировать для записей.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed-')
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счётчики и ленты подписок.')
+        parser.add_argument(
+            '--timelines', action='store_true',
+            help='Разложить записи по лентам подписок. Без флага ленты '
+                 'остаются пустыми и читаются запросом по подпискам.')
+
+    def log(self, message):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f'[{elapsed:7.1f}s] {message}')
+
+    def step(self, message, name, **options):
+        """Запустить команду и записать в лог её собственное время."""
+        started = time.monotonic()
+        output = StringIO()
+        call_command(name, stdout=output, **options)
+        result = output.getvalue().strip().replace('\n', '; ')
+        self.log(
+            f'{message} за {time.monotonic() - started:.1f}s ({result})')
+
+    def handle(self, *args, **options):
+        self.started = time.monotonic()
+        seeder = Seeder(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            prefix=options['prefix'],
+            log=self.log,
+        )
+        user_ids = seeder.users(options['users'])
+        group_ids = seeder.groups(options['groups'])
+        images = seeder.images(options['images'])
+        post_ids = seeder.posts(
+            options['posts'], user_ids, group_ids, images)
+        seeder.comments(options['comments'], user_ids, post_ids)
+        seeder.follows(options['follows_per_user'], user_ids)
+
+        if not options['skip_derived']:
+            # bulk_create не вызывает сигналы, поэтому производные
+            # таблицы собираются одним проходом в конце
+            self.step('Счётчики пересчитаны', 'rebuild_counters')
+            # Ленты на миллионе записей — десятки миллионов строк, поэтому
+            # по умолчанию они читаются запросом по подпискам
+            self.step(
+                'Ленты подписок собраны', 'rebuild_timelines',
+                read_through=not options['timelines'])
+            self.step('Поисковый индекс собран', 'rebuild_search')
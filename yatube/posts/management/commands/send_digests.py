@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.queue import run_pending
+from posts import notifications, tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Раскладывает новые записи по дайджестам и отправляет накопленные '
+        'письма, не дожидаясь воркеров очереди (для cron без run_workers).'
+    )
+
+    def handle(self, *args, **options):
+        while run_pending(settings.TASKS_BATCH_SIZE, tasks.NOTIFY_TASKS):
+            pass
+        sent = notifications.send_digests()
+        self.stdout.write(f'Отправлено писем: {sent}')
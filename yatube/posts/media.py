@@ -0,0 +1,125 @@
+"""Счётчики ссылок на картинки записей и удаление осиротевших файлов.
+
+Картинки лежат в ContentAddressedStorage, а адаптивные варианты — под
+хэшем содержимого (posts/variants.py), и один файл может принадлежать
+многим записям. MediaFile.refs — сколько записей ссылается на файл:
+на картинку — через Post.image, на вариант — через собранные для
+картинки Post.image_variants. Когда счётчик падает до нуля, после коммита
+удаляются сам файл и миниатюры sorl-thumbnail.
+
+Удаление идёт в транзакции, то есть под блокировкой записи SQLite
+(yatube/db_backend): строка счётчика и файл исчезают вместе. Загрузка
+проверяет, есть ли уже такой файл, и берёт на него ссылку тоже в одной
+транзакции (Post.save, thumbnails.build_variants), поэтому не может
+сослаться на файл, который удаляется в это время.
+"""
+import json
+import logging
+from collections import Counter
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .models import MediaFile, Post
+
+
+logger = logging.getLogger(__name__)
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def variant_names(image_variants, source=None):
+    """Имена файлов вариантов; с `source` — только собранных из него.
+
+    После замены картинки в записи остаются варианты прежней, на которые
+    она уже не ссылается.
+    """
+    if not image_variants:
+        return []
+    data = json.loads(image_variants)
+    if source is not None and data['source'] != source:
+        return []
+    return [item['name'] for item in data['variants']]
+
+
+def acquire(*names):
+    for name in names:
+        if not name:
+            continue
+        updated = MediaFile.objects.filter(name=name).update(
+            refs=F('refs') + 1)
+        if not updated:
+            media_file, created = MediaFile.objects.get_or_create(
+                name=name, defaults={'refs': 1})
+            if not created:
+                MediaFile.objects.filter(name=name).update(
+                    refs=F('refs') + 1)
+
+
+def release(*names):
+    names = [name for name in names if name]
+    # Не уводим счётчик в минус, если он уже разошёлся с данными
+    MediaFile.objects.filter(name__in=names, refs__gt=0).update(
+        refs=F('refs') - 1)
+    for name in names:
+        transaction.on_commit(lambda name=name: collect(name))
+
+
+def release_image(name, image_variants=''):
+    """Отпустить картинку записи и собранные из неё варианты."""
+    if name:
+        release(name, *variant_names(image_variants, name))
+
+
+def _delete(name):
+    try:
+        storage().delete(name)
+    except (SuspiciousFileOperation, OSError):
+        # Записи могут ссылаться на файлы вне MEDIA_ROOT (старые данные)
+        logger.warning('Не удалось удалить файл %s', name)
+
+
+def collect(name):
+    """Удалить файл, если на него больше не ссылается ни одна запись."""
+    with transaction.atomic():
+        deleted, _ = MediaFile.objects.filter(name=name, refs=0).delete()
+        if not deleted:
+            return False
+        # Удаляет и записи KV-хранилища, и файлы миниатюр
+        default.kvstore.delete(ImageFile(name, storage()))
+        _delete(name)
+    return True
+
+
+def rebuild_refs(dry_run=False):
+    """Пересчитать ссылки на файлы по записям, вернуть число расхождений.
+
+    Файлы, на которые не осталось ссылок, удаляются после коммита.
+    """
+    actual = Counter(dict(
+        Post.objects.exclude(image='').exclude(image=None)
+        .values('image').annotate(total=Count('pk'))
+        .values_list('image', 'total')))
+    built = Post.objects.exclude(image_variants='').values_list(
+        'image', 'image_variants')
+    for image, image_variants in built.iterator():
+        actual.update(variant_names(image_variants, image))
+    stored = dict(MediaFile.objects.values_list('name', 'refs'))
+    stale = [
+        name for name in actual.keys() | stored.keys()
+        if actual.get(name, 0) != stored.get(name, 0)
+    ]
+    if dry_run:
+        return len(stale)
+    with transaction.atomic():
+        for name in stale:
+            MediaFile.objects.update_or_create(
+                name=name, defaults={'refs': actual.get(name, 0)})
+            if name not in actual:
+                transaction.on_commit(lambda name=name: collect(name))
+    return len(stale)
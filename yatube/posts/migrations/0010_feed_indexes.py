@@ -0,0 +1,60 @@
+# Generated by Django 2.2.6 on 2026-10-18 19:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def drop_duplicate_follows(apps, schema_editor):
+    """Оставить самую раннюю подписку каждой пары (user, author)."""
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        first=models.Min('pk'), total=models.Count('pk')).filter(total__gt=1)
+    affected = set()
+    for row in duplicates:
+        Follow.objects.filter(
+            user_id=row['user'], author_id=row['author'],
+        ).exclude(pk=row['first']).delete()
+        affected.update((row['user'], row['author']))
+    # Дубликаты попали и в счётчики подписок
+    for user_id in affected:
+        UserStats.objects.filter(user_id=user_id).update(
+            followers_count=Follow.objects.filter(author_id=user_id).count(),
+            following_count=Follow.objects.filter(user_id=user_id).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_post_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='timeline_user_pub_date_idx',
+        ),
+        migrations.RunPython(
+            drop_duplicate_follows, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='follow',
+            unique_together={('user', 'author')},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='post_group_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'pub_date', 'post'], name='timeline_user_pub_date_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.6 on 2026-10-18 19:49
+
+from django.db import migrations, models
+import posts.storage
+
+
+def fill_media_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    totals = (
+        Post.objects.exclude(image='').exclude(image=None)
+        .values('image').annotate(total=models.Count('pk'))
+        .values_list('image', 'total'))
+    MediaFile.objects.bulk_create(
+        MediaFile(name=name, refs=total) for name, total in totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('refs', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/'),
+        ),
+        migrations.RunPython(fill_media_refs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_media_files'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                "CREATE VIRTUAL TABLE posts_search USING fts5("
+                "text, author, comments, "
+                "tokenize = 'unicode61 remove_diacritics 2')",
+                # Ранжирование: текст записи важнее автора и комментариев
+                "INSERT INTO posts_search (posts_search, rank) "
+                "VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')",
+                "INSERT INTO posts_search (rowid, text, author, comments) "
+                "SELECT p.id, p.text, u.username, COALESCE(("
+                "SELECT group_concat(c.text, ' ') FROM posts_comment c "
+                "WHERE c.post_id = p.id), '') "
+                "FROM posts_post p JOIN auth_user u ON u.id = p.author_id",
+            ],
+            'DROP TABLE posts_search',
+        ),
+    ]
@@ -0,0 +1,32 @@
+import json
+
+from django.db import migrations
+
+
+def fill_variant_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    refs = {}
+    built = Post.objects.exclude(image_variants='').values_list(
+        'image', 'image_variants')
+    for image, image_variants in built.iterator():
+        data = json.loads(image_variants)
+        # Варианты прежней картинки запись больше не использует
+        if data['source'] != image:
+            continue
+        for item in data['variants']:
+            refs[item['name']] = refs.get(item['name'], 0) + 1
+    MediaFile.objects.bulk_create(
+        (MediaFile(name=name, refs=total) for name, total in refs.items()),
+        ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_notification'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_variant_refs, migrations.RunPython.noop),
+    ]
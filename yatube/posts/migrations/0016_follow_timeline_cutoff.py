@@ -0,0 +1,37 @@
+# Generated by Django 2.2.6 on 2026-10-18 22:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_timeline_cutoffs(apps, schema_editor):
+    # Ленты могли собираться с ограничением TIMELINE_BACKFILL_SIZE:
+    # более старые записи подписок читаются запросом по подпискам
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    size = settings.TIMELINE_BACKFILL_SIZE
+    authors = Post.objects.values('author').annotate(
+        total=Count('pk')).filter(total__gt=size).values_list(
+        'author', flat=True)
+    for author_id in list(authors):
+        cutoff = Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-pk').values_list('pub_date', flat=True)[size]
+        Follow.objects.filter(author_id=author_id).update(
+            timeline_cutoff=cutoff)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_variant_refs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='timeline_cutoff',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_timeline_cutoffs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.6 on 2026-10-18 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_follow_timeline_cutoff'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from .storage import ContentAddressedStorage
 
 
 User = get_user_model()
@@ -9,11 +10,20 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=250, unique=True)
     description = models.TextField()
+    # Растёт при любом изменении ленты группы, входит в её ETag
+    # (posts/conditional.py)
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для карточек ленты без лишних запросов на каждую карточку."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(
@@ -23,11 +33,46 @@ class Post(models.Model):
     group = models.ForeignKey(
         Group, on_delete=models.SET_NULL, related_name="posts",
         blank=True, null=True)
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(
+        upload_to='posts/', storage=ContentAddressedStorage(),
+        blank=True, null=True)
+    # Адаптивные варианты картинки, см. posts/variants.py
+    image_variants = models.TextField(blank=True, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Растёт при любом изменении карточки записи, входит в ключ её кэша
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["group", "pub_date"],
+                name="post_group_pub_date_idx"),
+            models.Index(
+                fields=["author", "pub_date"],
+                name="post_author_pub_date_idx"),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Картинка записывается в хранилище и получает ссылку в одной
+        # транзакции, чтобы её файл не удалили между этими шагами
+        # (posts/media.py)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class MediaFile(models.Model):
+    """Файл картинки и число записей, которые на него ссылаются."""
+    name = models.CharField(max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -37,6 +82,13 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField("date published", auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["post", "created"],
+                name="comment_post_created_idx"),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -46,3 +98,58 @@ class Follow(models.Model):
         User, on_delete=models.CASCADE, related_name="follower")
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="following")
+    # Записи автора не новее этой даты могли не попасть в ленту
+    # подписчика (posts/timeline.py); None — в ленте все записи
+    timeline_cutoff = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ("user", "author")
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые сигналами из `posts.signals`."""
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="stats",
+        primary_key=True)
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Растёт при любом изменении профиля автора, входит в его ETag
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return f"stats of {self.user_id}"
+
+
+class TimelineEntry(models.Model):
+    """Запись в ленте подписок пользователя (fan-out при публикации)."""
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline")
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(
+                fields=["user", "pub_date", "post"],
+                name="timeline_user_pub_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.post_id}"
+
+
+class Notification(models.Model):
+    """Запись, о которой подписчик ещё не получил письмо-дайджест."""
+    recipient = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="notifications")
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="notifications")
+
+    class Meta:
+        unique_together = ("recipient", "post")
+
+    def __str__(self):
+        return f"{self.recipient_id}: {self.post_id}"
@@ -0,0 +1,110 @@
+"""Письма-дайджесты подписчикам о новых записях авторов.
+
+После публикации задача `collect` раскладывает запись по строкам
+`Notification` получателей, читая подписчиков пачками. Раз в
+NOTIFY_DIGEST_INTERVAL секунд `send_digests` собирает строки каждого
+получателя в одно письмо и отправляет все письма через одно соединение
+с почтовым сервером.
+"""
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.core import mail
+from django.db.models import F, Max
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .models import Follow, Notification, Post
+
+
+def _bulk_add(notifications):
+    Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+
+
+def collect(post_id):
+    """Добавить запись в следующие дайджесты подписчиков её автора."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return
+    batch_size = settings.NOTIFY_BATCH_SIZE
+    recipient_ids = Follow.objects.filter(
+        author_id=post.author_id, user__is_active=True,
+    ).exclude(user__email='').values_list('user_id', flat=True)
+    notifications = []
+    for user_id in recipient_ids.iterator(chunk_size=batch_size):
+        notifications.append(Notification(recipient_id=user_id, post=post))
+        if len(notifications) == batch_size:
+            _bulk_add(notifications)
+            notifications = []
+    _bulk_add(notifications)
+
+
+def forget(user_id, author_id):
+    """Убрать из дайджеста записи автора, от которого отписались."""
+    Notification.objects.filter(
+        recipient_id=user_id, post__author_id=author_id).delete()
+
+
+def digest_message(recipient, posts):
+    limit = settings.NOTIFY_DIGEST_POSTS
+    links = [
+        (post, settings.SITE_URL + reverse(
+            'post', args=[post.author.username, post.pk]))
+        for post in posts[:limit]
+    ]
+    body = render_to_string('posts/email/digest.txt', {
+        'recipient': recipient, 'links': links,
+        'more': max(len(posts) - limit, 0),
+    })
+    return mail.EmailMessage(
+        f'Новые записи авторов, на которых вы подписаны: {len(posts)}',
+        body, to=[recipient.email])
+
+
+def send_digests():
+    """Отправить накопленные дайджесты; вернуть число писем.
+
+    Получатели читаются пачками по NOTIFY_BATCH_SIZE, письма пачки
+    уходят одним `send_messages`, после чего её строки удаляются.
+    """
+    batch_size = settings.NOTIFY_BATCH_SIZE
+    sent, last = 0, 0
+    with mail.get_connection() as connection:
+        while True:
+            recipients = list(
+                Notification.objects.filter(recipient_id__gt=last)
+                .order_by('recipient_id')
+                .values_list('recipient_id', flat=True).distinct()
+                [:batch_size])
+            if not recipients:
+                return sent
+            # Диапазон вместо IN: пачка не упирается в лимит параметров
+            batch = Notification.objects.filter(
+                recipient_id__gte=recipients[0],
+                recipient_id__lte=recipients[-1])
+            last = recipients[-1]
+            # Строки, добавленные во время отправки, ждут следующего раза
+            claimed = batch.aggregate(last=Max('pk'))['last']
+            # Отписку задача follow_deleted обрабатывает позже: записи
+            # авторов, от которых уже отписались, в письмо не попадут
+            notifications = list(batch.filter(
+                post__author__following__user_id=F('recipient_id'),
+            ).select_related(
+                'recipient', 'post__author', 'post__group',
+            ).order_by('recipient_id', '-post__pub_date', '-post_id'))
+            messages = []
+            for _, items in groupby(
+                    notifications, key=attrgetter('recipient_id')):
+                items = list(items)
+                recipient = items[0].recipient
+                # Адрес могли стереть после публикации записи
+                if recipient.email:
+                    messages.append(digest_message(
+                        recipient, [item.post for item in items]))
+            if messages:
+                connection.send_messages(messages)
+                sent += len(messages)
+            # Удаляются и строки, не попавшие в письма: иначе пачка из
+            # одних устаревших строк осталась бы в таблице навсегда
+            batch.filter(pk__lte=claimed).delete()
@@ -0,0 +1,148 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_token(*parts):
+    value = '|'.join(map(str, parts)).encode()
+    return base64.urlsafe_b64encode(value).decode().rstrip('=')
+
+
+def decode_token(token, *types):
+    """Разобрать курсор на части заданных типов или вернуть None."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value = base64.urlsafe_b64decode(padded.encode()).decode()
+        parts = value.rsplit('|', len(types) - 1)
+        if len(parts) != len(types):
+            return None
+        return tuple(convert(part) for convert, part in zip(types, parts))
+    except (ValueError, binascii.Error, UnicodeError):
+        return None
+
+
+def encode_cursor(pub_date, pk):
+    return encode_token(pub_date.isoformat(), pk)
+
+
+def decode_cursor(token):
+    """Вернуть пару (pub_date, pk) или None для испорченного курсора."""
+    cursor = decode_token(token, str, int)
+    if cursor is None:
+        return None
+    pub_date = parse_datetime(cursor[0])
+    if pub_date is None:
+        return None
+    return pub_date, cursor[1]
+
+
+class KeysetPage(Page):
+    """Страница курсорной пагинации.
+
+    Совместима с шаблоном `paginator.html`: вместо номеров страниц
+    отдаёт курсоры `next_cursor` и `previous_cursor`.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Keyset page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator(Paginator):
+    """Пагинация по ключу `(pub_date, id)` без COUNT(*) и OFFSET.
+
+    `keys` — имена полей даты и идентификатора, по которым упорядочена
+    лента (например, аннотации из `posts.timeline.feed_for`).
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'pk')):
+        self.date_key, self.pk_key = keys
+        super().__init__(
+            object_list.order_by(f'-{self.date_key}', f'-{self.pk_key}'),
+            per_page)
+
+    def _filter(self, cursor, lookup):
+        pub_date, pk = cursor
+        return self.object_list.filter(
+            Q(**{f'{self.date_key}__{lookup}': pub_date})
+            | Q(**{self.date_key: pub_date, f'{self.pk_key}__{lookup}': pk}))
+
+    def _after(self, cursor):
+        return self._filter(cursor, 'lt')
+
+    def _before(self, cursor):
+        return self._filter(cursor, 'gt').order_by(self.date_key, self.pk_key)
+
+    def get_page(self, after=None, before=None):
+        before_cursor = decode_cursor(before)
+        after_cursor = decode_cursor(after)
+
+        if before_cursor is not None:
+            rows = list(self._before(before_cursor)[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return self._page(rows, has_next=True, has_previous=has_more)
+
+        if after_cursor is not None:
+            queryset = self._after(after_cursor)
+        else:
+            queryset = self.object_list
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        return self._page(
+            rows[:self.per_page],
+            has_next=has_more,
+            has_previous=after_cursor is not None)
+
+    def _cursor(self, row):
+        # Строки бывают и моделями, и словарями из .values()
+        if isinstance(row, dict):
+            return encode_cursor(row[self.date_key], row[self.pk_key])
+        return encode_cursor(
+            getattr(row, self.date_key), getattr(row, self.pk_key))
+
+    def _page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self._cursor(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self._cursor(rows[0])
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+
+def get_page(request, object_list, view_name, keys=('pub_date', 'pk')):
+    """Вернуть страницу ленты в режиме, заданном для представления.
+
+    Режим берётся из `settings.POSTS_PAGINATION_MODES`: `offset`
+    (номера страниц, `?page=N`) или `keyset` (курсоры `?after=`/`?before=`).
+    """
+    per_page = settings.POSTS_PER_PAGE
+    mode = settings.POSTS_PAGINATION_MODES.get(view_name, 'offset')
+
+    if mode == 'keyset':
+        paginator = KeysetPaginator(object_list, per_page, keys)
+        return paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'))
+
+    paginator = Paginator(object_list, per_page)
+    return paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,142 @@
+"""Полнотекстовый поиск по записям и комментариям на SQLite FTS5.
+
+Индекс `posts_search` хранит по строке на запись (rowid = id записи):
+текст, имя автора и все комментарии. Строки обновляются сигналами,
+ранжирование — bm25 с весами колонок (задан в миграции как `rank`).
+Слова запроса ищутся по префиксу: «кот» найдёт «коты» и «котов».
+"""
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Comment, Post
+from .paginators import KeysetPage, decode_token, encode_token
+
+
+User = get_user_model()
+
+TABLE = 'posts_search'
+
+_WORD = re.compile(r'\w+')
+# Метки подсветки: служебные символы, которых нет в тексте записей
+_START, _END = '\x02', '\x03'
+
+
+def fts_query(text):
+    """Запрос FTS5 из пользовательской строки: все слова, по префиксу."""
+    words = _WORD.findall(text.lower())[:settings.SEARCH_MAX_WORDS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _documents_sql():
+    return (
+        f'SELECT p.id, p.text, u.username, COALESCE(('
+        f'SELECT group_concat(c.text, \' \') '
+        f'FROM {Comment._meta.db_table} c WHERE c.post_id = p.id), \'\') '
+        f'FROM {Post._meta.db_table} p '
+        f'JOIN {User._meta.db_table} u ON u.id = p.author_id')
+
+
+def reindex(post_ids):
+    """Пересобрать строки индекса для записей из списка или подзапроса."""
+    if isinstance(post_ids, QuerySet):
+        condition, params = post_ids.query.sql_with_params()
+    else:
+        params = list(post_ids)
+        if not params:
+            return
+        condition = ', '.join(['%s'] * len(params))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, text, author, comments) '
+            f'{_documents_sql()} WHERE p.id IN ({condition})', params)
+
+
+def remove(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild():
+    """Пересобрать весь индекс, вернуть число записей в нём."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text, author, comments) '
+            f'{_documents_sql()}')
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def matching_ids(text):
+    """Подзапрос id записей, подходящих под запрос (для ORM и админки)."""
+    return RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        [fts_query(text) or '""'])
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet).replace(_START, '<mark>').replace(_END, '</mark>'))
+
+
+def _rows(query, cursor, backwards, limit):
+    sql = (
+        f'SELECT rowid, rank, snippet({TABLE}, -1, %s, %s, %s, %s) '
+        f'FROM {TABLE} WHERE {TABLE} MATCH %s')
+    params = [_START, _END, '…', settings.SEARCH_SNIPPET_TOKENS, query]
+    if cursor is not None:
+        sql += f' AND (rank, rowid) {"<" if backwards else ">"} (%s, %s)'
+        params.extend(cursor)
+    order = 'DESC' if backwards else 'ASC'
+    sql += f' ORDER BY rank {order}, rowid {order} LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        return db_cursor.fetchall()
+
+
+def _cursor(row):
+    return encode_token(repr(row[1]), row[0])
+
+
+def search_page(text, after=None, before=None):
+    """Страница результатов: записи с атрибутами `search_snippet`.
+
+    Результаты упорядочены по релевантности; курсоры — пара (rank, id).
+    """
+    per_page = settings.POSTS_PER_PAGE
+    query = fts_query(text)
+    if not query:
+        return KeysetPage([], None)
+
+    before_cursor = decode_token(before, float, int)
+    after_cursor = decode_token(after, float, int)
+    if before_cursor is not None:
+        rows = _rows(query, before_cursor, True, per_page + 1)
+        has_previous, has_next = len(rows) > per_page, True
+        rows = rows[:per_page][::-1]
+    else:
+        rows = _rows(query, after_cursor, False, per_page + 1)
+        has_previous = after_cursor is not None
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+
+    posts = Post.objects.for_feed().in_bulk([row[0] for row in rows])
+    results = []
+    for post_id, rank, snippet in rows:
+        post = posts.get(post_id)
+        if post is not None:
+            post.search_snippet = highlight(snippet)
+            results.append(post)
+    return KeysetPage(
+        results, None,
+        next_cursor=_cursor(rows[-1]) if rows and has_next else None,
+        previous_cursor=_cursor(rows[0]) if rows and has_previous else None)
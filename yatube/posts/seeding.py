@@ -0,0 +1,207 @@
+import bisect
+import io
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+WORDS = (
+    'лето город море книга друг утро вечер дорога дом сад кот собака '
+    'песня кофе чай поезд гора река лес снег дождь солнце ветер небо '
+    'работа отпуск фото код идея проект встреча музыка фильм'
+).split()
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_dates():
+    """Позволить bulk_create сохранить заданные pub_date и created."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class PowerLaw:
+    """Выбор из диапазона id с весами 1 / rank ** alpha (закон Ципфа)."""
+
+    def __init__(self, rng, ids, alpha):
+        self.rng = rng
+        self.ids = ids
+        total = 0.0
+        self.cumulative = []
+        for rank in range(len(ids)):
+            total += 1 / (rank + 1) ** alpha
+            self.cumulative.append(total)
+        self.total = total
+
+    def choice(self):
+        point = self.rng.random() * self.total
+        return self.ids[bisect.bisect(self.cumulative, point)]
+
+
+class Seeder:
+    def __init__(self, seed=0, batch_size=5000, prefix='seed-', alpha=1.1,
+                 log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.alpha = alpha
+        self.log = log or (lambda message: None)
+
+    def _insert(self, model, objects):
+        """Вставить объекты пачками и вернуть их id по порядку вставки.
+
+        SQLite в Django 2.2 не возвращает id из bulk_create. Транзакция
+        держит блокировку записи (yatube/db_backend/), и поле id —
+        AUTOINCREMENT, поэтому новые строки — ровно строки с id больше
+        прежнего максимума, даже если в занятых id есть пропуски.
+        """
+        ids = []
+        total = 0
+        with transaction.atomic():
+            last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            for batch in batched(objects, self.batch_size):
+                created = model.objects.bulk_create(batch)
+                ids.extend(obj.pk for obj in created if obj.pk is not None)
+                total += len(batch)
+            if len(ids) < total:
+                ids = list(model.objects.filter(pk__gt=last).order_by(
+                    'pk').values_list('pk', flat=True))
+        self.log(f'{model.__name__}: {total}')
+        return ids
+
+    def _numbers(self, count, taken, name):
+        """`count` номеров, для которых имя `name(number)` ещё свободно."""
+        taken = set(taken)
+        numbers = itertools.count()
+        return itertools.islice(
+            (number for number in numbers if name(number) not in taken),
+            count)
+
+    def users(self, count):
+        password = make_password('yatube-seed')
+        numbers = self._numbers(
+            count,
+            User.objects.filter(username__startswith=self.prefix).values_list(
+                'username', flat=True),
+            lambda number: f'{self.prefix}{number}')
+        return self._insert(User, (
+            User(
+                username=f'{self.prefix}{number}',
+                email=f'{self.prefix}{number}@example.com',
+                password=password,
+            )
+            for number in numbers
+        ))
+
+    def groups(self, count):
+        numbers = self._numbers(
+            count,
+            Group.objects.filter(slug__startswith=self.prefix).values_list(
+                'slug', flat=True),
+            lambda number: f'{self.prefix}group-{number}')
+        return self._insert(Group, (
+            Group(
+                title=f'Группа {number}',
+                slug=f'{self.prefix}group-{number}',
+                description='Сгенерированная группа',
+            )
+            for number in numbers
+        ))
+
+    def images(self, count):
+        from PIL import Image
+
+        names = []
+        for x in range(count):
+            color = tuple(self.rng.randrange(256) for channel in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', (960, 540), color).save(buffer, 'JPEG')
+            names.append(Post.image.field.storage.save(
+                f'posts/{self.prefix}{x}.jpg', ContentFile(buffer.getvalue())))
+        return names
+
+    def posts(self, count, user_ids, group_ids, images=()):
+        authors = PowerLaw(self.rng, user_ids, self.alpha)
+        groups = list(group_ids) + [None]
+        step = timedelta(days=365) / max(count, 1)
+
+        def generate():
+            for x in range(count):
+                yield Post(
+                    text=f'Запись {x}: ' + ' '.join(
+                        self.rng.choices(WORDS, k=self.rng.randint(5, 40))),
+                    pub_date=START + step * x,
+                    author_id=authors.choice(),
+                    group_id=self.rng.choice(groups),
+                    image=self.rng.choice(images) if images else None,
+                )
+
+        with explicit_dates():
+            return self._insert(Post, generate())
+
+    def comments(self, count, user_ids, post_ids):
+        posts = PowerLaw(self.rng, post_ids[::-1], self.alpha / 2)
+
+        def generate():
+            for x in range(count):
+                yield Comment(
+                    post_id=posts.choice(),
+                    author_id=self.rng.choice(user_ids),
+                    text=' '.join(self.rng.choices(WORDS, k=8)),
+                    created=START + timedelta(minutes=x),
+                )
+
+        with explicit_dates():
+            self._insert(Comment, generate())
+
+    def follows(self, per_user, user_ids):
+        authors = PowerLaw(self.rng, user_ids, self.alpha)
+
+        def generate():
+            for user_id in user_ids:
+                # Число подписок тоже с тяжёлым хвостом
+                wanted = min(
+                    int(self.rng.paretovariate(1.5) * per_user / 3),
+                    len(user_ids) - 1)
+                chosen = set()
+                for attempt in range(wanted * 2):
+                    if len(chosen) >= wanted:
+                        break
+                    author_id = authors.choice()
+                    if author_id != user_id:
+                        chosen.add(author_id)
+                for author_id in sorted(chosen):
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self._insert(Follow, generate())
@@ -0,0 +1,192 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+
+from . import events, feed_cache, media, search, tasks, variants
+from .models import Comment, Follow, Group, Post, UserStats
+
+
+User = get_user_model()
+
+
+def touch_pages(group_ids=(), author_ids=()):
+    """Поднять версии групп и авторов — валидаторы их страниц.
+
+    Версии лежат в базе, а не в кэше: условный GET в любом процессе
+    видит изменение (posts/conditional.py).
+    """
+    if group_ids:
+        Group.objects.filter(pk__in=group_ids).update(
+            version=F('version') + 1)
+    if author_ids:
+        UserStats.objects.filter(user_id__in=author_ids).update(
+            version=F('version') + 1)
+
+
+def invalidate_feeds(group_ids=(), post_ids=(), author_ids=()):
+    """Сбросить кэш главной и лент перечисленных групп.
+
+    Страницы записей, групп и профилей авторов из списков получают
+    новые валидаторы условных GET.
+    """
+    group_ids = [pk for pk in group_ids if pk is not None]
+    slugs = []
+    if group_ids:
+        slugs = Group.objects.filter(pk__in=group_ids).values_list(
+            'slug', flat=True)
+    touch_pages(group_ids, author_ids)
+    feed_cache.bump(
+        'index',
+        *map(feed_cache.group_scope, slugs),
+        *map(feed_cache.post_scope, post_ids),
+        *map(feed_cache.author_scope, author_ids))
+
+
+def invalidate_post(post_id):
+    """Сбросить ленты и страницы, на которых видна карточка записи."""
+    post = Post.objects.filter(pk=post_id).values(
+        'group_id', 'author_id').first()
+    if post is not None:
+        invalidate_feeds(
+            [post['group_id']], [post_id], [post['author_id']])
+
+
+def invalidate_group(group):
+    # Название группы выводится и в профилях авторов её записей
+    authors = Post.objects.filter(group=group).values_list(
+        'author_id', flat=True).distinct()
+    touch_pages([group.pk], authors)
+    feed_cache.bump(
+        'index', feed_cache.group_scope(group.slug),
+        *map(feed_cache.author_scope, authors))
+
+
+def touch_posts(**filters):
+    """Сбросить кэш карточек записей, подняв их версию."""
+    Post.objects.filter(**filters).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, raw=False, update_fields=None,
+                 **kwargs):
+    # Вход пользователя сохраняет только last_login, карточки не меняются
+    if created or raw or (update_fields and 'username' not in update_fields):
+        return
+    touch_posts(author=instance)
+    invalidate_feeds(
+        instance.posts.values_list('group_id', flat=True).distinct(),
+        post_ids=instance.comments.values_list(
+            'post_id', flat=True).distinct(),
+        author_ids=[instance.pk])
+    search.reindex(instance.posts.values('pk'))
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        touch_posts(group=instance)
+        invalidate_group(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    touch_posts(group=instance)
+    invalidate_group(instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        instance.version += 1
+        previous = Post.objects.filter(pk=instance.pk).values(
+            'group_id', 'image', 'image_variants').first() or {}
+        instance._previous_group_ids = [previous.get('group_id')]
+        instance._previous_state = previous
+        if previous and (instance.image.name or '') == (
+                previous['image'] or ''):
+            # Варианты пишет задача в обход save(): не затираем их
+            # устаревшим значением, иначе ссылки на них разойдутся
+            instance.image_variants = previous['image_variants']
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue(tasks.post_created, instance.pk, instance.author_id)
+        enqueue(tasks.notify_followers, instance.pk)
+        events.publish_post(instance)
+    if not raw:
+        previous = getattr(instance, '_previous_state', {})
+        image = instance.image.name or ''
+        if image != (previous.get('image') or ''):
+            media.acquire(image)
+            media.release_image(
+                previous.get('image'), previous.get('image_variants'))
+        tasks.reindex_later(instance.pk)
+        if instance.image and not variants.loads(instance):
+            tasks.build_variants_later(instance.pk)
+        invalidate_feeds(
+            [instance.group_id, *getattr(
+                instance, '_previous_group_ids', ())],
+            post_ids=[instance.pk], author_ids=[instance.author_id])
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    if instance.image:
+        # Варианты могли собраться уже после загрузки экземпляра
+        instance.image_variants = Post.objects.filter(
+            pk=instance.pk).values_list(
+            'image_variants', flat=True).first() or ''
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    enqueue(tasks.post_deleted, instance.author_id,
+            key=f'post-deleted:{instance.author_id}')
+    media.release_image(instance.image.name, instance.image_variants)
+    search.remove(instance.pk)
+    invalidate_feeds(
+        [instance.group_id], post_ids=[instance.pk],
+        author_ids=[instance.author_id])
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue(tasks.comment_created, instance.post_id)
+        events.publish_comment(instance)
+    if not raw:
+        tasks.reindex_later(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    # Удаление записи удаляет и её комментарии: пересчёт — один на запись
+    enqueue(tasks.comment_deleted, instance.post_id,
+            key=f'comment-deleted:{instance.post_id}')
+    tasks.reindex_later(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Кнопка подписки в профиле меняется сразу, счётчики — в задаче
+        touch_pages(author_ids=[instance.author_id])
+        enqueue(tasks.follow_created, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    touch_pages(author_ids=[instance.author_id])
+    enqueue(tasks.follow_deleted, instance.user_id, instance.author_id)
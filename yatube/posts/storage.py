@@ -0,0 +1,40 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — SHA-256 его содержимого.
+
+    `posts/photo.jpg` сохраняется как `posts/ab/cdef….jpg`; повторная
+    загрузка того же содержимого не пишет файл заново, а возвращает уже
+    существующее имя. Сколько записей ссылается на файл, считает
+    posts/media.py.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:] + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # Занятое имя означает то же содержимое, а не конфликт
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if not self.exists(name):
+            # Пишем под временным именем и атомарно переносим: одновременная
+            # загрузка того же файла перезапишет его тем же содержимым
+            partial = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+            os.replace(self.path(partial), self.path(name))
+        return name.replace('\\', '/')
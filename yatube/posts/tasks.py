@@ -0,0 +1,128 @@
+"""Отложенные побочные эффекты записей, комментариев и подписок.
+
+В запросе сигналы posts/signals.py делают только то, что нужно сразу:
+сбрасывают кэш лент, публикуют события и ведут учёт файлов картинок.
+Счётчики, ленты подписок, поисковый индекс, варианты картинок и письма
+подписчикам обновляют эти задачи (jobs/queue.py) — и при создании, и при
+удалении. Задачи пересчитывают счётчики по исходным таблицам, а не
+меняют их на разницу: результат не зависит от порядка выполнения и
+повторов.
+"""
+from django.conf import settings
+
+from jobs.queue import enqueue, task
+
+from . import (
+    counters, feed_cache, notifications, search, thumbnails, timeline)
+from .models import Follow, Post
+
+
+@task(atomic=True)
+def post_created(post_id, author_id):
+    counters.rebuild_user_stats([author_id])
+    # В запросе лента раскладывается одной пачкой, большие рассылки
+    # выполняют воркеры и при TASKS_EAGER
+    if timeline.followers(author_id) > settings.TIMELINE_BATCH_SIZE:
+        enqueue(fan_out_post, post_id, key=f'fan-out:{post_id}')
+    else:
+        fan_out_post(post_id)
+    feed_cache.bump(feed_cache.author_scope(author_id))
+
+
+@task(atomic=True, eager=False)
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        timeline.fan_out_post(post)
+
+
+@task(atomic=True)
+def post_deleted(author_id):
+    counters.rebuild_user_stats([author_id], create=False)
+    feed_cache.bump(feed_cache.author_scope(author_id))
+
+
+@task(atomic=True)
+def comment_created(post_id):
+    from .signals import invalidate_post
+    counters.recount_comments(post_id)
+    invalidate_post(post_id)
+
+
+@task(atomic=True)
+def comment_deleted(post_id):
+    comment_created(post_id)
+
+
+@task(atomic=True)
+def follow_created(user_id, author_id):
+    counters.rebuild_user_stats([author_id, user_id])
+    # Отписка до выполнения задачи уже почистила ленту
+    if not timeline.is_pulled_author(author_id) and Follow.objects.filter(
+            user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
+    feed_cache.bump(
+        feed_cache.author_scope(author_id), feed_cache.author_scope(user_id))
+
+
+@task(atomic=True)
+def follow_deleted(user_id, author_id):
+    was_pulled = timeline.is_pulled_author(author_id)
+    counters.rebuild_user_stats([author_id, user_id], create=False)
+    # Подписка заново до выполнения задачи уже заполнила ленту
+    if not Follow.objects.filter(
+            user_id=user_id, author_id=author_id).exists():
+        timeline.prune(user_id, author_id)
+        notifications.forget(user_id, author_id)
+    if was_pulled and not timeline.is_pulled_author(author_id):
+        enqueue(refill_timelines, author_id, key=f'refill:{author_id}')
+    feed_cache.bump(
+        feed_cache.author_scope(author_id), feed_cache.author_scope(user_id))
+
+
+# Ленты всех подписчиков заполняются пачками в своих транзакциях и
+# не в запросе, даже при TASKS_EAGER
+@task(eager=False)
+def refill_timelines(author_id):
+    timeline.refill(author_id)
+    feed_cache.bump(feed_cache.author_scope(author_id))
+
+
+@task(atomic=True)
+def reindex_post(post_id):
+    search.reindex([post_id])
+
+
+@task()
+def build_variants(post_id):
+    thumbnails.build_variants(post_id)
+
+
+# Рассылка не выполняется в запросе и при TASKS_EAGER: без воркеров её
+# задачи выполняет manage.py send_digests
+@task(eager=False)
+def notify_followers(post_id):
+    notifications.collect(post_id)
+    # Ключ склеивает рассылку: письма новых записей уйдут одним дайджестом
+    enqueue(send_digests, key='digests',
+            delay=settings.NOTIFY_DIGEST_INTERVAL)
+
+
+@task(eager=False)
+def send_digests():
+    notifications.send_digests()
+
+
+NOTIFY_TASKS = [notify_followers.task_name, send_digests.task_name]
+
+
+def reindex_later(post_id):
+    enqueue(reindex_post, post_id, key=f'reindex:{post_id}')
+
+
+def build_variants_later(post_id):
+    if settings.TASKS_EAGER:
+        # Без воркеров картинки по-прежнему собирает пул потоков
+        thumbnails.enqueue(thumbnails.build_variants, post_id)
+    else:
+        enqueue(build_variants, post_id, key=f'variants:{post_id}')
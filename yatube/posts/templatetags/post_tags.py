@@ -0,0 +1,23 @@
+from django import template
+
+from posts import thumbnails, variants
+
+
+register = template.Library()
+
+
+@register.filter
+def is_author(post, user):
+    return post.author_id == user.pk
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(post):
+    """Картинка карточки: <picture> из готовых вариантов или заглушка."""
+    ready = variants.loads(post)
+    if post.image and not ready:
+        thumbnails.enqueue(thumbnails.build_variants, post.pk)
+    return {
+        'post': post,
+        'picture': variants.picture(ready) if ready else None,
+    }
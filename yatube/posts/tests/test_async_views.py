@@ -0,0 +1,165 @@
+import asyncio
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from yatube.asgi_bridge import AsyncViews
+from yatube.metrics import registry
+
+from .. import async_views
+from ..models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+def exchange(application, path, method='GET', headers=()):
+    """Выполнить запрос к ASGI-приложению и вернуть отправленное."""
+    async def scenario():
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type': 'http', 'method': method, 'path': path,
+            'query_string': b'', 'headers': list(headers),
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+        }
+        await application(scope, receive, send)
+        return messages
+    return asyncio.run(scenario())
+
+
+def call(application, path, headers=()):
+    """Код, заголовки и тело ответа."""
+    messages = exchange(application, path, headers=headers)
+    headers = {
+        name.decode(): value.decode()
+        for name, value in messages[0]['headers'] if name != b'set-cookie'
+    }
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return messages[0]['status'], headers, body
+
+
+# Без пула: потоки пула не видят данных незавершённой транзакции теста
+@override_settings(ASYNC_DB_THREADS=0)
+class AsyncViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='test-group', slug='test-slug')
+        cls.post = Post.objects.create(
+            text='test-post', author=cls.user, group=cls.group)
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='test-comment')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.fallback = mock.AsyncMock()
+        self.application = AsyncViews(
+            async_views.VIEWS, async_views.run_db, fallback=self.fallback)
+        self.urls = {
+            'index': reverse('index'),
+            'group': reverse('group_posts', kwargs={'slug': 'test-slug'}),
+            'profile': reverse('profile', kwargs={'username': 'test-user'}),
+            'post': reverse('post', kwargs={
+                'username': 'test-user', 'post_id': self.post.pk}),
+        }
+
+    def test_same_pages_as_sync_views(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                expected = Client().get(url)
+                status, headers, body = call(self.application, url)
+                self.assertEqual(status, 200)
+                self.assertEqual(body, expected.content)
+                self.assertEqual(headers.get('etag'), expected.get('ETag'))
+        self.fallback.assert_not_called()
+
+    def test_not_modified(self):
+        for name in ('group', 'profile', 'post'):
+            with self.subTest(page=name):
+                url = self.urls[name]
+                etag = Client().get(url)['ETag']
+                status, _, body = call(
+                    self.application, url,
+                    headers=[(b'if-none-match', etag.encode())])
+                self.assertEqual(status, 304)
+                self.assertEqual(body, b'')
+
+    def test_missing_pages(self):
+        for url in ('/nobody/', f'/nobody/{self.post.pk}/',
+                    f'/reader/{self.post.pk}/'):
+            with self.subTest(url=url):
+                status, _, _ = call(self.application, url)
+                self.assertEqual(status, 404)
+
+    def test_session_user(self):
+        client = Client()
+        client.force_login(self.reader)
+        cookie = f"sessionid={client.cookies['sessionid'].value}"
+        for name in ('profile', 'post'):
+            with self.subTest(page=name):
+                status, _, body = call(
+                    self.application, self.urls[name],
+                    headers=[(b'cookie', cookie.encode())])
+                self.assertEqual(status, 200)
+                self.assertIn('Отписаться'.encode(), body)
+
+    def test_other_requests_go_to_fallback(self):
+        exchange(self.application, self.urls['post'], method='POST')
+        exchange(self.application, reverse('new_post'))
+        exchange(self.application, '/no/such/page/')
+        self.assertEqual(self.fallback.await_count, 3)
+
+
+class BenchAsgiTests(TransactionTestCase):
+    def test_reports_both_paths(self):
+        user = User.objects.create_user(username='test-user')
+        group = Group.objects.create(title='test-group', slug='test-slug')
+        Post.objects.create(text='test-post', author=user, group=group)
+        out = StringIO()
+        call_command(
+            'bench_asgi', requests=8, concurrency=[1, 2], threads=2,
+            db_latency=0, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            [line.split(':')[0].split() for line in lines],
+            [['WSGI', 'x1'], ['ASGI', 'x1'], ['WSGI', 'x2'], ['ASGI', 'x2']])
+        for line in lines:
+            self.assertIn('ошибок 0', line)
+
+
+class AsyncMetricsTests(TransactionTestCase):
+    def test_pool_work_is_measured(self):
+        Post.objects.create(
+            text='test-post',
+            author=User.objects.create_user(username='test-user'))
+        cache.clear()
+        registry.reset()
+        application = AsyncViews(
+            async_views.VIEWS, async_views.run_db,
+            fallback=mock.AsyncMock())
+        status, _, _ = call(application, reverse('index'))
+        self.assertEqual(status, 200)
+
+        # Запросы к базе выполнялись в потоках пула
+        text = registry.render()
+        self.assertRegex(
+            text, r'yatube_request_queries_sum\{view="index"\} [1-9]')
+        self.assertRegex(
+            text, r'yatube_template_render_seconds_total\{view="index"\} '
+                  r'[0-9.e-]*[1-9]')
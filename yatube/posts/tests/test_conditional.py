@@ -0,0 +1,136 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='test-group', slug='test-slug')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='test-post', author=self.user, group=self.group)
+        self.other_post = Post.objects.create(
+            text='other-post', author=self.reader)
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        self.urls = {
+            'post': reverse('post', kwargs={
+                'username': 'test-user', 'post_id': self.post.pk}),
+            'profile': reverse('profile', kwargs={'username': 'test-user'}),
+            'group': reverse('group_posts', kwargs={'slug': 'test-slug'}),
+        }
+
+    def etags(self, client=None):
+        client = client or self.guest_client
+        return {
+            name: client.get(url)['ETag'] for name, url in self.urls.items()
+        }
+
+    def test_not_modified(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                repeated = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(repeated.status_code, 304)
+
+    # Проверка валидатора стоит одного запроса
+    def test_validator_cost(self):
+        etags = self.etags()
+        for name, url in self.urls.items():
+            with self.subTest(page=name), self.assertNumQueries(1):
+                self.guest_client.get(url, HTTP_IF_NONE_MATCH=etags[name])
+
+    def test_changes_update_validators(self):
+        changes = {
+            'comment': lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='test-comment'),
+            'edit': lambda: Post.objects.get(pk=self.post.pk).save(),
+            'follow': lambda: Follow.objects.create(
+                user=self.reader, author=self.user),
+            'new post': lambda: Post.objects.create(
+                text='new-post', author=self.user, group=self.group),
+            'delete': lambda: Post.objects.filter(text='new-post').delete(),
+        }
+        for change, apply in changes.items():
+            with self.subTest(change=change):
+                before = self.etags()
+                apply()
+                after = self.etags()
+                for name in ('post', 'profile', 'group'):
+                    if change == 'follow' and name == 'group':
+                        continue
+                    self.assertNotEqual(before[name], after[name], name)
+
+    def test_unrelated_change(self):
+        before = self.etags()
+        Comment.objects.create(
+            post=self.other_post, author=self.user, text='test-comment')
+        self.assertEqual(self.etags(), before)
+
+    # Валидаторы берутся из базы и одинаковы во всех процессах: правка
+    # в другом воркере не трогает кэш этого
+    def test_change_in_another_process(self):
+        url = self.urls['post']
+        etag = self.guest_client.get(url)['ETag']
+        with mock.patch('posts.feed_cache.bump'):
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='test-comment')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'test-comment')
+
+        etag = response['ETag']
+        cache.clear()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    # Версии группы и автора тоже лежат в базе
+    def test_versions_change_without_cache(self):
+        before = self.etags()
+        with mock.patch('posts.feed_cache.bump'):
+            Post.objects.create(
+                text='new-post', author=self.user, group=self.group)
+        after = self.etags()
+        for name in ('profile', 'group'):
+            self.assertNotEqual(before[name], after[name], name)
+
+    # Кнопка подписки меняется до того, как задачи пересчитают счётчики
+    @override_settings(TASKS_EAGER=False)
+    def test_follow_changes_profile_before_tasks(self):
+        before = self.etags(self.authorized_client)
+        Follow.objects.create(user=self.reader, author=self.user)
+        after = self.etags(self.authorized_client)
+        self.assertNotEqual(before['profile'], after['profile'])
+        Follow.objects.filter(user=self.reader, author=self.user).delete()
+        self.assertNotEqual(
+            after['profile'], self.etags(self.authorized_client)['profile'])
+
+    # Меню и кнопка подписки зависят от пользователя
+    def test_viewer_in_etag(self):
+        guest = self.etags()
+        reader = self.etags(self.authorized_client)
+        for name in self.urls:
+            self.assertNotEqual(guest[name], reader[name])
+
+    def test_missing_page(self):
+        response = self.guest_client.get(reverse('post', kwargs={
+            'username': 'reader', 'post_id': self.post.pk}))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
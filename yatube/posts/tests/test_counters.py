@@ -0,0 +1,67 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from ..models import Comment, Follow, Post, UserStats
+
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.userTwo = User.objects.create_user(username='test-user-2')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        post = Post.objects.create(text='test-post', author=self.user)
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+
+        comment = Comment.objects.create(
+            post=post, author=self.userTwo, text='test')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+        post.delete()
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+
+    def test_follow_counters(self):
+        Follow.objects.create(user=self.userTwo, author=self.user)
+        self.assertEqual(self.stats(self.user).followers_count, 1)
+        self.assertEqual(self.stats(self.userTwo).following_count, 1)
+
+        Follow.objects.filter(user=self.userTwo).delete()
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+        self.assertEqual(self.stats(self.userTwo).following_count, 0)
+
+    def test_missing_stats_row_is_rebuilt(self):
+        Post.objects.create(text='test-post', author=self.user)
+        UserStats.objects.filter(user=self.user).delete()
+        Post.objects.create(text='test-post', author=self.user)
+        self.assertEqual(self.stats(self.user).posts_count, 2)
+
+    def test_rebuild_command(self):
+        post = Post.objects.create(text='test-post', author=self.user)
+        Comment.objects.create(post=post, author=self.user, text='test')
+        UserStats.objects.filter(user=self.user).update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(comment_count=5)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--check', stdout=StringIO())
+
+        call_command('rebuild_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(post.comment_count, 1)
+        call_command('rebuild_counters', '--check', stdout=StringIO())
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import events
+from ..models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+def run_stream(query, publish):
+    """Открыть поток событий, вызвать `publish` и вернуть полученное."""
+    async def scenario():
+        disconnect = asyncio.Event()
+        messages = []
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            # Ответ начат и прислан retry: подписка уже есть
+            if len(messages) == 2:
+                thread = threading.Thread(target=publish)
+                thread.start()
+                thread.join()
+            elif len(messages) > 2:
+                disconnect.set()
+
+        scope = {'type': 'http', 'path': '/events/', 'headers': [],
+                 'query_string': query.encode()}
+        await asyncio.wait_for(events.stream(scope, receive, send), 5)
+        return messages
+    return asyncio.run(scenario())
+
+
+class EventPublishTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.group = Group.objects.create(title='test-group', slug='test-slug')
+
+    def setUp(self):
+        # В TestCase коммита нет: публикуем сразу
+        patcher = mock.patch.object(
+            events.transaction, 'on_commit', lambda callback: callback())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(events, 'broker')
+        self.broker = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_new_post(self):
+        post = Post.objects.create(
+            text='test-post', author=self.user, group=self.group)
+        self.broker.publish.assert_called_once_with(
+            ['index', f'author:{self.user.pk}', 'group:test-slug'],
+            {'type': 'post', 'id': post.pk, 'author': 'test-user',
+             'group': 'test-slug'})
+
+        # Правка записи — не новое событие
+        self.broker.publish.reset_mock()
+        post.save()
+        self.broker.publish.assert_not_called()
+
+    def test_new_comment(self):
+        post = Post.objects.create(text='test-post', author=self.user)
+        self.broker.publish.reset_mock()
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='test-comment')
+        self.broker.publish.assert_called_once_with(
+            [f'post:{post.pk}'],
+            {'type': 'comment', 'id': comment.pk, 'post': post.pk,
+             'author': 'test-user'})
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.broker = events.LocalBroker()
+        patcher = mock.patch.object(
+            events, 'broker', return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stream_delivers_events(self):
+        messages = run_stream(
+            'channel=group:cats&channel=index',
+            lambda: self.broker.publish(['index'], {'type': 'post', 'id': 1}))
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn(
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            messages[0]['headers'])
+        self.assertTrue(messages[1]['body'].startswith(b'retry: '))
+        event, data = messages[2]['body'].decode().strip().split('\n')
+        self.assertEqual(event, 'event: post')
+        self.assertEqual(json.loads(data[len('data: '):]),
+                         {'type': 'post', 'id': 1})
+        # Отключившийся клиент отписан
+        self.assertFalse(self.broker._subscriptions)
+
+    def test_other_channels_are_not_delivered(self):
+        with self.settings(EVENTS_KEEPALIVE=0.05):
+            messages = run_stream(
+                'channel=index',
+                lambda: self.broker.publish(['group:cats'], {'type': 'post'}))
+        self.assertEqual(messages[2]['body'], b': keepalive\n\n')
+
+    def test_no_channels(self):
+        messages = run_stream('channel=../etc&channel=', lambda: None)
+        self.assertEqual(messages[0]['status'], 204)
+
+    def test_slow_client_drops_old_events(self):
+        async def scenario():
+            subscription = self.broker.subscribe(['index'])
+            for number in range(3):
+                subscription._put({'id': number})
+            return [(await subscription.get())['id'] for _ in range(2)]
+
+        with self.settings(EVENTS_QUEUE_SIZE=2):
+            self.assertEqual(asyncio.run(scenario()), [1, 2])
+
+
+class FollowChannelsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @mock.patch.object(events, 'close_old_connections')
+    def test_followed_channels(self, close):
+        client = Client()
+        client.force_login(self.user)
+        cookie = f"sessionid={client.cookies['sessionid'].value}"
+        self.assertEqual(
+            events.followed_channels([(b'cookie', cookie.encode())]),
+            [f'author:{self.author.pk}'])
+        self.assertEqual(events.followed_channels([]), [])
+        close.assert_called()
+
+    # Под WSGI браузер получает 204 и не переподключается
+    def test_wsgi_fallback(self):
+        response = Client().get(reverse('events'), {'channel': 'index'})
+        self.assertEqual(response.status_code, 204)
+
+    def test_feed_subscribes_to_channel(self):
+        response = Client().get(reverse('index'))
+        self.assertContains(response, '/events/?channel=index')
@@ -84,7 +84,8 @@ class FormTests(TestCase):
             Post.objects.filter(
                 text='test-post',
                 author=self.user,
-                image='posts/small.gif',
+                image__startswith='posts/',
+                image__endswith='.gif',
             ).exists())
 
     def test_edit_post(self):
@@ -127,5 +128,6 @@ class FormTests(TestCase):
             Post.objects.filter(
                 text='test-post-edit',
                 author=self.user,
-                image='posts/small-2.gif',
+                image__startswith='posts/',
+                image__endswith='.gif',
             ).exists())
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from .. import media, thumbnails, variants
+from ..models import MediaFile, Post
+from .test_thumbnails import jpeg
+
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.other = User.objects.create_user(username='test-user-2')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.first = Post.objects.create(
+            text='first', author=self.user, image=jpeg('mine.jpg'))
+        self.second = Post.objects.create(
+            text='second', author=self.other, image=jpeg('repost.jpg'))
+        self.name = self.first.image.name
+
+    def refs(self, name):
+        media_file = MediaFile.objects.filter(name=name).first()
+        return media_file.refs if media_file else 0
+
+    def test_identical_uploads_share_file(self):
+        self.assertEqual(self.second.image.name, self.name)
+        self.assertTrue(self.name.startswith('posts/'))
+        self.assertTrue(self.name.endswith('.jpg'))
+        self.assertEqual(self.refs(self.name), 2)
+        folder = os.path.dirname(self.first.image.path)
+        self.assertEqual(os.listdir(folder), [os.path.basename(self.name)])
+
+    def test_file_is_removed_with_last_reference(self):
+        thumbnails.build_variants(self.first.pk)
+        thumbnails.build_variants(self.second.pk)
+        self.first.refresh_from_db()
+        built = media.variant_names(self.first.image_variants)
+        path = self.first.image.path
+
+        self.first.delete()
+        self.assertEqual(self.refs(self.name), 1)
+        self.assertFalse(media.collect(self.name))
+        self.assertTrue(os.path.exists(path))
+
+        # Вызов collect() выполняется после коммита, в тесте — вручную
+        self.second.delete()
+        self.assertEqual(self.refs(self.name), 0)
+        self.assertTrue(media.collect(self.name))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaFile.objects.filter(name=self.name).exists())
+        for name in built:
+            with self.subTest(variant=name):
+                self.assertEqual(self.refs(name), 0)
+                self.assertTrue(media.collect(name))
+                self.assertFalse(Post.image.field.storage.exists(name))
+
+    # Варианты считаются по записям, как и сами картинки
+    def test_variant_refs(self):
+        thumbnails.build_variants(self.first.pk)
+        thumbnails.build_variants(self.second.pk)
+        self.first.refresh_from_db()
+        built = media.variant_names(self.first.image_variants)
+        self.assertTrue(built)
+        for name in built:
+            self.assertEqual(self.refs(name), 2)
+
+        # Правка текста не трогает варианты, замена картинки их отпускает
+        self.first.text = 'edited'
+        self.first.save()
+        self.assertEqual(self.refs(built[0]), 2)
+        self.first.image = jpeg('new.jpg', size=(640, 480))
+        self.first.save()
+        self.assertEqual(self.refs(built[0]), 1)
+        self.first.delete()
+        self.assertEqual(self.refs(built[0]), 1)
+
+    # Файл удалили до того, как новая запись взяла на него ссылку:
+    # сборка записывает его заново
+    def test_collected_variant_is_stored_again(self):
+        thumbnails.build_variants(self.first.pk)
+        self.first.refresh_from_db()
+        built = media.variant_names(self.first.image_variants)
+        self.first.delete()
+        self.second.delete()
+        for name in built:
+            media.collect(name)
+        third = Post.objects.create(
+            text='third', author=self.user, image=jpeg('again.jpg'))
+        self.assertTrue(thumbnails.build_variants(third.pk))
+        third.refresh_from_db()
+        self.assertEqual(media.variant_names(third.image_variants), built)
+        for name in built:
+            with self.subTest(variant=name):
+                self.assertEqual(self.refs(name), 1)
+                self.assertTrue(Post.image.field.storage.exists(name))
+
+    def test_new_image_releases_old(self):
+        self.first.image = jpeg('new.jpg', size=(640, 480))
+        self.first.save()
+        self.assertEqual(self.refs(self.name), 1)
+        self.assertEqual(self.refs(self.first.image.name), 1)
+
+    def test_variants_are_built_once(self):
+        self.assertTrue(thumbnails.build_variants(self.first.pk))
+        with mock.patch.object(variants, 'render') as render:
+            self.assertTrue(thumbnails.build_variants(self.second.pk))
+        render.assert_not_called()
+        self.second.refresh_from_db()
+        self.assertTrue(variants.loads(self.second))
+
+    def test_rebuild_refs(self):
+        MediaFile.objects.filter(name=self.name).update(refs=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', check=True, stdout=StringIO())
+        self.assertEqual(media.rebuild_refs(), 1)
+        self.assertEqual(self.refs(self.name), 2)
+
+        thumbnails.build_variants(self.first.pk)
+        self.first.refresh_from_db()
+        variant = media.variant_names(self.first.image_variants)[0]
+        MediaFile.objects.filter(name=variant).delete()
+        self.assertEqual(media.rebuild_refs(), 1)
+        self.assertEqual(self.refs(variant), 1)
+        self.assertEqual(media.rebuild_refs(dry_run=True), 0)
@@ -0,0 +1,38 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class FollowDuplicatesMigrationTests(TransactionTestCase):
+    before = [('posts', '0009_post_version')]
+    after = [('posts', '0010_feed_indexes')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicate_follows_are_dropped(self):
+        apps = self.migrate(self.before)
+        User = apps.get_model('auth', 'User')
+        Follow = apps.get_model('posts', 'Follow')
+        UserStats = apps.get_model('posts', 'UserStats')
+        user = User.objects.create(username='test-user')
+        author = User.objects.create(username='test-author')
+        first = Follow.objects.create(user=user, author=author)
+        for _ in range(2):
+            Follow.objects.create(user=user, author=author)
+        UserStats.objects.create(user=author, followers_count=3)
+
+        apps = self.migrate(self.after)
+        Follow = apps.get_model('posts', 'Follow')
+        UserStats = apps.get_model('posts', 'UserStats')
+        self.assertEqual(
+            list(Follow.objects.values_list('pk', flat=True)), [first.pk])
+        self.assertEqual(
+            UserStats.objects.get(user_id=author.pk).followers_count, 1)
@@ -0,0 +1,157 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from jobs.models import Job
+from jobs.queue import run_pending
+
+from .. import notifications
+from ..models import Follow, Group, Notification, Post
+
+
+User = get_user_model()
+
+
+@override_settings(TASKS_EAGER=False, NOTIFY_BATCH_SIZE=2,
+                   NOTIFY_DIGEST_POSTS=2, SITE_URL='http://yatube.test')
+class NotificationsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test-author')
+        cls.other = User.objects.create_user(username='test-other')
+        cls.group = Group.objects.create(
+            title='test-group', slug='test-group', description='test')
+        cls.followers = [
+            User.objects.create_user(
+                username=f'test-follower-{number}',
+                email=f'follower{number}@example.com')
+            for number in range(5)
+        ]
+        Follow.objects.bulk_create(
+            [Follow(user=user, author=cls.author) for user in cls.followers]
+            + [Follow(user=cls.followers[0], author=cls.other)])
+        # Без адреса писем не получить
+        cls.silent = User.objects.create_user(username='test-silent')
+        Follow.objects.create(user=cls.silent, author=cls.author)
+
+    def publish(self, author, text, group=None):
+        return Post.objects.create(author=author, text=text, group=group)
+
+    def test_new_post_only_enqueues(self):
+        self.publish(self.author, 'test-post')
+        self.assertFalse(Notification.objects.exists())
+        self.assertTrue(Job.objects.filter(
+            name='posts.tasks.notify_followers').exists())
+
+    def test_collect(self):
+        post = self.publish(self.author, 'test-post')
+        notifications.collect(post.pk)
+        # Повтор задачи не размножает строки
+        notifications.collect(post.pk)
+        self.assertEqual(
+            set(Notification.objects.values_list('recipient', flat=True)),
+            {user.pk for user in self.followers})
+
+    def test_digest_per_recipient(self):
+        first = self.publish(self.author, 'test-first', self.group)
+        second = self.publish(self.author, 'test-second')
+        third = self.publish(self.author, 'test-third')
+        other = self.publish(self.other, 'test-other')
+        for post in first, second, third, other:
+            notifications.collect(post.pk)
+
+        with mock.patch.object(
+                notifications.mail, 'get_connection',
+                wraps=notifications.mail.get_connection) as get_connection:
+            self.assertEqual(notifications.send_digests(), 5)
+        get_connection.assert_called_once_with()
+        self.assertFalse(Notification.objects.exists())
+
+        messages = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(len(messages), 5)
+        digest = messages['follower0@example.com']
+        self.assertIn('4', digest.subject)
+        # Свежие записи первыми, остальные — числом
+        self.assertIn('test-other', digest.body)
+        self.assertIn('test-third', digest.body)
+        self.assertNotIn('test-first', digest.body)
+        self.assertIn('И ещё записей: 2', digest.body)
+        self.assertIn(
+            f'http://yatube.test/test-other/{other.pk}/', digest.body)
+        self.assertNotIn('test-other', messages[
+            'follower1@example.com'].body)
+
+        # Отправленное второй раз не уходит
+        self.assertEqual(notifications.send_digests(), 0)
+
+    def test_unfollow_forgets(self):
+        post = self.publish(self.author, 'test-post')
+        notifications.collect(post.pk)
+        Follow.objects.filter(user=self.followers[1]).delete()
+        notifications.send_digests()
+        self.assertNotIn(
+            'follower1@example.com',
+            [message.to[0] for message in mail.outbox])
+
+    # Пачка из одних устаревших строк тоже удаляется
+    def test_stale_rows_are_deleted(self):
+        post = self.publish(self.author, 'test-post')
+        notifications.collect(post.pk)
+        Follow.objects.filter(author=self.author).delete()
+        self.assertEqual(notifications.send_digests(), 0)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_digests_are_coalesced(self):
+        for number in range(3):
+            self.publish(self.author, f'test-post-{number}')
+        run_pending(100)
+        self.assertEqual(Job.objects.filter(
+            key='digests', status=Job.PENDING).count(), 1)
+        self.assertEqual(mail.outbox, [])
+
+        Job.objects.filter(key='digests').update(
+            run_at=Job.objects.get(key='digests').created)
+        run_pending(100)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_send_digests_command(self):
+        notifications.collect(self.publish(self.author, 'test-post').pk)
+        out = StringIO()
+        call_command('send_digests', stdout=out)
+        self.assertIn('5', out.getvalue())
+
+
+@override_settings(TASKS_EAGER=True)
+class EagerNotificationsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test-author')
+        cls.follower = User.objects.create_user(
+            username='test-follower', email='follower@example.com')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def test_new_post_does_not_notify_inline(self):
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('new_post'), {'text': 'test-post'})
+        self.assertTrue(Post.objects.filter(text='test-post').exists())
+        # В запросе рассылка только ставится в очередь
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(Notification.objects.exists())
+        self.assertTrue(Job.objects.filter(
+            name='posts.tasks.notify_followers',
+            status=Job.PENDING).exists())
+
+        call_command('send_digests', stdout=StringIO())
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [['follower@example.com']])
+        self.assertFalse(Notification.objects.exists())
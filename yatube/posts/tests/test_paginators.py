@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from ..models import Group, Post
+from ..paginators import KeysetPaginator, decode_cursor, encode_cursor
+
+
+User = get_user_model()
+
+
+KEYSET_MODES = {
+    'index': 'keyset',
+    'group_posts': 'keyset',
+    'profile': 'keyset',
+    'follow_index': 'keyset',
+}
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.group = Group.objects.create(slug='test-slug')
+
+        for x in range(13):
+            Post.objects.create(
+                text=f'test-post-{x}',
+                author=cls.user,
+                group=cls.group,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cursor_round_trip(self):
+        post = Post.objects.first()
+        token = encode_cursor(post.pub_date, post.pk)
+        self.assertEqual(decode_cursor(token), (post.pub_date, post.pk))
+
+    def test_broken_cursor(self):
+        for token in ('', 'not-a-cursor', '!!!', 'MjAyMXxhYmM'):
+            with self.subTest(token=token):
+                self.assertIsNone(decode_cursor(token))
+
+    def test_pages_cover_all_posts(self):
+        paginator = KeysetPaginator(Post.objects.all(), 5)
+        seen = []
+        page = paginator.get_page()
+        self.assertFalse(page.has_previous())
+        while True:
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(after=page.next_cursor)
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_page(self):
+        paginator = KeysetPaginator(Post.objects.all(), 5)
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        back = paginator.get_page(before=second.previous_cursor)
+        self.assertEqual(
+            [post.pk for post in back], [post.pk for post in first])
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    # Проверка лент в курсорном режиме
+    @override_settings(POSTS_PAGINATION_MODES=KEYSET_MODES)
+    def test_views_keyset_mode(self):
+        pages_names = {
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+        }
+        for adress in pages_names:
+            with self.subTest(adress=adress):
+                response = self.authorized_client.get(adress)
+                page = response.context.get('page')
+                self.assertEqual(len(page), 10)
+                self.assertContains(response, f'?after={page.next_cursor}')
+
+                response = self.authorized_client.get(
+                    adress + f'?after={page.next_cursor}')
+                self.assertEqual(len(response.context.get('page')), 3)
@@ -0,0 +1,236 @@
+import json
+import os
+import statistics
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, tag
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from about import urls as about_urls
+from users import urls as users_urls
+from .. import urls as posts_urls
+from ..models import Follow, Group, Post
+
+
+User = get_user_model()
+
+USERS = 1000
+POSTS = 3000
+COMMENTS = 3000
+FOLLOWS_PER_USER = 5
+# Для p95 нужно хотя бы 20 замеров: с 20 это второй по худшему
+RUNS = int(os.environ.get('YATUBE_PERF_RUNS', 20))
+
+# Верхняя граница числа SQL-запросов на холодный (без кэша) запрос
+# страницы. Рост числа — почти всегда N+1 в шаблоне или представлении.
+# Группа, профиль и запись тратят один запрос на валидатор условного GET.
+# Подписка и отписка замеряются на пути записи: каждый запуск заново
+# подписывается или отписывается вместе со всеми задачами после этого.
+QUERY_BUDGETS = {
+    'index': 4,
+    'group_posts': 6,
+    'new_post': 3,
+    'follow_index': 5,
+    # Подписка и отписка пересчитывают счётчики по таблицам и проверяют,
+    # не пересёк ли автор порог TIMELINE_FANOUT_LIMIT (posts/timeline.py)
+    'profile_follow': 18,
+    'profile_unfollow': 15,
+    'profile': 7,
+    'post': 6,
+    'add_comment': 6,
+    'post_edit': 5,
+    'search': 4,
+    'events': 0,
+    'page_not_found': 2,
+    'server_error': 2,
+    'signup': 2,
+    'about:author': 2,
+    'about:tech': 2,
+}
+
+# То же для отправки форм: запись со всеми задачами после неё (счётчики,
+# ленты подписчиков, поисковый индекс) выполняется сразу (TASKS_EAGER).
+# Сохранение записи идёт в своей транзакции (Post.save) — это ещё два,
+# версии группы и автора для условных GET (posts/conditional.py) — ещё два.
+# Новая запись читает число подписчиков: большую раскладку по лентам
+# запрос оставляет воркерам.
+WRITE_BUDGETS = {
+    'new_post': 23,
+    'add_comment': 11,
+    'post_edit': 14,
+}
+
+# С воркерами (TASKS_EAGER=False) запрос только ставит задачи в очередь:
+# число его запросов не зависит от числа подписчиков и записей.
+DEFERRED_BUDGETS = {
+    'new_post': 13,
+    'add_comment': 7,
+    'post_edit': 14,
+    'profile_follow': 9,
+    'profile_unfollow': 7,
+}
+
+
+@tag('performance')
+class ViewBudgetTests(TestCase):
+    """Бюджет запросов и время ответа всех страниц на большой базе.
+
+    Бюджет проверяется по худшему из RUNS запусков (переменная
+    окружения YATUBE_PERF_RUNS). Отчёт с числом запросов, медианой, p95
+    и максимумом времени по каждой странице пишется в JSON-файл, если
+    задана переменная окружения YATUBE_PERF_REPORT.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_yatube', users=USERS, groups=20, posts=POSTS,
+            comments=COMMENTS, follows_per_user=FOLLOWS_PER_USER,
+            prefix='user-', timelines=True, stdout=StringIO())
+        users = User.objects.filter(
+            username__startswith='user-').order_by('pk')
+        # Первый пользователь — самый плодовитый автор (закон Ципфа)
+        cls.author = users.first()
+        cls.reader = users.last()
+        cls.post = Post.objects.filter(author=cls.author).first()
+        cls.group = Group.objects.order_by('pk').first()
+        cls.results = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        path = os.environ.get('YATUBE_PERF_REPORT')
+        if path and cls.results:
+            with open(path, 'w') as report:
+                json.dump(cls.results, report, indent=2, sort_keys=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def urls(self):
+        author = self.author.username
+        post = {'username': author, 'post_id': self.post.pk}
+        return {
+            'index': reverse('index'),
+            'group_posts': reverse(
+                'group_posts', kwargs={'slug': self.group.slug}),
+            'new_post': reverse('new_post'),
+            'follow_index': reverse('follow_index'),
+            'profile_follow': reverse(
+                'profile_follow', kwargs={'username': self.reader.username}),
+            'profile_unfollow': reverse(
+                'profile_unfollow', kwargs={'username': self.reader.username}),
+            'profile': reverse('profile', kwargs={'username': author}),
+            'post': reverse('post', kwargs=post),
+            'add_comment': reverse('add_comment', kwargs=post),
+            'post_edit': reverse('post_edit', kwargs=post),
+            'search': reverse('search') + '?q=город',
+            'events': reverse('events') + '?channel=index',
+            'page_not_found': '/404/test/',
+            'server_error': '/505/',
+            'signup': reverse('signup'),
+            'about:author': reverse('about:author'),
+            'about:tech': reverse('about:tech'),
+        }
+
+    def measure(self, adress, data=None, before=None):
+        """Замерить RUNS запросов страницы: GET или POST с `data`.
+
+        `before` вызывается перед каждым запуском, чтобы каждый запрос
+        проходил один и тот же путь (подписка — подписывался заново).
+        """
+        counts, timings = [], []
+        for run in range(RUNS):
+            cache.clear()
+            if before is not None:
+                before()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                if data is None:
+                    response = self.client.get(adress)
+                else:
+                    response = self.client.post(adress, data)
+                timings.append((time.perf_counter() - started) * 1000)
+            counts.append(len(queries))
+        # p95 — как в bench_asgi: ближайший ранг по отсортированным
+        timings.sort()
+        return response, max(counts), {
+            'queries': max(counts),
+            'first_run_queries': counts[0],
+            'runs': len(timings),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+            'max_ms': round(timings[-1], 2),
+        }
+
+    # Новая страница в urls.py должна получить свой бюджет
+    def test_every_url_is_measured(self):
+        names = {
+            pattern.name or pattern.callback.__name__
+            for pattern in posts_urls.urlpatterns + users_urls.urlpatterns
+        }
+        names |= {
+            f'{about_urls.app_name}:{pattern.name}'
+            for pattern in about_urls.urlpatterns
+        }
+        self.assertEqual(names, set(QUERY_BUDGETS))
+        self.assertEqual(set(self.urls()), set(QUERY_BUDGETS))
+
+    def before(self, name):
+        follow = Follow.objects.filter(user=self.author, author=self.reader)
+        return {
+            'profile_follow': follow.delete,
+            'profile_unfollow': lambda: Follow.objects.get_or_create(
+                user=self.author, author=self.reader),
+        }.get(name)
+
+    def check(self, name, response, queries, budget):
+        if name != 'server_error':
+            self.assertLess(response.status_code, 500)
+        self.assertLessEqual(
+            queries, budget, f'{name}: {queries} запросов, бюджет {budget}')
+
+    def test_query_budgets(self):
+        for name, adress in self.urls().items():
+            with self.subTest(view=name):
+                response, queries, result = self.measure(
+                    adress, before=self.before(name))
+                self.results[name] = result
+                self.check(name, response, queries, QUERY_BUDGETS[name])
+
+    def test_write_budgets(self):
+        urls = self.urls()
+        data = {
+            'new_post': {'text': 'Новая запись', 'group': self.group.pk},
+            'add_comment': {'text': 'Новый комментарий'},
+            'post_edit': {'text': 'Правка записи', 'group': self.group.pk},
+        }
+        for name, budget in WRITE_BUDGETS.items():
+            with self.subTest(view=name):
+                response, queries, result = self.measure(
+                    urls[name], data[name])
+                self.results[f'{name}:post'] = result
+                self.assertEqual(response.status_code, 302)
+                self.check(name, response, queries, budget)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_deferred_write_budgets(self):
+        urls = self.urls()
+        data = {
+            'new_post': {'text': 'Новая запись', 'group': self.group.pk},
+            'add_comment': {'text': 'Новый комментарий'},
+            'post_edit': {'text': 'Правка записи', 'group': self.group.pk},
+        }
+        for name, budget in DEFERRED_BUDGETS.items():
+            with self.subTest(view=name):
+                response, queries, result = self.measure(
+                    urls[name], data.get(name), before=self.before(name))
+                self.results[f'{name}:deferred'] = result
+                self.assertEqual(response.status_code, 302)
+                self.check(name, response, queries, budget)
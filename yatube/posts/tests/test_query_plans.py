@@ -0,0 +1,76 @@
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from ..models import Comment, Follow, Group, Post
+from ..paginators import KeysetPaginator
+from ..timeline import feed_for
+
+
+User = get_user_model()
+
+
+def query_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN')
+class QueryPlanTests(TestCase):
+    """Запросы лент должны идти по индексам, без полного перебора и
+    без сортировки во временном B-дереве."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.author = User.objects.create_user(username='test-author')
+        cls.group = Group.objects.create(slug='test-slug')
+        cls.post = Post.objects.create(
+            text='test-post', author=cls.author, group=cls.group)
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def assertIndexed(self, queryset):
+        plan = query_plan(queryset)
+        for step in plan:
+            with self.subTest(step=step):
+                full_scan = step.startswith('SCAN') and 'USING' not in step
+                self.assertFalse(full_scan, f'Полный перебор: {plan}')
+                self.assertNotIn('TEMP B-TREE', step, f'Сортировка: {plan}')
+
+    def keyset_after(self, queryset, keys=('pub_date', 'pk')):
+        paginator = KeysetPaginator(queryset, 10, keys)
+        return paginator._after((timezone.now(), self.post.pk))[:11]
+
+    def test_feed_plans(self):
+        feeds = {
+            'index': Post.objects.for_feed(),
+            'group_posts': Post.objects.for_feed().filter(group=self.group),
+            'profile': self.author.posts.for_feed(),
+        }
+        for name, queryset in feeds.items():
+            with self.subTest(feed=name):
+                self.assertIndexed(queryset.order_by('-pub_date')[:10])
+                self.assertIndexed(self.keyset_after(queryset))
+
+    def test_follow_feed_plan(self):
+        keys = ('feed_date', 'feed_id')
+        queryset = feed_for(self.user).for_feed()
+        self.assertIndexed(queryset.order_by('-feed_date', '-feed_id')[:10])
+        self.assertIndexed(self.keyset_after(queryset, keys))
+
+    def test_comments_plan(self):
+        self.assertIndexed(
+            Comment.objects.filter(post=self.post).select_related('author')
+            .order_by('-created'))
+
+    def test_follow_lookup_plan(self):
+        self.assertIndexed(
+            Follow.objects.filter(user=self.user, author=self.author))
+        plan = ' '.join(query_plan(
+            Follow.objects.filter(user=self.user, author=self.author)))
+        self.assertIn('user_id=? AND author_id=?', plan)
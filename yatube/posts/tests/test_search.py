@@ -0,0 +1,126 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post
+
+
+User = get_user_model()
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def found(self, text):
+        return list(Post.objects.filter(
+            pk__in=search.matching_ids(text)).values_list('pk', flat=True))
+
+    def test_index_follows_posts(self):
+        post = Post.objects.create(text='Коты гуляют', author=self.user)
+        self.assertEqual(self.found('кот'), [post.pk])
+
+        post.text = 'Собаки гуляют'
+        post.save()
+        self.assertEqual(self.found('кот'), [])
+        self.assertEqual(self.found('собак гуля'), [post.pk])
+
+        post.delete()
+        self.assertEqual(self.found('собак'), [])
+
+    def test_index_follows_comments_and_author(self):
+        post = Post.objects.create(text='Утро', author=self.user)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Отличный кофе')
+        self.assertEqual(self.found('кофе'), [post.pk])
+        self.assertEqual(self.found('test-user'), [post.pk])
+
+        comment.delete()
+        self.assertEqual(self.found('кофе'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        Post.objects.create(text='Коты гуляют', author=self.user)
+        for text in ('"', 'кот OR', 'NEAR(', '*', '', '-кот'):
+            with self.subTest(text=text):
+                search.search_page(text)
+
+    def test_ranking_and_highlight(self):
+        once = Post.objects.create(
+            text='лес и <b>река</b>', author=self.user)
+        twice = Post.objects.create(text='река, река', author=self.user)
+        page = search.search_page('река')
+        self.assertEqual([post.pk for post in page], [twice.pk, once.pk])
+        self.assertIn('&lt;b&gt;<mark>река</mark>&lt;/b&gt;',
+                      page.object_list[1].search_snippet)
+
+    @override_settings(POSTS_PER_PAGE=2)
+    def test_cursor_pagination(self):
+        posts = [
+            Post.objects.create(text=f'снег {index}', author=self.user)
+            for index in range(5)
+        ]
+        first = search.search_page('снег')
+        self.assertFalse(first.has_previous())
+        second = search.search_page('снег', after=first.next_cursor)
+        third = search.search_page('снег', after=second.next_cursor)
+        self.assertFalse(third.has_next())
+        found = [post.pk for page in (first, second, third) for post in page]
+        self.assertCountEqual(found, [post.pk for post in posts])
+
+        back = search.search_page('снег', before=third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertTrue(back.has_previous())
+
+    def test_rebuild_command(self):
+        post = Post.objects.create(text='Дождь', author=self.user)
+        search.remove(post.pk)
+        self.assertEqual(self.found('дождь'), [])
+
+        out = StringIO()
+        call_command('rebuild_search', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertEqual(self.found('дождь'), [post.pk])
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='test-user', password='test-password', is_staff=True,
+            is_superuser=True)
+        cls.post = Post.objects.create(text='Горная река', author=cls.user)
+        Post.objects.create(text='Лесная тропа', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_search_page(self):
+        response = self.client.get(reverse('search'), {'q': 'река'})
+        self.assertEqual(response.context['query'], 'река')
+        self.assertEqual(list(response.context['page']), [self.post])
+        self.assertContains(response, '<mark>река</mark>')
+
+    def test_empty_query(self):
+        response = self.client.get(reverse('search'))
+        self.assertEqual(len(response.context['page']), 0)
+        self.assertNotContains(response, 'Ничего не найдено')
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_pagination_keeps_query(self):
+        Post.objects.create(text='Река', author=self.user)
+        response = self.client.get(reverse('search'), {'q': 'река'})
+        self.assertContains(response, '?q=%D1%80%D0%B5%D0%BA%D0%B0&amp;after=')
+
+    def test_admin_search(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'рек'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.post])
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from jobs.models import Job
+from jobs.queue import run_pending
+
+from .. import search
+from ..models import Comment, Follow, Post, TimelineEntry, UserStats
+
+
+User = get_user_model()
+
+
+@override_settings(TASKS_EAGER=False)
+class QueuedSideEffectsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.follower = User.objects.create_user(username='test-follower')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_side_effects_are_deferred(self):
+        Follow.objects.create(user=self.follower, author=self.user)
+        post = Post.objects.create(text='test-queued', author=self.user)
+
+        # В запросе только записи в очередь
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertFalse(
+            Post.objects.filter(pk__in=search.matching_ids('test-queued')))
+
+        run_pending(100)
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.stats(self.user).followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            post=post, user=self.follower).exists())
+        self.assertTrue(
+            Post.objects.filter(pk__in=search.matching_ids('test-queued')))
+        # Дайджест ждёт своего времени
+        self.assertEqual(
+            list(Job.objects.exclude(status=Job.DONE).values_list('key')),
+            [('digests',)])
+
+    def test_comments_reindex_once(self):
+        post = Post.objects.create(text='test-post', author=self.user)
+        run_pending(100)
+        for _ in range(5):
+            Comment.objects.create(post=post, author=self.user, text='test')
+        self.assertEqual(Job.objects.filter(
+            status=Job.PENDING, key=f'reindex:{post.pk}').count(), 1)
+
+        run_pending(100)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 5)
+
+    def test_unfollow_before_task(self):
+        Post.objects.create(text='test-post', author=self.user)
+        Follow.objects.create(user=self.follower, author=self.user)
+        Follow.objects.filter(user=self.follower).delete()
+        run_pending(100)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+
+    def test_delete_side_effects_are_deferred(self):
+        post = Post.objects.create(text='test-post', author=self.user)
+        Follow.objects.create(user=self.follower, author=self.user)
+        Comment.objects.create(post=post, author=self.user, text='test')
+        run_pending(100)
+
+        Comment.objects.filter(post=post).delete()
+        Follow.objects.filter(user=self.follower).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+
+        run_pending(100)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+        self.assertEqual(self.stats(self.follower).following_count, 0)
+
+        Post.objects.filter(pk=post.pk).delete()
+        run_pending(100)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
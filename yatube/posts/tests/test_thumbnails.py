@@ -0,0 +1,90 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from .. import thumbnails, variants
+from ..models import Group, Post
+
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg(name='photo.jpg', size=(1200, 800)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ThumbnailQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.group = Group.objects.create(title='test-group', slug='test-slug')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='test-post', author=self.user, group=self.group,
+            image=jpeg())
+        self.client = Client()
+
+    # Лента не уменьшает картинку сама, а показывает заглушку
+    def test_feed_never_resizes(self):
+        with mock.patch.object(variants, 'render') as render, \
+                mock.patch('PIL.Image.Image.resize') as resize:
+            response = self.client.get(reverse('index'))
+        render.assert_not_called()
+        resize.assert_not_called()
+        self.assertContains(response, 'thumbnail-pending')
+
+    def test_feed_miss_is_enqueued(self):
+        with mock.patch.object(thumbnails, 'enqueue') as enqueue:
+            self.client.get(reverse('index'))
+        enqueue.assert_called_once_with(
+            thumbnails.build_variants, self.post.pk)
+
+    @override_settings(THUMBNAIL_QUEUE_EAGER=True)
+    def test_eager_mode(self):
+        self.assertIsNone(
+            thumbnails.submit(thumbnails.build_variants, self.post.pk))
+        self.post.refresh_from_db()
+        self.assertTrue(variants.loads(self.post))
+
+    def test_pool_skips_duplicate_tasks(self):
+        task = mock.Mock(__name__='task')
+        thumbnails.submit(task, self.post.pk).result(timeout=5)
+        thumbnails.submit(task, self.post.pk).result(timeout=5)
+        self.assertEqual(task.call_count, 2)
+
+        # Пока задача не завершена, повторная не ставится
+        with mock.patch.object(thumbnails, '_run'):
+            thumbnails.submit(task, self.post.pk).result(timeout=5)
+            self.assertIsNone(thumbnails.submit(task, self.post.pk))
+        thumbnails._pending.clear()
+
+    def test_task_errors_are_logged(self):
+        task = mock.Mock(__name__='task', side_effect=ValueError)
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails.submit(task, self.post.pk).result(timeout=5)
+        self.assertFalse(thumbnails._pending)
+
+    def test_post_without_image(self):
+        post = Post.objects.create(text='no-image', author=self.user)
+        self.assertFalse(thumbnails.build_variants(post.pk))
@@ -0,0 +1,115 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.test import TestCase, override_settings
+
+from jobs.queue import run_pending
+
+from ..models import Follow, Post, TimelineEntry
+from ..paginators import KeysetPaginator
+from ..timeline import feed_for
+
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+
+    def feed(self):
+        return set(feed_for(self.reader).values_list('text', flat=True))
+
+    def test_fan_out_on_new_post(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='followed', author=self.author)
+        Post.objects.create(text='not-followed', author=self.other)
+        self.assertEqual(self.feed(), {'followed'})
+        self.assertEqual(TimelineEntry.objects.count(), 1)
+
+    # Раскладку больше одной пачки запрос оставляет воркерам
+    @override_settings(TIMELINE_BATCH_SIZE=1)
+    def test_large_fan_out_is_queued(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        Post.objects.create(text='queued', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        run_pending(100)
+        self.assertEqual(TimelineEntry.objects.count(), 2)
+        self.assertEqual(self.feed(), {'queued'})
+
+    def test_backfill_and_prune(self):
+        Post.objects.create(text='old-post', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed(), {'old-post'})
+
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertEqual(self.feed(), set())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    # Записи популярных авторов подмешиваются при чтении ленты
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_high_follower_author_is_pulled(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='pulled', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), {'pulled'})
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_author_below_limit_is_fanned_out_again(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        Post.objects.create(text='pulled', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+        Follow.objects.filter(user=self.other).delete()
+        # Ленты заполняет задача воркера, а не запрос отписки
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), set())
+        run_pending(100)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post__text='pulled').exists())
+        self.assertEqual(self.feed(), {'pulled'})
+
+    @override_settings(TIMELINE_BACKFILL_SIZE=2)
+    def test_older_posts_are_read_through_follows(self):
+        for number in range(4):
+            Post.objects.create(text=f'post-{number}', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(TimelineEntry.objects.count(), 2)
+        self.assertEqual(
+            self.feed(), {f'post-{number}' for number in range(4)})
+        ordered = feed_for(self.reader).order_by('-feed_date', '-feed_id')
+        self.assertEqual(
+            list(ordered.values_list('text', flat=True)),
+            [f'post-{number}' for number in reversed(range(4))])
+        # Страница на стыке частей ленты
+        page = Paginator(ordered, 3).page(1)
+        self.assertEqual(page.paginator.count, 4)
+        self.assertEqual(
+            [post.text for post in page], ['post-3', 'post-2', 'post-1'])
+        keyset = KeysetPaginator(ordered, 3, ('feed_date', 'feed_id'))
+        first = keyset.get_page()
+        second = keyset.get_page(after=first.next_cursor)
+        self.assertEqual([post.text for post in second], ['post-0'])
+        previous = keyset.get_page(before=second.previous_cursor)
+        self.assertEqual(
+            [post.text for post in previous], ['post-3', 'post-2', 'post-1'])
+
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(TimelineEntry.objects.count(), 2)
+        self.assertEqual(len(self.feed()), 4)
+
+    def test_rebuild_command(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='followed', author=self.author)
+        TimelineEntry.objects.all().delete()
+
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed(), {'followed'})
@@ -0,0 +1,130 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from ..models import Post
+
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_file(name='photo.jpg', size=(400, 300), image_format='JPEG',
+               **options):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (30, 120, 200)).save(
+        buffer, image_format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def exif_with_location():
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera Maker'
+    # Ориентация 6: снимок повёрнут на 90° по часовой стрелке
+    exif[0x0112] = 6
+    return exif
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class UploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def publish(self, image, **extra):
+        return self.client.post(
+            reverse('new_post'), {'text': 'test-post', 'image': image},
+            **extra)
+
+    def saved_image(self):
+        post = Post.objects.get(text='test-post')
+        return Image.open(post.image.path)
+
+    def test_metadata_is_stripped(self):
+        self.publish(image_file(exif=exif_with_location()))
+        with self.saved_image() as image:
+            self.assertEqual(dict(image.getexif()), {})
+            # Ориентация применена к пикселям до удаления EXIF
+            self.assertEqual(image.size, (300, 400))
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_oversized_original_is_downsized(self):
+        self.publish(image_file(size=(400, 300)))
+        with self.saved_image() as image:
+            self.assertEqual(image.size, (100, 75))
+            self.assertEqual(image.format, 'JPEG')
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1000)
+    def test_too_many_bytes(self):
+        response = self.publish(image_file(size=(800, 600), quality=95))
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 1000\xa0байт.')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=400 * 300 - 1)
+    def test_too_many_pixels(self):
+        response = self.publish(image_file(size=(400, 300)))
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('слишком большая', response.context['form'].errors[
+            'image'][0])
+
+    def test_not_an_image(self):
+        response = self.publish(SimpleUploadedFile('fake.jpg', b'not-image'))
+        self.assertFalse(Post.objects.exists())
+        self.assertTrue(response.context['form'].errors['image'])
+
+    def test_truncated_image(self):
+        data = image_file(size=(400, 300)).read()
+        response = self.publish(
+            SimpleUploadedFile('photo.jpg', data[:len(data) // 2]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('повреждён', response.context['form'].errors[
+            'image'][0])
+
+    def test_mode_unsupported_by_target_format(self):
+        buffer = io.BytesIO()
+        Image.new('CMYK', (40, 30), (0, 50, 100, 0)).save(buffer, 'TIFF')
+        self.publish(SimpleUploadedFile('scan.tiff', buffer.getvalue()))
+        with self.saved_image() as image:
+            self.assertEqual((image.format, image.mode), ('PNG', 'RGB'))
+
+    def test_png_keeps_format(self):
+        self.publish(image_file('picture.png', image_format='PNG'))
+        post = Post.objects.get(text='test-post')
+        self.assertTrue(post.image.name.endswith('.png'))
+
+    def test_edit_uses_bounded_handler(self):
+        post = Post.objects.create(text='old-post', author=self.user)
+        with self.settings(POST_IMAGE_MAX_BYTES=1000):
+            response = self.client.post(
+                reverse('post_edit', kwargs={
+                    'username': self.user.username, 'post_id': post.pk}),
+                {'text': 'new-post', 'image': image_file(size=(800, 600))})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Post.objects.filter(text='old-post').exists())
+
+    # Обработчик загрузок заменяется без отключения защиты от CSRF
+    def test_csrf_is_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(
+            reverse('new_post'), {'text': 'test-post', 'image': image_file()})
+        self.assertEqual(response.status_code, 403)
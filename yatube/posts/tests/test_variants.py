@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from .. import thumbnails, variants
+from ..models import Group, Post
+from .test_thumbnails import jpeg
+
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageVariantsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.group = Group.objects.create(title='test-group', slug='test-slug')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='test-post', author=self.user, group=self.group,
+            image=jpeg(size=(1200, 800)))
+        self.client = Client()
+
+    def test_build_widths_and_formats(self):
+        built = variants.build(self.post.image)
+        formats = variants.available_formats()
+        self.assertIn('WEBP', formats)
+        self.assertEqual(formats[-1], 'JPEG')
+        # 1440 шире исходника и не собирается
+        self.assertEqual(
+            {(item['width'], item['height']) for item in built},
+            {(480, 170), (960, 339)})
+        self.assertEqual(len(built), 2 * len(formats))
+        for item in built:
+            with self.subTest(name=item['name']):
+                self.assertTrue(default_storage.exists(item['name']))
+
+    def test_webp_is_smaller_than_jpeg(self):
+        built = variants.build(self.post.image)
+        sizes = {
+            (item['format'], item['width']):
+                default_storage.size(item['name'])
+            for item in built
+        }
+        self.assertLess(sizes['WEBP', 960], sizes['JPEG', 960])
+
+    # Имя — хэш содержимого: одинаковые кадры не дублируются
+    def test_names_are_content_addressed(self):
+        first = variants.build(self.post.image)
+        other = Post.objects.create(
+            text='same-image', author=self.user, image=jpeg('copy.jpg'))
+        self.assertEqual(variants.build(other.image), first)
+
+    def test_feed_renders_picture(self):
+        self.assertTrue(thumbnails.build_variants(self.post.pk))
+        self.assertFalse(thumbnails.build_variants(self.post.pk))
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '960w')
+        self.assertNotContains(response, 'thumbnail-pending')
+
+    def test_build_refreshes_cached_card(self):
+        self.client.get(reverse('index'))
+        version = Post.objects.get(pk=self.post.pk).version
+        thumbnails.build_variants(self.post.pk)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).version, version + 1)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '<picture>')
+
+    def test_new_image_drops_old_variants(self):
+        thumbnails.build_variants(self.post.pk)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertTrue(variants.loads(post))
+        post.image = jpeg('new.jpg', size=(1000, 800))
+        with mock.patch.object(thumbnails, 'enqueue') as enqueue:
+            post.save()
+        self.assertEqual(variants.loads(post), [])
+        enqueue.assert_called_once_with(thumbnails.build_variants, post.pk)
+
+    def test_broken_image(self):
+        Post.objects.filter(pk=self.post.pk).update(image='posts/missing.jpg')
+        with self.assertLogs('posts.thumbnails', 'WARNING'):
+            self.assertFalse(thumbnails.build_variants(self.post.pk))
@@ -1,12 +1,18 @@
 import shutil
 import tempfile
+import time
 from django.conf import settings
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from ..models import Group, Post, Follow
+from django.http import HttpResponse
+from ..feed_cache import get_or_render, page_timeout
+from ..models import Comment, Group, Post, Follow
 from django import forms
 
 
@@ -46,6 +52,9 @@ class ViewTests(TestCase):
             group=cls.group,
             image=cls.uploaded
         )
+        # Картинки хранятся под хэшем содержимого
+        cls.image_name = Post.image.field.storage.hashed_name(
+            'posts/small.gif', ContentFile(cls.small_gif))
         Follow.objects.create(
             user=cls.userTwo,
             author=cls.user
@@ -83,7 +92,7 @@ class ViewTests(TestCase):
         response = self.authorized_client.get(reverse('index'))
         first_post = response.context['page'][0]
         self.assertEqual(first_post.text, 'test-post')
-        self.assertEqual(first_post.image, 'posts/small.gif')
+        self.assertEqual(first_post.image, self.image_name)
 
     def test_group_context(self):
         response = self.authorized_client.get(reverse(
@@ -91,7 +100,7 @@ class ViewTests(TestCase):
             kwargs={'slug': self.group.slug}))
         first_post = response.context['page'][0]
         self.assertEqual(first_post.text, 'test-post')
-        self.assertEqual(first_post.image, 'posts/small.gif')
+        self.assertEqual(first_post.image, self.image_name)
         self.assertEqual(response.context['group'].slug, 'test-slug')
 
     def test_new_post_context(self):
@@ -123,7 +132,7 @@ class ViewTests(TestCase):
             reverse('profile', kwargs={'username': self.user.username}))
         first_post = response.context['page'][0]
         self.assertEqual(first_post.text, 'test-post')
-        self.assertEqual(first_post.image, 'posts/small.gif')
+        self.assertEqual(first_post.image, self.image_name)
 
     def test_post_context(self):
         response = self.authorized_client.get(
@@ -135,7 +144,18 @@ class ViewTests(TestCase):
                 }))
         post = response.context['post']
         self.assertEqual(post.text, 'test-post')
-        self.assertEqual(post.image, 'posts/small.gif')
+        self.assertEqual(post.image, self.image_name)
+
+    def test_add_comment_context(self):
+        response = self.authorized_client_two.get(
+            reverse(
+                'add_comment',
+                kwargs={
+                    'username': self.user.username,
+                    'post_id': self.post.id
+                }))
+        self.assertEqual(response.context['posts_count'], 1)
+        self.assertEqual(response.context['stats'].followers_count, 1)
 
     # Тест подписки и отписки
     def test_subscription(self):
@@ -239,15 +259,159 @@ class CacheTests(TestCase):
         self.authorized_client.force_login(self.user)
 
     def test_index_cache(self):
+        cache.clear()
         Post.objects.create(
             text='test-post',
             author=self.user
         )
         response1 = self.authorized_client.get(reverse('index'))
-        self.assertEqual(response1.context, None)
+        self.assertNotEqual(response1.context, None)
+
+        response2 = self.authorized_client.get(reverse('index'))
+        self.assertEqual(response2.context, None)
+        self.assertEqual(response2.content, response1.content)
+
+    # Новая запись видна сразу, без ожидания истечения кэша
+    def test_new_post_invalidates_cache(self):
+        self.authorized_client.get(reverse('index'))
+        Post.objects.create(
+            text='fresh-post',
+            author=self.user
+        )
+        response = self.authorized_client.get(reverse('index'))
+        self.assertNotEqual(response.context, None)
+        self.assertEqual(response.context['page'][0].text, 'fresh-post')
 
+    def test_cache_varies_by_viewer(self):
         cache.clear()
+        self.authorized_client.get(reverse('index'))
+        response = Client().get(reverse('index'))
+        self.assertNotContains(response, f'Пользователь: {self.user}')
+
+    def test_concurrent_miss_waits_for_single_build(self):
+        key = 'feed-page:test'
+        cache.add(f'{key}:lock', 1)
+        cache.set(key, {
+            'content': b'built-once',
+            'headers': [('Content-Type', 'text/html')],
+            'delta': 0,
+            'expires': time.time() + 60,
+        })
+        response = get_or_render(key, lambda: self.fail('rebuilt twice'))
+        self.assertEqual(response.content, b'built-once')
+
+    def test_cached_page_keeps_headers(self):
+        def render():
+            response = HttpResponse(b'page', content_type='text/plain')
+            response['Cache-Control'] = 'private'
+            return response
+
+        key = 'feed-page:headers'
+        get_or_render(key, render)
+        response = get_or_render(key, lambda: self.fail('not cached'))
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertEqual(response['Cache-Control'], 'private')
+
+    # Поколения кэша процесса не видят правок других воркеров
+    @override_settings(FEED_CACHE_TIMEOUT=300, FEED_CACHE_LOCAL_TIMEOUT=5)
+    def test_process_cache_keeps_pages_briefly(self):
+        self.assertEqual(page_timeout(), 5)
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.group = Group.objects.create(slug='test-slug')
 
-        response2 = self.authorized_client.get(reverse('index'))
-        self.assertNotEqual(response2.context, None)
-        self.assertEqual(response2.context['page'][0].text, 'test-post')
+    def setUp(self):
+        self.guest_client = Client()
+
+    def add_posts(self, count):
+        for x in range(count):
+            post = Post.objects.create(
+                text=f'test-post-{x}',
+                author=self.user,
+                group=self.group,
+            )
+            Comment.objects.create(post=post, author=self.user, text='test')
+
+    def count_queries(self, adress):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(adress)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    # Число запросов ленты не зависит от числа карточек на странице
+    def test_feed_queries_do_not_grow(self):
+        pages_names = {
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+        }
+        self.add_posts(2)
+        before = {adress: self.count_queries(adress) for adress in pages_names}
+        self.add_posts(8)
+        for adress in pages_names:
+            with self.subTest(adress=adress):
+                self.assertEqual(self.count_queries(adress), before[adress])
+
+    def test_comments_count_on_card(self):
+        self.add_posts(1)
+        cache.clear()
+        response = self.guest_client.get(reverse('index'))
+        self.assertEqual(response.context['page'][0].comment_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.group = Group.objects.create(title='test-group', slug='test-slug')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='test-post', author=self.user, group=self.group)
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.adress = reverse('group_posts', kwargs={'slug': 'test-slug'})
+
+    # Карточка берётся из кэша, пока запись не изменилась
+    def test_card_is_cached(self):
+        self.guest_client.get(self.adress)
+        Post.objects.filter(pk=self.post.pk).update(text='changed-quietly')
+        response = self.guest_client.get(self.adress)
+        self.assertContains(response, 'test-post')
+
+    def test_post_edit_invalidates_card(self):
+        self.guest_client.get(self.adress)
+        self.post.text = 'edited-post'
+        self.post.save()
+        response = self.guest_client.get(self.adress)
+        self.assertContains(response, 'edited-post')
+
+    def test_comment_invalidates_card(self):
+        self.guest_client.get(self.adress)
+        Comment.objects.create(post=self.post, author=self.user, text='test')
+        response = self.guest_client.get(self.adress)
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_group_change_invalidates_card(self):
+        self.guest_client.get(self.adress)
+        self.group.title = 'renamed-group'
+        self.group.save()
+        response = self.guest_client.get(self.adress)
+        self.assertContains(response, '#renamed-group')
+
+    def test_edit_button_depends_on_viewer(self):
+        self.guest_client.get(self.adress)
+        response = self.authorized_client.get(self.adress)
+        self.assertContains(response, 'Редактировать')
+        response = self.guest_client.get(self.adress)
+        self.assertNotContains(response, 'Редактировать')
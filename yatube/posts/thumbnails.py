@@ -0,0 +1,129 @@
+"""Фоновая сборка вариантов картинок записей.
+
+Ленты не уменьшают картинки сами: карточка выводит только готовые
+варианты (posts/variants.py), а недостающие ставятся в очередь пула
+потоков. Пока вариантов нет, карточка показывает заглушку. Готовые
+варианты поднимают версию записи и поколение лент, чтобы
+закэшированные карточки пересобрались.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+
+from . import media, variants
+from .models import Post
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_QUEUE_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def _shared_variants(name):
+    """Варианты того же файла, уже собранные для другой записи."""
+    candidates = Post.objects.filter(image=name).exclude(
+        image_variants='').values_list('image_variants', flat=True)
+    for data in candidates:
+        if media.variant_names(data, name):
+            return data
+    return None
+
+
+def _attach(post, data, rendered=()):
+    """Взять ссылки на файлы вариантов и записать варианты в запись.
+
+    Ссылки берутся в транзакции, то есть под той же блокировкой записи,
+    под которой media.collect удаляет файл вместе со строкой без ссылок:
+    проверенный здесь файл уже не пропадёт.
+    """
+    with transaction.atomic():
+        if data is None:
+            # Ссылки другой записи держат её файлы, пока строка на месте
+            data = _shared_variants(post.image.name)
+            if data is None:
+                return False
+        names = media.variant_names(data)
+        media.acquire(*names)
+        # Обычно файлы уже записаны: проверка, что их не удалили
+        variants.store(rendered)
+    # update() без сигналов; картинку могли заменить, пока шла сборка
+    updated = Post.objects.filter(pk=post.pk, image=post.image.name).update(
+        image_variants=data, version=F('version') + 1)
+    if not updated:
+        media.release(*names)
+    return bool(updated)
+
+
+def build_variants(post_id):
+    """Собрать адаптивные варианты картинки; True, если они появились."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image or variants.loads(post):
+        return False
+
+    # Тот же файл у другой записи: варианты уже собраны
+    if _shared_variants(post.image.name) is not None:
+        updated = _attach(post, None)
+    else:
+        try:
+            rendered = variants.render(post.image)
+        except OSError:
+            logger.warning(
+                'Не удалось прочитать картинку %s', post.image.name)
+            return False
+        data = variants.dumps(post.image.name, variants.store(rendered))
+        updated = _attach(post, data, rendered)
+    if updated:
+        _refresh_card(post)
+    return updated
+
+
+def _refresh_card(post):
+    # Версию записи уже поднял _attach
+    from .signals import invalidate_feeds
+    invalidate_feeds(
+        [post.group_id], post_ids=[post.pk], author_ids=[post.author_id])
+
+
+def _run(key, task, args):
+    try:
+        task(*args)
+    except Exception:
+        logger.exception('Задача %s%r завершилась ошибкой', key[0], args)
+    finally:
+        with _lock:
+            _pending.discard(key)
+        connections.close_all()
+
+
+def submit(task, *args):
+    """Отдать задачу в пул потоков (или выполнить сразу в режиме EAGER)."""
+    if settings.THUMBNAIL_QUEUE_EAGER:
+        task(*args)
+        return None
+    key = (task.__name__, args)
+    with _lock:
+        if key in _pending:
+            return None
+        _pending.add(key)
+    return _pool().submit(_run, key, task, args)
+
+
+def enqueue(task, *args):
+    """Поставить задачу в очередь после коммита текущей транзакции."""
+    transaction.on_commit(lambda: submit(task, *args))
@@ -0,0 +1,276 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, QuerySet, Subquery
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+def followers(author_id):
+    """Число подписчиков автора по его счётчикам."""
+    count = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    return count or 0
+
+
+def is_pulled_author(author_id):
+    """Записи авторов с огромным числом подписчиков читаем при показе
+    ленты, а не раскладываем по лентам при публикации.
+    """
+    return followers(author_id) >= settings.TIMELINE_FANOUT_LIMIT
+
+
+def _bulk_add(entries):
+    # Размер пачки INSERT выбирает сам Django: SQLite ограничивает
+    # число строк в одном составном SELECT
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Разложить новую запись по лентам подписчиков автора."""
+    if is_pulled_author(post.author_id):
+        return
+    batch_size = settings.TIMELINE_BATCH_SIZE
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    entries = []
+    for user_id in follower_ids.iterator(chunk_size=batch_size):
+        entries.append(TimelineEntry(
+            user_id=user_id, post_id=post.pk, pub_date=post.pub_date))
+        if len(entries) == batch_size:
+            _bulk_add(entries)
+            entries = []
+    _bulk_add(entries)
+
+
+def _newest_posts(author_id):
+    """Последние `TIMELINE_BACKFILL_SIZE` записей автора для ленты."""
+    return Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk').values('id', 'pub_date')[
+        :settings.TIMELINE_BACKFILL_SIZE]
+
+
+def _cutoff(author_id):
+    """Дата самой новой записи автора, не попавшей в ленту, или None."""
+    size = settings.TIMELINE_BACKFILL_SIZE
+    dates = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk').values_list('pub_date', flat=True)
+    return next(iter(dates[size:size + 1]), None)
+
+
+def backfill(user_id, author_id):
+    """Добавить в ленту подписчика последние записи нового автора.
+
+    Только для авторов, которых не подмешивают при чтении: это
+    проверяет вызывающий (posts/tasks.py). Более старые записи лента
+    читает запросом по подпискам (`feed_for`).
+    """
+    follow = Follow.objects.filter(user_id=user_id, author_id=author_id)
+    _insert_select(follow.values('user_id'), _newest_posts(author_id))
+    follow.update(timeline_cutoff=_cutoff(author_id))
+
+
+def refill(author_id):
+    """Заново разложить записи автора, переставшего быть популярным.
+
+    Пока автор подмешивался при чтении, его записи не раскладывались по
+    лентам. Подписчики обрабатываются пачками, каждая в своей
+    транзакции: блокировка записи не держится дольше, чем нужно на
+    `TIMELINE_REFILL_ROWS` строк. Возвращает число добавленных строк.
+    """
+    if is_pulled_author(author_id):
+        return 0
+    posts = _newest_posts(author_id)
+    cutoff = _cutoff(author_id)
+    size = max(
+        1, settings.TIMELINE_REFILL_ROWS // settings.TIMELINE_BACKFILL_SIZE)
+    # Подписчиков у такого автора меньше TIMELINE_FANOUT_LIMIT
+    user_ids = list(Follow.objects.filter(author_id=author_id).order_by(
+        'user_id').values_list('user_id', flat=True))
+    total = 0
+    for start in range(0, len(user_ids), size):
+        batch = user_ids[start:start + size]
+        follows = Follow.objects.filter(
+            author_id=author_id, user_id__in=batch)
+        with transaction.atomic():
+            total += _insert_select(follows.values('user_id'), posts)
+            follows.update(timeline_cutoff=cutoff)
+    return total
+
+
+def _insert_select(follows, posts):
+    """INSERT ... SELECT всех пар (подписчик, запись) на стороне БД."""
+    follows_sql, follows_params = follows.query.sql_with_params()
+    posts_sql, posts_params = posts.query.sql_with_params()
+    table = TimelineEntry._meta.db_table
+    # Строки, уже лежащие в ленте, пропускаются, как в _bulk_add
+    insert = connection.ops.insert_statement(ignore_conflicts=True)
+    suffix = connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{insert} {table} (user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date '
+            f'FROM ({follows_sql}) f CROSS JOIN ({posts_sql}) p {suffix}',
+            follows_params + posts_params)
+        return cursor.rowcount
+
+
+def rebuild(usernames=()):
+    """Пересобрать ленты подписок: по одному INSERT ... SELECT на автора.
+
+    Как и при подписке, в ленту попадают последние
+    `TIMELINE_BACKFILL_SIZE` записей каждого автора.
+    """
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if usernames:
+        entries = entries.filter(user__username__in=usernames)
+        follows = follows.filter(user__username__in=usernames)
+
+    authors = Follow.objects.values('author').annotate(
+        followers=Count('pk')).filter(
+        followers__lt=settings.TIMELINE_FANOUT_LIMIT).values_list(
+        'author', flat=True)
+    total = 0
+    with transaction.atomic():
+        entries.delete()
+        for author_id in list(authors):
+            author_follows = follows.filter(author_id=author_id)
+            total += _insert_select(
+                author_follows.values('user_id'), _newest_posts(author_id))
+            author_follows.update(timeline_cutoff=_cutoff(author_id))
+    return total
+
+
+def read_through(usernames=()):
+    """Оставить ленты пустыми: все записи читаются запросом по подпискам.
+
+    Граница каждой подписки сдвигается на последнюю запись автора, а
+    строки ленты удаляются. Новые записи раскладываются как обычно.
+    """
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if usernames:
+        entries = entries.filter(user__username__in=usernames)
+        follows = follows.filter(user__username__in=usernames)
+    newest = Post.objects.filter(author_id=OuterRef('author_id')).order_by(
+        '-pub_date').values('pub_date')[:1]
+    with transaction.atomic():
+        entries.delete()
+        return follows.update(timeline_cutoff=Subquery(newest))
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+class SplitFeed:
+    """Лента из двух частей, упорядоченных по дате и не пересекающихся.
+
+    `newer` — записи новее границы, `older` — остальные. Методы,
+    возвращающие QuerySet (for_feed, values, filter, order_by), меняют
+    обе части; срез ленты — срез первой части, дополненный началом
+    второй. Этого достаточно для Paginator и KeysetPaginator.
+    """
+
+    def __init__(self, newer, older, ascending=False):
+        self.newer = newer
+        self.older = older
+        self.ascending = ascending
+
+    def __getattr__(self, name):
+        attribute = getattr(self.newer, name)
+        if not callable(attribute):
+            return attribute
+
+        def method(*args, **kwargs):
+            newer = attribute(*args, **kwargs)
+            if not isinstance(newer, QuerySet):
+                raise TypeError(f'{name}() не поддерживается лентой')
+            ascending = self.ascending
+            if name == 'order_by' and args:
+                ascending = not str(args[0]).startswith('-')
+            return SplitFeed(
+                newer, getattr(self.older, name)(*args, **kwargs), ascending)
+        return method
+
+    def _parts(self):
+        if self.ascending:
+            return self.older, self.newer
+        return self.newer, self.older
+
+    def count(self):
+        return self.newer.count() + self.older.count()
+
+    def exists(self):
+        return self.newer.exists() or self.older.exists()
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        first, second = self._parts()
+        yield from first
+        yield from second
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            rows = self[key:key + 1]
+            if not rows:
+                raise IndexError(key)
+            return rows[0]
+        if key.step is not None:
+            raise TypeError('Шаг среза не поддерживается лентой')
+        first, second = self._parts()
+        start, stop = key.start or 0, key.stop
+        rows = list(first[start:stop])
+        if stop is not None and len(rows) == stop - start:
+            return rows
+        # Первая часть кончилась: сколько её строк лежит до среза
+        taken = start + len(rows) if rows or not start else first.count()
+        offset = max(0, start - taken)
+        if stop is None:
+            return rows + list(second[offset:])
+        return rows + list(second[offset:offset + stop - start - len(rows)])
+
+
+def feed_for(user):
+    """Записи ленты подписок пользователя.
+
+    Обычные авторы уже разложены в `TimelineEntry`, и лента читается
+    одним диапазоном индекса `(user, pub_date, post)`. Записи авторов
+    с числом подписчиков от `TIMELINE_FANOUT_LIMIT` подмешиваются при
+    чтении. Ключи сортировки ленты — аннотации `feed_date` и `feed_id`.
+
+    При подписке в ленту попадают только последние записи автора, и
+    `Follow.timeline_cutoff` помнит, до какой даты лента неполна. Ниже
+    самой поздней такой границы лента читается запросом по подпискам
+    (`SplitFeed`), а первые страницы — по-прежнему из `TimelineEntry`.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    follows = Follow.objects.filter(user=user)
+    state = follows.aggregate(
+        pulled=Count(
+            'pk', filter=Q(author__stats__followers_count__gte=limit)),
+        cutoff=Max(
+            'timeline_cutoff',
+            filter=Q(author__stats__followers_count__lt=limit)),
+    )
+    if not state['pulled']:
+        newer = Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_id=F('timeline_entries__post'))
+    else:
+        condition = Q(pk__in=TimelineEntry.objects.filter(
+            user=user).values('post')) | Q(author__in=follows.filter(
+                author__stats__followers_count__gte=limit).values('author'))
+        newer = Post.objects.filter(condition).annotate(
+            feed_date=F('pub_date'), feed_id=F('pk'))
+    cutoff = state['cutoff']
+    if cutoff is None:
+        return newer
+
+    older = Post.objects.filter(
+        author__in=follows.values('author'), pub_date__lte=cutoff,
+    ).annotate(feed_date=F('pub_date'), feed_id=F('pk'))
+    return SplitFeed(newer.filter(feed_date__gt=cutoff), older)
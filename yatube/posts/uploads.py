@@ -0,0 +1,164 @@
+"""Потоковая загрузка картинок записей с ограничениями.
+
+Файл пишется на диск кусками и обрывается, как только превысит
+POST_IMAGE_MAX_BYTES. Размер в пикселях проверяется по заголовку до
+декодирования; затем картинка пересохраняется без метаданных (EXIF с
+геометкой и т. п.) и уменьшается до POST_IMAGE_MAX_SIDE по большей стороне.
+JPEG при этом декодируется сразу в уменьшенном масштабе.
+"""
+import os
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import (
+    SkipFile, TemporaryFileUploadHandler)
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+
+# Во что пересохранять картинку; прочие форматы превращаются в PNG
+SAVE_FORMATS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+    'GIF': {},
+}
+
+# Режимы, которые формат умеет сохранять; остальные (CMYK в PNG, I;16
+# в JPEG, ...) переводятся в RGB или RGBA
+SAVE_MODES = {
+    'JPEG': ('1', 'L', 'RGB', 'CMYK'),
+    'PNG': ('1', 'L', 'LA', 'I', 'I;16', 'P', 'RGB', 'RGBA'),
+    'WEBP': ('RGB', 'RGBA'),
+    'GIF': ('1', 'L', 'P'),
+}
+
+EXTENSIONS = {
+    'JPEG': ('.jpg', '.jpeg'),
+    'PNG': ('.png',),
+    'WEBP': ('.webp',),
+    'GIF': ('.gif',),
+}
+
+
+class UploadRejected(Exception):
+    pass
+
+
+def _convert(image, image_format):
+    if image.mode in SAVE_MODES[image_format]:
+        return image
+    alpha = 'A' in image.getbands() or 'transparency' in image.info
+    if alpha and 'RGBA' in SAVE_MODES[image_format]:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def _reencode(image, uploaded):
+    image_format = image.format if image.format in SAVE_FORMATS else 'PNG'
+    # JPEG можно декодировать сразу в уменьшенном масштабе
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    image.draft(image.mode, (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    image = _convert(image, image_format)
+
+    name = uploaded.name
+    if not name.lower().endswith(EXTENSIONS[image_format]):
+        name = os.path.splitext(name)[0] + EXTENSIONS[image_format][0]
+    cleaned = TemporaryUploadedFile(
+        name, Image.MIME[image_format], 0, uploaded.charset,
+        uploaded.content_type_extra)
+    options = dict(SAVE_FORMATS[image_format])
+    # Метаданные не переносятся, кроме цветового профиля и прозрачности
+    for key in ('icc_profile', 'transparency'):
+        if key in image.info:
+            options[key] = image.info[key]
+    image.save(cleaned.file, image_format, **options)
+    cleaned.size = cleaned.file.tell()
+    cleaned.file.seek(0)
+    return cleaned
+
+
+def sanitize_image(uploaded):
+    """Проверить и пересохранить загруженную картинку.
+
+    Не-картинки возвращаются как есть, их отклонит ImageField формы.
+    """
+    try:
+        # Открытие читает только заголовок, пиксели ещё не декодированы
+        image = Image.open(uploaded.temporary_file_path())
+    except (OSError, Image.DecompressionBombError):
+        return uploaded
+    with image:
+        pixels = image.width * image.height
+        if pixels > settings.POST_IMAGE_MAX_PIXELS:
+            raise UploadRejected(
+                f'Картинка {image.width}×{image.height} слишком большая: '
+                f'не больше {settings.POST_IMAGE_MAX_PIXELS} пикселей.')
+        if getattr(image, 'is_animated', False):
+            # Анимацию не пересобираем, чтобы не потерять кадры
+            return uploaded
+        try:
+            cleaned = _reencode(image, uploaded)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Обрезанный файл, неподдерживаемое сжатие или режим
+            raise UploadRejected(
+                'Не удалось прочитать картинку: файл повреждён или '
+                'сохранён в неподдерживаемом формате.')
+    uploaded.close()
+    return cleaned
+
+
+class BoundedImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет файлы на диск и отклоняет слишком большие и опасные картинки.
+
+    Причины отказа по полям собираются в `errors`, форма показывает их
+    как ошибки полей.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.errors = {}
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            limit = filesizeformat(settings.POST_IMAGE_MAX_BYTES)
+            self.errors[self.field_name] = f'Файл больше {limit}.'
+            # Остаток файла парсер прочитает и выбросит, не сохраняя
+            raise SkipFile()
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        try:
+            return sanitize_image(uploaded)
+        except UploadRejected as error:
+            uploaded.close()
+            self.errors[self.field_name] = str(error)
+            return None
+
+
+def bounded_uploads(view):
+    """Разбирать загрузки представления BoundedImageUploadHandler'ом.
+
+    Обработчики можно заменить только до чтения request.POST, а его читает
+    CsrfViewMiddleware, поэтому проверка CSRF переносится внутрь.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        handler = BoundedImageUploadHandler(request)
+        request.upload_handlers = [handler]
+        request.upload_errors = handler.errors
+        return protected(request, *args, **kwargs)
+    return wrapper
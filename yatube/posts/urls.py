@@ -9,6 +9,8 @@ urlpatterns = [
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
     path('new/', views.new_post, name='new_post'),
     path("follow/", views.follow_index, name="follow_index"),
+    path("search/", views.search, name="search"),
+    path("events/", views.events, name="events"),
     path(
         "<str:username>/follow/",
         views.profile_follow, name="profile_follow"),
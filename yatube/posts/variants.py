@@ -0,0 +1,149 @@
+"""Адаптивные варианты картинок записей.
+
+Для каждой картинки собираются кадры карточки нескольких ширин в форматах
+AVIF (если его умеет Pillow), WebP и JPEG. Имена файлов — хэш содержимого,
+поэтому одинаковые кадры хранятся один раз, а ссылки на них можно отдавать
+с бессрочным кэшированием.
+"""
+import hashlib
+import io
+import json
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+EXTENSIONS = {
+    'AVIF': 'avif',
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+
+SAVE_OPTIONS = {
+    'AVIF': {'quality': 60},
+    'WEBP': {'quality': 80, 'method': 4},
+    'JPEG': {'quality': 85, 'progressive': True, 'optimize': True},
+}
+
+
+def available_formats():
+    """Форматы из настроек, которые умеет сохранять Pillow; JPEG — всегда."""
+    Image.init()
+    formats = [
+        name for name in settings.POST_IMAGE_FORMATS
+        if name != 'JPEG' and name in Image.SAVE
+    ]
+    return formats + ['JPEG']
+
+
+def card_size(width):
+    card_width, card_height = settings.POST_IMAGE_CARD_SIZE
+    return width, round(width * card_height / card_width)
+
+
+def card_widths(source_width):
+    # Увеличиваем только до самой узкой ширины, как upscale у миниатюр
+    widths = sorted(settings.POST_IMAGE_WIDTHS)
+    return [widths[0]] + [
+        width for width in widths[1:] if width <= source_width]
+
+
+def _name(data, width, image_format):
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    return f'posts/variants/{digest}-{width}w.{EXTENSIONS[image_format]}'
+
+
+def render(image_file):
+    """Собрать кадры картинки в памяти: пары (описание, содержимое)."""
+    image_file.open('rb')
+    try:
+        with Image.open(image_file) as image:
+            widths = card_widths(image.width)
+            # JPEG можно декодировать сразу в уменьшенном масштабе
+            image.draft('RGB', card_size(widths[-1]))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            rendered = []
+            for width in widths:
+                size = card_size(width)
+                frame = ImageOps.fit(image, size, Image.LANCZOS)
+                for image_format in available_formats():
+                    buffer = io.BytesIO()
+                    frame.save(
+                        buffer, image_format, **SAVE_OPTIONS[image_format])
+                    data = buffer.getvalue()
+                    rendered.append(({
+                        'format': image_format,
+                        'width': size[0],
+                        'height': size[1],
+                        'name': _name(data, width, image_format),
+                    }, data))
+    finally:
+        image_file.close()
+    return rendered
+
+
+def store(rendered):
+    """Записать недостающие файлы кадров; вернуть их описания.
+
+    Пока на файл нет ссылки, posts/media.py может удалить его как
+    ненужный, поэтому thumbnails.build_variants повторяет запись в
+    транзакции, которая берёт ссылки.
+    """
+    for variant, data in rendered:
+        if not default_storage.exists(variant['name']):
+            default_storage.save(variant['name'], ContentFile(data))
+    return [variant for variant, _ in rendered]
+
+
+def build(image_file):
+    """Собрать и сохранить варианты картинки; вернуть их описания."""
+    return store(render(image_file))
+
+
+def dumps(source, variants):
+    return json.dumps({'source': source, 'variants': variants})
+
+
+def loads(post):
+    """Варианты текущей картинки записи; после замены картинки — пусто."""
+    if not post.image or not post.image_variants:
+        return []
+    data = json.loads(post.image_variants)
+    if data['source'] != post.image.name:
+        return []
+    return data['variants']
+
+
+def picture(variants):
+    """Данные для разметки <picture>: источники по форматам и запасной <img>.
+    """
+    by_format = {}
+    for variant in variants:
+        by_format.setdefault(variant['format'], []).append(variant)
+
+    def srcset(items):
+        return ', '.join(
+            f"{default_storage.url(item['name'])} {item['width']}w"
+            for item in items)
+
+    fallback = by_format.pop('JPEG')
+    largest = fallback[-1]
+    return {
+        'sources': [
+            {'type': MIME_TYPES[name], 'srcset': srcset(items)}
+            for name, items in by_format.items()
+        ],
+        'src': default_storage.url(largest['name']),
+        'srcset': srcset(fallback),
+        'width': largest['width'],
+        'height': largest['height'],
+        'sizes': settings.POST_IMAGE_SIZES,
+    }
@@ -1,23 +1,29 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.paginator import Paginator
 from .models import Post, Group, Comment, Follow
 from .forms import PostForm, CommentForm
+from .paginators import get_page
+from .counters import user_stats
+from .timeline import feed_for
+from .feed_cache import cache_feed, group_scope
+from .conditional import (
+    conditional_page, group_state, post_state, profile_state)
+from .uploads import bounded_uploads
+from .search import search_page
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.http import HttpResponse
+from django.utils.http import urlencode
 
 
 User = get_user_model()
 
 
-@cache_page(20)
+@cache_feed('index')
 def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
+    post_list = Post.objects.for_feed().order_by('-pub_date')
     group = Post.objects.all()
 
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = get_page(request, post_list, 'index')
 
     context = {
         'page': page,
@@ -27,13 +33,13 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_state)
+@cache_feed(group_scope)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group).order_by("-pub_date")
+    posts = Post.objects.for_feed().filter(group=group).order_by("-pub_date")
 
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = get_page(request, posts, 'group_posts')
 
     context = {
         "group": group,
@@ -43,57 +49,81 @@ def group_posts(request, slug):
     return render(request, "posts/group.html", context)
 
 
-def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all().order_by("-pub_date")
+def is_following(user, username):
+    return user.is_authenticated and Follow.objects.filter(
+        user=user, author__username=username).exists()
 
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
 
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author).exists()
+def profile_posts(username):
+    return Post.objects.for_feed().filter(
+        author__username=username).order_by("-pub_date")
 
-    context = {
+
+def profile_context(author, page, following):
+    """Контекст профиля; общий с posts/async_views.py."""
+    stats = user_stats(author)
+
+    return {
         'page': page,
         'author': author,
-        'posts_count': author.posts.count(),
+        'stats': stats,
+        'posts_count': stats.posts_count,
         'following': following,
     }
 
+
+@conditional_page(profile_state)
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    page = get_page(request, profile_posts(username), 'profile')
+    following = is_following(request.user, username)
+
+    context = profile_context(author, page, following)
+
     return render(request, 'posts/profile.html', context)
 
 
-def post_view(request, username, post_id):
-    author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
-    comment = Comment.objects.filter(post=post).order_by("-created")
-    form = CommentForm()
+def post_comments(username, post_id):
+    return Comment.objects.filter(
+        post_id=post_id, post__author__username=username,
+    ).select_related("author").order_by("-created")
 
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author).exists()
 
-    context = {
+def post_context(post, comments, following):
+    """Контекст страницы записи; общий с posts/async_views.py."""
+    stats = user_stats(post.author)
+
+    return {
         "post": post,
         "author": post.author,
-        "posts_count": post.author.posts.count(),
-        "comments": comment,
-        "form": form,
+        "stats": stats,
+        "posts_count": stats.posts_count,
+        "comments": comments,
+        "form": CommentForm(),
         'following': following,
     }
 
+
+@conditional_page(post_state)
+def post_view(request, username, post_id):
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related("author__stats"),
+        author__username=username, pk=post_id)
+    comments = post_comments(username, post_id)
+    following = is_following(request.user, username)
+
+    context = post_context(post, comments, following)
+
     return render(request, "posts/post.html", context)
 
 
 @login_required
 def add_comment(request, username, post_id):
     author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.for_feed(), author__username=username, pk=post_id)
+    comments = post.comments.select_related("author")
     form = CommentForm(request.POST or None)
 
     if form.is_valid():
@@ -105,27 +135,35 @@ def add_comment(request, username, post_id):
     else:
         form = CommentForm()
 
+    stats = user_stats(author)
+
     context = {
         "form": form,
         "post": post,
         "comments": comments,
         "author": author,
+        "stats": stats,
+        "posts_count": stats.posts_count,
     }
 
     return render(request, "posts/post.html", context)
 
 
 @login_required
+@bounded_uploads
 def new_post(request):
     is_new = True
     if request.method == "POST":
-        form = PostForm(request.POST or None, files=request.FILES or None)
+        form = PostForm(
+            request.POST or None, files=request.FILES or None,
+            upload_errors=request.upload_errors)
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
             post.save()
             return redirect("index")
-    form = PostForm()
+    else:
+        form = PostForm()
 
     context = {
         "form": form,
@@ -136,13 +174,15 @@ def new_post(request):
 
 
 @login_required
+@bounded_uploads
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, pk=post_id)
 
     if request.user == post.author:
         form = PostForm(
             request.POST or None,
-            files=request.FILES or None, instance=post)
+            files=request.FILES or None, instance=post,
+            upload_errors=request.upload_errors)
 
         if form.is_valid():
             form.save()
@@ -163,12 +203,11 @@ def post_edit(request, username, post_id):
 @login_required
 def follow_index(request):
     # информация о текущем пользователе доступна в переменной request.user
-    post_list = Post.objects.filter(
-        author__following__user=request.user).order_by('-pub_date')
+    post_list = feed_for(request.user).for_feed().order_by(
+        '-feed_date', '-feed_id')
 
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = get_page(
+        request, post_list, 'follow_index', keys=('feed_date', 'feed_id'))
 
     context = {'page': page}
 
@@ -196,6 +235,28 @@ def profile_unfollow(request, username):
     return redirect('profile', username=username)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = search_page(
+        query,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'))
+
+    context = {
+        'query': query,
+        'page': page,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+
+    return render(request, 'posts/search.html', context)
+
+
+def events(request):
+    # Поток событий обслуживает yatube/asgi.py; под WSGI ответ 204
+    # останавливает переподключения EventSource
+    return HttpResponse(status=204)
+
+
 def page_not_found(request, exception):
     return render(
         request,
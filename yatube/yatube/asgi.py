@@ -0,0 +1,40 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``. Страницы выполняет WSGI-приложение Django в пуле из
+ASGI_THREADS потоков (yatube/asgi_bridge.py), кроме страниц только для
+чтения из posts/async_views.py, которые работают с базой в своём пуле.
+Поток событий /events/ обслуживается асинхронно (posts/events.py).
+
+Запуск из каталога yatube: uvicorn yatube.asgi:application
+"""
+
+import os
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+wsgi_application = get_wsgi_application()
+
+from posts import async_views, events  # noqa: E402 (после настройки)
+from .asgi_bridge import AsyncViews, WsgiToAsgi  # noqa: E402
+
+EVENTS_PATH = reverse('events')
+
+django_application = WsgiToAsgi(wsgi_application, settings.ASGI_THREADS)
+
+if settings.ASGI_ASYNC_VIEWS:
+    pages_application = AsyncViews(
+        async_views.VIEWS, async_views.run_db, fallback=django_application)
+else:
+    pages_application = django_application
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await events.stream(scope, receive, send)
+    return await pages_application(scope, receive, send)
@@ -0,0 +1,279 @@
+"""Запуск WSGI-приложения Django 2.2 под ASGI-сервером.
+
+Django 2.2 не умеет ASGI, поэтому обычный запрос целиком выполняется
+WSGI-приложением в пуле потоков, а цикл asyncio остаётся свободным для
+долгих соединений (поток событий posts/events.py). Для части страниц
+есть асинхронные представления (posts/async_views.py), их обслуживает
+AsyncViews.
+"""
+import asyncio
+import contextvars
+import io
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import WSGIRequest, get_script_name
+from django.urls import Resolver404, resolve, set_script_prefix
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+
+# Тело запроса больше этого размера пишется во временный файл
+SPOOL_SIZE = 1024 * 1024
+
+
+def _environ(scope, body):
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        # WSGI передаёт путь байтами, прочитанными как latin-1
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin1').upper().replace('-', '_')
+        value = raw_value.decode('latin1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+class WsgiToAsgi:
+    """ASGI-приложение поверх WSGI-приложения и пула потоков."""
+
+    def __init__(self, wsgi_application, max_workers):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(
+                f"Неподдерживаемый тип соединения: {scope['type']}")
+
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+
+        loop = asyncio.get_running_loop()
+        try:
+            status, headers, chunks = await loop.run_in_executor(
+                self.executor, self.run, _environ(scope, body))
+        finally:
+            body.close()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        for chunk in chunks:
+            await send({
+                'type': 'http.response.body', 'body': chunk,
+                'more_body': True,
+            })
+        await send({'type': 'http.response.body', 'body': b''})
+
+    def run(self, environ):
+        """Выполнить запрос в потоке пула и собрать ответ целиком."""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ]
+            return lambda data: chunks.append(data)
+
+        chunks = []
+        result = self.wsgi_application(environ, start_response)
+        try:
+            chunks.extend(chunk for chunk in result if chunk)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], chunks
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+class AsyncViews:
+    """ASGI-приложение для асинхронных представлений GET-запросов.
+
+    `views` сопоставляет синхронные представления из urls.py их
+    асинхронным версиям; остальные запросы уходят в `fallback`. Django 2.2
+    не вызывает асинхронные представления сам, поэтому цепочка middleware
+    проходится здесь же по их хукам process_request/process_view и
+    process_response (в пуле `run_sync`). Если какое-то middleware их не
+    поддерживает (не MiddlewareMixin), все запросы идут в `fallback`.
+    """
+
+    def __init__(self, views, run_sync, fallback):
+        self.views = views
+        self.run_sync = run_sync
+        self.fallback = fallback
+        self.middleware = self.load_middleware()
+
+    @staticmethod
+    def load_middleware():
+        middleware = []
+        for path in settings.MIDDLEWARE:
+            factory = import_string(path)
+            if not issubclass(factory, MiddlewareMixin):
+                return None
+            try:
+                middleware.append(factory())
+            except MiddlewareNotUsed:
+                pass
+        return middleware
+
+    def match(self, scope):
+        if (self.middleware is None or scope['type'] != 'http'
+                or scope['method'] not in ('GET', 'HEAD')):
+            return None, None
+        try:
+            match = resolve(scope['path'])
+        except Resolver404:
+            return None, None
+        return self.views.get(match.func), match
+
+    async def __call__(self, scope, receive, send):
+        view, match = self.match(scope)
+        if view is None:
+            return await self.fallback(scope, receive, send)
+
+        environ = _environ(scope, io.BytesIO())
+        set_script_prefix(get_script_name(environ))
+        request = WSGIRequest(environ)
+        request.resolver_match = match
+
+        response, used, context = await self.run_sync(
+            self.before_view, request, match)
+        # Контекстные переменные, заданные middleware в потоке пула (выбор
+        # реплики yatube/replicas.py), нужны и представлению
+        for variable, value in context.items():
+            variable.set(value)
+        if response is None:
+            try:
+                response = await view(request, *match.args, **match.kwargs)
+            except Exception as exc:
+                # Здесь же, пока доступен sys.exc_info() для страницы 500
+                response = response_for_exception(request, exc)
+        response = await self.run_sync(
+            self.after_view, request, response, used)
+        await self.send_response(send, response)
+
+    def before_view(self, request, match):
+        """Хуки middleware до представления.
+
+        Возвращает ответ (если middleware ответило само или упало),
+        число middleware, чьи process_response нужно вызвать, и
+        контекстные переменные после хуков.
+        """
+        response, used = self.process_request(request)
+        if response is None:
+            response = self.process_view(request, match)
+        if response is None:
+            # Пользователь сессии нужен почти каждой странице: загрузим
+            # его здесь, а не одновременно из нескольких потоков
+            user = getattr(request, 'user', None)
+            if user is not None:
+                user.is_authenticated
+        return response, used, contextvars.copy_context()
+
+    def process_request(self, request):
+        for number, middleware in enumerate(self.middleware, 1):
+            hook = getattr(middleware, 'process_request', None)
+            if hook is None:
+                continue
+            try:
+                response = hook(request)
+            except Exception as exc:
+                return response_for_exception(request, exc), number - 1
+            if response:
+                return response, number
+        return None, len(self.middleware)
+
+    def process_view(self, request, match):
+        for middleware in self.middleware:
+            hook = getattr(middleware, 'process_view', None)
+            if hook is None:
+                continue
+            try:
+                response = hook(
+                    request, match.func, match.args, match.kwargs)
+            except Exception as exc:
+                response = response_for_exception(request, exc)
+            if response:
+                return response
+        return None
+
+    def after_view(self, request, response, used):
+        for middleware in reversed(self.middleware[:used]):
+            hook = getattr(middleware, 'process_response', None)
+            if hook is None:
+                continue
+            try:
+                response = hook(request, response)
+            except Exception as exc:
+                response = response_for_exception(request, exc)
+        return response
+
+    async def send_response(self, send, response):
+        headers = [
+            *response.items(),
+            *(('Set-Cookie', cookie.output(header=''))
+              for cookie in response.cookies.values()),
+        ]
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': response.content})
+        # close() рассылает request_finished, и close_old_connections
+        # закрывает соединения потока цикла; соединения пула живут дольше
+        response.close()
@@ -0,0 +1,213 @@
+import os
+import pickle
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import (
+    FileBasedCache as DjangoFileBasedCache)
+from django.core.cache.backends.locmem import LocMemCache as DjangoLocMemCache
+from django.core.files import locks
+
+from . import metrics
+
+
+_MISSING = object()
+_NAMESPACE = re.compile(r'[\w-]+')
+
+
+def namespace_of(key):
+    """`feed-page:index:...` -> `feed-page`, `template.cache...` -> `template`.
+    """
+    match = _NAMESPACE.match(key)
+    return match.group() if match else 'other'
+
+
+class CacheStats:
+    """Счётчики попаданий и промахов по пространствам имён ключей."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+
+    def record(self, alias, key, outcome):
+        with self._lock:
+            self._counters[(alias, namespace_of(key), outcome)] += 1
+        request = metrics.current()
+        if request is not None:
+            request.add_cache(outcome)
+
+    def snapshot(self):
+        """Вернуть `{(alias, namespace, outcome): count}`."""
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+stats = CacheStats()
+
+
+class MetricsMixin:
+    """Считает попадания и промахи `get()` для обычных бэкендов."""
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.alias = params.get('OPTIONS', {}).get('ALIAS', 'default')
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            stats.record(self.alias, key, 'miss')
+            return default
+        stats.record(self.alias, key, 'hit')
+        return value
+
+
+class LocMemCache(MetricsMixin, DjangoLocMemCache):
+    pass
+
+
+class FileBasedCache(MetricsMixin, DjangoFileBasedCache):
+    """Файловый кэш, общий для всех процессов.
+
+    У Django `add` — это has_key и set, а `incr` — get и set: два воркера
+    могут оба взять блокировку пересборки страницы или потерять
+    приращение поколения ленты. Здесь оба шага выполняются под
+    блокировкой файла; файлов блокировок 256, ключ выбирает свой по
+    первым символам имени файла кэша.
+    """
+
+    @contextmanager
+    def _locked(self, key, version):
+        fname = self._key_to_file(key, version)
+        self._createdir()
+        # Суффикс .lock не попадает ни в _cull, ни в clear
+        stripe = os.path.join(self._dir, os.path.basename(fname)[:2] + '.lock')
+        with open(stripe, 'ab') as lock:
+            locks.lock(lock, locks.LOCK_EX)
+            try:
+                yield fname
+            finally:
+                locks.unlock(lock)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked(key, version):
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked(key, version) as fname:
+            try:
+                with open(fname, 'rb') as f:
+                    expiry = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except (FileNotFoundError, EOFError):
+                expiry = 0
+            now = time.time()
+            if expiry is not None and expiry < now:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            # Новое значение живёт столько же, сколько оставалось старому
+            timeout = None if expiry is None else expiry - now
+            self.set(key, value, timeout, version)
+            return value
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: короткоживущий L1 в процессе перед общим L2.
+
+    OPTIONS:
+        LOCAL — алиас локального кэша (L1), SHARED — общего (L2);
+        LOCAL_TIMEOUT — сколько секунд ключ живёт в L1;
+        SHARED_ONLY — пространства имён, которые читаются только из L2
+        (счётчики и блокировки, устаревание которых недопустимо).
+
+    Запись идёт в L2 и обновляет L1 текущего процесса; L1 других
+    процессов может отдавать прежнее значение до LOCAL_TIMEOUT секунд.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.alias = options.get('ALIAS', 'default')
+        self._local_alias = options.get('LOCAL', 'local')
+        self._shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.shared_only = frozenset(options.get('SHARED_ONLY', ()))
+
+    @property
+    def local(self):
+        return caches[self._local_alias]
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _uses_local(self, key):
+        return namespace_of(key) not in self.shared_only
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def get(self, key, default=None, version=None):
+        if self._uses_local(key):
+            value = self.local.get(key, _MISSING, version)
+            if value is not _MISSING:
+                stats.record(self.alias, key, 'hit_local')
+                return value
+
+        value = self.shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            stats.record(self.alias, key, 'miss')
+            return default
+        stats.record(self.alias, key, 'hit_shared')
+        if self._uses_local(key):
+            self.local.set(key, value, self.local_timeout, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        if self._uses_local(key):
+            self.local.set(key, value, self._local_timeout(timeout), version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added and self._uses_local(key):
+            self.local.set(key, value, self._local_timeout(timeout), version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(key, version)
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version)
+        self.shared.delete(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        self.local.delete(key, version)
+        return self.shared.decr(key, delta, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.local.close(**kwargs)
+        self.shared.close(**kwargs)
@@ -0,0 +1,166 @@
+"""SQLite для нагрузки нескольких потоков: WAL, прагмы и очередь записи.
+
+* На каждом новом соединении выполняются прагмы `pragmas` (можно
+  переопределить в OPTIONS['pragmas']): журнал WAL, в котором читатели не
+  ждут писателя, synchronous=NORMAL (в WAL это безопасно для целостности),
+  кэш страниц, отображение файла в память и ожидание блокировки.
+* Писатели одного процесса встают в очередь WriteQueue к файлу базы, а не
+  соревнуются за блокировку SQLite: её обработчик занятости спит
+  с нарастающими паузами, что под нагрузкой даёт длинные хвосты задержек.
+* Транзакция (transaction.atomic) начинается с BEGIN IMMEDIATE и сразу
+  берёт блокировку записи. Обычный BEGIN начинается как читающая
+  транзакция, и её повышение до пишущей при чужой записи сразу падает
+  с «database is locked», не дожидаясь busy_timeout.
+
+Между процессами записи по-прежнему разводит busy_timeout.
+"""
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class WriteQueue:
+    """Очередь писателей к одному файлу базы (первым пришёл — первым вошёл).
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._next = 0
+        self._serving = 0
+        # Билеты писателей, не дождавшихся очереди
+        self._abandoned = set()
+
+    def acquire(self, timeout):
+        with self._condition:
+            ticket = self._next
+            self._next += 1
+            if not self._condition.wait_for(
+                    lambda: self._serving == ticket, timeout):
+                self._abandoned.add(ticket)
+                raise OperationalError('database is locked')
+
+    def release(self):
+        with self._condition:
+            self._serving += 1
+            while self._serving in self._abandoned:
+                self._abandoned.remove(self._serving)
+                self._serving += 1
+            self._condition.notify_all()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def write_queue(name):
+    with _queues_lock:
+        return _queues.setdefault(name, WriteQueue())
+
+
+def is_write(query):
+    return query.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    """Отдельные пишущие запросы вне транзакции тоже ждут очереди."""
+
+    def __init__(self, connection, wrapper):
+        super().__init__(connection)
+        self.wrapper = wrapper
+
+    def execute(self, query, params=None):
+        if self.connection.in_transaction or not is_write(query):
+            return super().execute(query, params)
+        with self.wrapper.writing():
+            return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        if self.connection.in_transaction or not is_write(query):
+            return super().executemany(query, param_list)
+        with self.wrapper.writing():
+            return super().executemany(query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pragmas = {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        # Отрицательное значение — в килобайтах: 64 МБ
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'busy_timeout': 5000,
+        'temp_store': 'memory',
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.holds_write = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**self.pragmas, **params.pop('pragmas', {})}
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(
+            factory=partial(SQLiteCursorWrapper, wrapper=self))
+
+    @property
+    def queue(self):
+        # Имя базы меняется при создании тестовой базы
+        return write_queue(self.settings_dict['NAME'])
+
+    @contextmanager
+    def writing(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    def acquire_write(self):
+        self.queue.acquire(self.pragmas['busy_timeout'] / 1000)
+        self.holds_write = True
+
+    def release_write(self):
+        if self.holds_write:
+            self.holds_write = False
+            self.queue.release()
+
+    def _start_transaction_under_autocommit(self):
+        self.acquire_write()
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except Exception:
+            self.release_write()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.release_write()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.release_write()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self.release_write()
@@ -0,0 +1,301 @@
+"""Метрики запросов и страница /metrics/ в текстовом формате Prometheus.
+
+MetricsMiddleware замеряет каждый запрос и складывает результат в
+гистограммы и счётчики с меткой `view` — имя маршрута (`index`, `post`,
+`api:posts`, ...):
+
+* время ответа, число SQL-запросов и размер ответа — гистограммы;
+* время SQL, время отрисовки шаблонов, попадания и промахи кэша —
+  счётчики.
+
+SQL считает обёртка `execute_wrappers` соединений, шаблоны — бэкенд
+yatube.template_backends.DjangoTemplates, кэш — бэкенды
+yatube/cache_backends.py. Все они пишут в замер текущего запроса из
+контекстной переменной, поэтому учитывается и работа в пуле потоков
+асинхронных представлений. Метрики свои у каждого процесса.
+
+Запросы дольше METRICS_SLOW_REQUEST секунд попадают в журнал
+yatube.metrics вместе со списком SQL. Страница /metrics/ открыта запросам
+с заголовком `Authorization: Bearer <METRICS_TOKEN>` и адресам из
+METRICS_ALLOWED_IPS. За обратным прокси REMOTE_ADDR — адрес самого
+прокси, поэтому вне DEBUG список адресов пуст и нужен токен.
+"""
+import hmac
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.deprecation import MiddlewareMixin
+
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 10240, 51200, 102400, 512000, 1048576)
+
+# Замер текущего запроса; None вне запросов
+_current = ContextVar('request_metrics', default=None)
+
+
+class Registry:
+    """Гистограммы и счётчики процесса с выводом в формате Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._buckets = {}
+        # имя -> метки -> [по корзинам..., сумма, число]
+        self._histograms = defaultdict(dict)
+        # имя -> метки -> значение; счётчик остаётся int, пока к нему
+        # прибавляют целые, и не теряет разрядов при выводе
+        self._counters = defaultdict(lambda: defaultdict(int))
+
+    def histogram(self, name, help_text, buckets):
+        self._help[name] = help_text
+        self._buckets[name] = buckets
+
+    def counter(self, name, help_text):
+        self._help[name] = help_text
+        self._counters[name]
+
+    def observe(self, name, labels, value):
+        buckets = self._buckets[name]
+        labels = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms[name].setdefault(
+                labels, [0] * (len(buckets) + 2))
+            for number, bound in enumerate(buckets):
+                if value <= bound:
+                    series[number] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def inc(self, name, labels, value=1):
+        labels = tuple(sorted(labels.items()))
+        with self._lock:
+            self._counters[name][labels] += value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            for series in self._counters.values():
+                series.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, by_labels in self._histograms.items():
+                lines += self._header(name, 'histogram')
+                for labels, series in sorted(by_labels.items()):
+                    total = 0
+                    for bound, count in zip(self._buckets[name], series):
+                        total += count
+                        lines.append(_sample(
+                            f'{name}_bucket', labels + (('le', bound),),
+                            total))
+                    lines.append(_sample(
+                        f'{name}_bucket', labels + (('le', '+Inf'),),
+                        series[-1]))
+                    lines.append(_sample(f'{name}_sum', labels, series[-2]))
+                    lines.append(
+                        _sample(f'{name}_count', labels, series[-1]))
+            for name, by_labels in self._counters.items():
+                lines += self._header(name, 'counter')
+                for labels, value in sorted(by_labels.items()):
+                    lines.append(_sample(name, labels, value))
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, name, kind):
+        return [f'# HELP {name} {self._help[name]}', f'# TYPE {name} {kind}']
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _sample(name, labels, value):
+    if labels:
+        pairs = ','.join(f'{key}="{_escape(item)}"' for key, item in labels)
+        name = f'{name}{{{pairs}}}'
+    # repr — кратчайшая запись, из которой float читается без потерь
+    return f'{name} {value!r}'
+
+
+registry = Registry()
+registry.histogram(
+    'yatube_request_duration_seconds', 'Время ответа, секунды.',
+    DURATION_BUCKETS)
+registry.histogram(
+    'yatube_request_queries', 'SQL-запросов на ответ.', QUERY_BUCKETS)
+registry.histogram(
+    'yatube_response_size_bytes', 'Размер тела ответа, байты.',
+    SIZE_BUCKETS)
+registry.counter(
+    'yatube_requests_total', 'Ответы по представлениям и кодам.')
+registry.counter(
+    'yatube_request_query_seconds_total', 'Время SQL-запросов, секунды.')
+registry.counter(
+    'yatube_template_render_seconds_total',
+    'Время отрисовки шаблонов, секунды.')
+registry.counter(
+    'yatube_request_cache_total',
+    'Обращения к кэшу из запросов: hit*, miss.')
+
+
+class RequestMetrics:
+    """Замер одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = 'unresolved'
+        self.queries = 0
+        self.query_time = 0.0
+        self.query_log = []
+        self.template_time = 0.0
+        self.cache = defaultdict(int)
+        # Асинхронное представление пишет сюда из нескольких потоков
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, duration):
+        with self._lock:
+            self.queries += 1
+            self.query_time += duration
+            if len(self.query_log) < settings.METRICS_SLOW_QUERY_LOG:
+                self.query_log.append((sql, duration))
+
+    def add_template(self, duration):
+        with self._lock:
+            self.template_time += duration
+
+    def add_cache(self, outcome):
+        with self._lock:
+            self.cache[outcome] += 1
+
+
+def current():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка `execute_wrappers`: время SQL в замер текущего запроса."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+def instrument(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Соединения потоков пула создаются уже после загрузки middleware
+connection_created.connect(instrument)
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Замеряет запрос; ставится первым в MIDDLEWARE."""
+
+    def process_request(self, request):
+        # Соединения этого потока могли открыться до загрузки middleware
+        for connection in connections.all():
+            instrument(connection)
+        request._metrics = RequestMetrics()
+        _current.set(request._metrics)
+
+    def process_response(self, request, response):
+        metrics = getattr(request, '_metrics', None)
+        _current.set(None)
+        if metrics is None:
+            return response
+        duration = time.perf_counter() - metrics.started
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            metrics.view = match.view_name
+        view = {'view': metrics.view}
+
+        registry.observe('yatube_request_duration_seconds', view, duration)
+        registry.observe('yatube_request_queries', view, metrics.queries)
+        if not response.streaming:
+            registry.observe(
+                'yatube_response_size_bytes', view, len(response.content))
+        registry.inc('yatube_requests_total', {
+            **view, 'method': request.method,
+            'status': str(response.status_code)})
+        registry.inc(
+            'yatube_request_query_seconds_total', view, metrics.query_time)
+        registry.inc(
+            'yatube_template_render_seconds_total', view,
+            metrics.template_time)
+        for outcome, count in metrics.cache.items():
+            registry.inc(
+                'yatube_request_cache_total', {**view, 'outcome': outcome},
+                count)
+
+        if duration >= settings.METRICS_SLOW_REQUEST:
+            log_slow(request, metrics, duration)
+        return response
+
+
+def log_slow(request, metrics, duration):
+    queries = '\n'.join(
+        f'  {seconds * 1000:8.2f} мс  {sql}'
+        for sql, seconds in metrics.query_log)
+    skipped = metrics.queries - len(metrics.query_log)
+    if skipped:
+        queries += f'\n  … ещё запросов: {skipped}'
+    logger.warning(
+        'Медленный запрос %s %s (%s): %.0f мс, SQL %d за %.0f мс, '
+        'шаблоны %.0f мс\n%s',
+        request.method, request.get_full_path(), metrics.view,
+        duration * 1000, metrics.queries, metrics.query_time * 1000,
+        metrics.template_time * 1000, queries)
+
+
+def allowed(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        # Строки compare_digest принимает только из ASCII
+        if hmac.compare_digest(
+                header.encode(), f'Bearer {token}'.encode()):
+            return True
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def cache_metrics():
+    """Счётчики кэша процесса по пространствам имён ключей."""
+    from .cache_backends import stats
+
+    lines = [
+        '# HELP yatube_cache_requests_total Обращения к кэшу: hit*, miss.',
+        '# TYPE yatube_cache_requests_total counter',
+    ]
+    for (alias, namespace, outcome), count in sorted(
+            stats.snapshot().items()):
+        lines.append(_sample('yatube_cache_requests_total', (
+            ('alias', alias), ('namespace', namespace),
+            ('outcome', outcome)), count))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    if not allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render() + cache_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,181 @@
+"""Чтение с реплик базы данных.
+
+Страницы из REPLICA_VIEWS (ленты, профиль, запись) читают с одной из
+реплик REPLICA_DATABASES, всё остальное — с основной базы. Реплика
+подходит, если отстаёт не больше чем на REPLICA_MAX_LAG секунд и уже
+содержит изменения, которые должен увидеть запрос:
+
+* записи этого же браузера — после запроса, который что-то записал,
+  cookie с его временем держит браузер на основной базе, пока реплики
+  не догонят (read-your-writes);
+* изменения областей кэша лент, от которых зависит страница
+  (posts/feed_cache.py), — иначе в кэш нового поколения или в ETag
+  попала бы страница, собранная из старых данных.
+
+Время, на которое реплика совпадает с основной базой, лежит в ней самой,
+в таблице replication_heartbeat: репликатор пишет его в основную базу
+перед копированием. Команда replicate — такой репликатор для файлов
+SQLite, замена настоящей репликации при локальной проверке.
+"""
+import math
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.deprecation import MiddlewareMixin
+
+
+HEARTBEAT_TABLE = 'replication_heartbeat'
+WRITE_COOKIE = 'yatube_last_write'
+
+# Выбор реплики для текущего запроса; None вне запросов
+_reads = ContextVar('replica_reads', default=None)
+
+# Псевдоним реплики -> (когда проверяли, время синхронизации)
+_heartbeats = {}
+
+
+class _Reads:
+    def __init__(self):
+        self.alias = None
+        self.synced_at = None
+        self.wrote = False
+
+
+def heartbeat(alias):
+    """Время, по состоянию на которое реплика `alias` совпадает с основной.
+
+    Результат запоминается на REPLICA_CHECK_INTERVAL секунд: запомненное
+    время может быть только раньше настоящего.
+    """
+    now = time.monotonic()
+    checked = _heartbeats.get(alias)
+    if checked and now - checked[0] < settings.REPLICA_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'SELECT synced_at FROM {HEARTBEAT_TABLE}')
+            row = cursor.fetchone()
+    except DatabaseError:
+        # Реплику ещё ни разу не синхронизировали
+        row = None
+    synced_at = row[0] if row else None
+    _heartbeats[alias] = (now, synced_at)
+    return synced_at
+
+
+def choose(required=0):
+    """Случайная подходящая реплика и время её синхронизации.
+
+    Реплика подходит, если синхронизирована не раньше `required` и не
+    раньше чем REPLICA_MAX_LAG секунд назад. (None, None) — читать с
+    основной базы.
+    """
+    oldest = time.time() - settings.REPLICA_MAX_LAG
+    fresh = []
+    for alias in settings.REPLICA_DATABASES:
+        synced_at = heartbeat(alias)
+        if synced_at is not None and synced_at >= max(required, oldest):
+            fresh.append((alias, synced_at))
+    return random.choice(fresh) if fresh else (None, None)
+
+
+def require(timestamp):
+    """Текущий запрос должен видеть изменения, сделанные до `timestamp`.
+
+    Возвращает True, если для этого запрос переключился на основную базу.
+    """
+    reads = _reads.get()
+    if reads is not None and reads.alias and reads.synced_at < timestamp:
+        reads.alias = None
+        return True
+    return False
+
+
+def sync(source, replicas):
+    """Скопировать основную базу `source` в файлы реплик `replicas`.
+
+    `source` — соединение sqlite3. Перед копированием в основную базу
+    пишется время, которое вместе с данными попадёт в реплики. Копия
+    пишется в файл реплики под блокировкой, так что её читатели видят
+    либо прежнюю, либо новую базу целиком.
+    """
+    synced_at = time.time()
+    with source:
+        source.execute(
+            f'CREATE TABLE IF NOT EXISTS {HEARTBEAT_TABLE} '
+            '(id INTEGER PRIMARY KEY, synced_at REAL NOT NULL)')
+        source.execute(
+            f'INSERT OR REPLACE INTO {HEARTBEAT_TABLE} VALUES (1, ?)',
+            [synced_at])
+    for path in replicas:
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    return synced_at
+
+
+class ReplicaRouter:
+    """Чтение — с реплики, выбранной ReplicaMiddleware, запись — в основную.
+
+    Запись в базу переключает остаток запроса на основную базу и
+    включает read-your-writes для следующих запросов браузера.
+    """
+
+    def db_for_read(self, model, **hints):
+        reads = _reads.get()
+        return reads and reads.alias
+
+    def db_for_write(self, model, **hints):
+        reads = _reads.get()
+        if reads is not None:
+            reads.alias = None
+            reads.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схему реплики получают вместе с данными
+        return False if db in settings.REPLICA_DATABASES else None
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        if settings.REPLICA_DATABASES:
+            _reads.set(_Reads())
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        reads = _reads.get()
+        if (reads is None or request.method not in ('GET', 'HEAD')
+                or request.resolver_match.view_name
+                not in settings.REPLICA_VIEWS):
+            return None
+        reads.alias, reads.synced_at = choose(self.last_write(request))
+        return None
+
+    def process_response(self, request, response):
+        reads = _reads.get()
+        _reads.set(None)
+        if reads is not None and reads.wrote:
+            response.set_cookie(
+                WRITE_COOKIE, repr(time.time()),
+                max_age=math.ceil(settings.REPLICA_MAX_LAG),
+                httponly=True, samesite='Lax')
+        return response
+
+    @staticmethod
+    def last_write(request):
+        try:
+            return float(request.COOKIES.get(WRITE_COOKIE, 0))
+        except ValueError:
+            return 0
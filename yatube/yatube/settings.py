@@ -39,6 +39,8 @@ INSTALLED_APPS = [
     'about',
     'users',
     'posts',
+    'api',
+    'jobs',
     'sorl.thumbnail',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -49,7 +51,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.template_profiler.TemplateProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'yatube.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,7 +69,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.template_backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -80,17 +85,50 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# yatube/asgi.py: сколько потоков выполняют обычные запросы под ASGI,
+# включены ли асинхронные страницы (posts/async_views.py) и сколько
+# потоков у них для работы с базой
+ASGI_THREADS = 8
+ASGI_ASYNC_VIEWS = True
+ASYNC_DB_THREADS = 8
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# yatube.db_backend — SQLite в режиме WAL с очередью писателей; соединения
+# живут между запросами CONN_MAX_AGE секунд
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.db_backend',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Реплики для чтения (yatube/replicas.py): YATUBE_REPLICAS=2 добавляет
+# базы replica1 и replica2 — копии db.sqlite3, которые поддерживает
+# команда replicate. Страницы REPLICA_VIEWS читают с реплики, отстающей
+# не больше REPLICA_MAX_LAG секунд; отставание перепроверяется раз в
+# REPLICA_CHECK_INTERVAL секунд.
+REPLICA_DATABASES = [
+    f'replica{number}'
+    for number in range(1, int(os.environ.get('YATUBE_REPLICAS', 0)) + 1)
+]
+for alias in REPLICA_DATABASES:
+    DATABASES[alias] = {
+        'ENGINE': 'yatube.db_backend',
+        'NAME': os.path.join(BASE_DIR, f'db-{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+
+REPLICA_VIEWS = ['index', 'follow_index', 'group_posts', 'profile', 'post']
+REPLICA_MAX_LAG = 5
+REPLICA_CHECK_INTERVAL = 0.5
+REPLICA_SYNC_INTERVAL = 1
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -142,9 +180,166 @@ LOGIN_REDIRECT_URL = "index"
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# Письма-дайджесты подписчикам (posts/notifications.py): новые записи
+# копятся и уходят не чаще раза в NOTIFY_DIGEST_INTERVAL секунд, в письме
+# до NOTIFY_DIGEST_POSTS записей; подписчики читаются пачками
+SITE_URL = os.environ.get('YATUBE_SITE_URL', 'http://localhost:8000')
+NOTIFY_DIGEST_INTERVAL = 15 * 60
+NOTIFY_DIGEST_POSTS = 10
+NOTIFY_BATCH_SIZE = 1000
+
+
+# Пагинация лент: `offset` — номера страниц (?page=N),
+# `keyset` — курсоры по (pub_date, id) (?after=/?before=)
+POSTS_PER_PAGE = 10
+POSTS_PAGINATION_MODES = {
+    'index': 'offset',
+    'group_posts': 'offset',
+    'profile': 'offset',
+    'follow_index': 'offset',
+}
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+# Лента подписок: записи авторов, у которых подписчиков меньше
+# TIMELINE_FANOUT_LIMIT, раскладываются по лентам при публикации,
+# остальные подмешиваются при чтении. При подписке в ленту попадают
+# последние TIMELINE_BACKFILL_SIZE записей автора, более старые лента
+# читает запросом по подпискам. Автора, переставшего быть популярным,
+# раскладывают по лентам пачками примерно по TIMELINE_REFILL_ROWS строк
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_BACKFILL_SIZE = 200
+TIMELINE_REFILL_ROWS = 20000
+TIMELINE_BATCH_SIZE = 1000
+
+# Кэш лент: страницы живут до FEED_CACHE_TIMEOUT, но устаревают сразу
+# при изменении записей; пересборку под нагрузкой делает один запрос.
+# С кэшем в памяти процесса правки из других воркеров не видны, и срок
+# жизни страницы сокращается до FEED_CACHE_LOCAL_TIMEOUT
+FEED_CACHE_TIMEOUT = 300
+FEED_CACHE_LOCAL_TIMEOUT = 5
+FEED_CACHE_LOCK_TIMEOUT = 10
+FEED_CACHE_LOCK_WAIT = 2
+FEED_CACHE_BETA = 1.0
+
+
+# Варианты картинок записей (posts/thumbnails.py) собираются в пуле из
+# THUMBNAIL_QUEUE_WORKERS потоков после коммита; THUMBNAIL_QUEUE_EAGER —
+# собирать сразу в том же потоке
+THUMBNAIL_QUEUE_WORKERS = 2
+THUMBNAIL_QUEUE_EAGER = False
+
+# Отложенные задачи (jobs/queue.py): YATUBE_TASKS=queue — счётчики, ленты
+# подписок, поисковый индекс и картинки новых записей обновляют процессы
+# manage.py run_workers, а запрос только ставит задачи. Это режим по
+# умолчанию вне DEBUG. С YATUBE_TASKS=eager (по умолчанию при DEBUG и в
+# тестах) задачи выполняются сразу в запросе, кроме рассылки писем
+# подписчикам, раскладки записи больше чем в TIMELINE_BATCH_SIZE лент и
+# повторного заполнения лент: их выполняют run_workers, а письма ещё и
+# manage.py send_digests
+TASKS_EAGER = os.environ.get(
+    'YATUBE_TASKS', 'eager' if DEBUG else 'queue') != 'queue'
+TASKS_WORKERS = 2
+TASKS_BATCH_SIZE = 20
+TASKS_POLL_INTERVAL = 0.2
+TASKS_LEASE = 300
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_DELAY = 5
+TASKS_MAX_RETRY_DELAY = 600
+TASKS_KEEP_DONE = 24 * 60 * 60
+TASKS_PRUNE_INTERVAL = 600
+
+# Варианты картинок записей: кадр карточки POST_IMAGE_CARD_SIZE в нескольких
+# ширинах и форматах; AVIF пропускается, если его не умеет Pillow
+POST_IMAGE_CARD_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_SIZES = '(max-width: 1000px) 100vw, 960px'
+
+# Ограничения загрузки картинок записей (posts/uploads.py): размер файла,
+# число пикселей до декодирования и большая сторона сохраняемого оригинала
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 25_000_000
+POST_IMAGE_MAX_SIDE = 2560
+
+
+# Полнотекстовый поиск (posts/search.py): сколько слов запроса учитывать
+# и длина фрагмента с подсветкой в словах
+SEARCH_MAX_WORDS = 8
+SEARCH_SNIPPET_TOKENS = 24
+
+
+# JSON API (api/): записей на странице по умолчанию и наибольшее
+# значение параметра ?limit=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+
+# Поток событий о новых записях (posts/events.py): брокер, очередь
+# клиента, период пустых сообщений, пауза переподключения браузера (мс)
+# и сколько каналов слушает одно соединение
+EVENTS_BROKER = 'posts.events.LocalBroker'
+EVENTS_QUEUE_SIZE = 100
+EVENTS_KEEPALIVE = 15
+EVENTS_RETRY_MS = 10000
+EVENTS_MAX_CHANNELS = 50
+
+
+# Метрики запросов (yatube/metrics.py): страница /metrics/ и профиль
+# шаблонов открыты запросам с `Authorization: Bearer <YATUBE_METRICS_TOKEN>`
+# и этим адресам. За обратным прокси все запросы приходят с его адреса,
+# поэтому без токена метрики доступны только при DEBUG. Запросы дольше
+# METRICS_SLOW_REQUEST секунд пишутся в журнал вместе с первыми
+# METRICS_SLOW_QUERY_LOG SQL-запросами
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1'] if DEBUG else []
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+METRICS_SLOW_REQUEST = 1.0
+METRICS_SLOW_QUERY_LOG = 50
+
+# Профилировщик шаблонов (yatube/template_profiler.py): при включённом
+# профилировании страницы с ?profile_templates получают таблицу времени
+# по шаблонам и узлам, а стеки пишутся в TEMPLATE_PROFILE_DIR
+TEMPLATE_PROFILING = os.environ.get('YATUBE_TEMPLATE_PROFILING') == '1'
+TEMPLATE_PROFILE_DIR = os.path.join(BASE_DIR, 'template_profiles')
+
+
+# Кэш: YATUBE_CACHE=locmem — свой кэш в каждом процессе (по умолчанию),
+# shared — общий кэш для всех воркеров, tiered — локальный L1 на
+# несколько секунд перед общим L2. Общий кэш по умолчанию файловый,
+# бэкенд и адрес задаются YATUBE_SHARED_CACHE_BACKEND/_LOCATION.
+# Блокировки и поколения лент (posts/feed_cache.py) требуют атомарных
+# между процессами add и incr: они есть у memcached, redis и файлового
+# бэкенда проекта, но не у django.core.cache.backends.filebased.
+CACHE_MODE = os.environ.get('YATUBE_CACHE', 'locmem')
+
+SHARED_CACHE = {
+    'BACKEND': os.environ.get(
+        'YATUBE_SHARED_CACHE_BACKEND', 'yatube.cache_backends.FileBasedCache'),
+    'LOCATION': os.environ.get(
+        'YATUBE_SHARED_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
 }
+
+if CACHE_MODE == 'tiered':
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache_backends.TieredCache',
+            'OPTIONS': {
+                'LOCAL': 'local',
+                'SHARED': 'shared',
+                'LOCAL_TIMEOUT': 5,
+                'SHARED_ONLY': ['feed-gen'],
+            },
+        },
+        'local': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'shared': dict(SHARED_CACHE, OPTIONS={'ALIAS': 'shared'}),
+    }
+elif CACHE_MODE == 'shared':
+    CACHES = {
+        'default': SHARED_CACHE,
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache_backends.LocMemCache',
+        }
+    }
@@ -0,0 +1,34 @@
+import time
+
+from django.template.backends.django import (
+    DjangoTemplates as DjangoTemplatesBase)
+
+from . import metrics
+
+
+class Template:
+    """Шаблон, время отрисовки которого идёт в замер запроса."""
+
+    def __init__(self, template):
+        self.template = template
+        self.origin = template.origin
+
+    def render(self, context=None, request=None):
+        current = metrics.current()
+        if current is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            current.add_template(time.perf_counter() - started)
+
+
+class DjangoTemplates(DjangoTemplatesBase):
+    """Бэкенд Django-шаблонов с замером времени для yatube/metrics.py."""
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name))
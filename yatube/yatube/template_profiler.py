@@ -0,0 +1,208 @@
+"""Профилировщик отрисовки шаблонов.
+
+Включается настройкой TEMPLATE_PROFILING (YATUBE_TEMPLATE_PROFILING=1),
+профилирует запросы с параметром `?profile_templates` от клиентов,
+которым открыта страница /metrics/ (yatube/metrics.py). Для такого
+запроса замеряются кадры:
+
+* `template:` и `include:` — шаблон страницы и вложенные шаблоны
+  (`{% include %}`, шаблоны inclusion-тегов);
+* `block:`, `cache:`, `url:`, `tag:` — блоки, кэш фрагментов, теги
+  `{% url %}` и теги приложений (`post_picture` собирает картинку);
+* `filter:` — вывод переменной через фильтры.
+
+По каждому кадру считаются вызовы, полное и собственное время и
+SQL-запросы (по счётчику замера yatube/metrics.py). Таблица добавляется
+в конец HTML-страницы, а стеки кадров с собственным временем в
+микросекундах пишутся в TEMPLATE_PROFILE_DIR в формате folded
+(flamegraph.pl, speedscope).
+"""
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template import base as template_base
+from django.template.defaulttags import URLNode
+from django.template.library import InclusionNode, SimpleNode
+from django.template.loader import render_to_string
+from django.template.loader_tags import BlockNode
+from django.templatetags.cache import CacheNode
+from django.utils.deprecation import MiddlewareMixin
+
+from . import metrics
+
+
+PARAMETER = 'profile_templates'
+
+# Профиль текущего запроса; None, если запрос не профилируется
+_profile = ContextVar('template_profile', default=None)
+
+_original = {}
+
+
+class Profile:
+    """Кадры отрисовки одного запроса."""
+
+    def __init__(self):
+        self.stack = []
+        # путь кадров -> [вызовов, полное время, собственное, SQL]
+        self.frames = {}
+
+    @contextmanager
+    def frame(self, name):
+        parent = self.stack[-1] if self.stack else None
+        path = (*parent[0], name) if parent else (name,)
+        current = [path, 0.0]
+        self.stack.append(current)
+        queries = _queries()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stack.pop()
+            entry = self.frames.setdefault(path, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += elapsed - current[1]
+            entry[3] += _queries() - queries
+            if parent:
+                parent[1] += elapsed
+
+    def nodes(self):
+        """Итоги по кадрам, самые долгие первыми.
+
+        Полное время и SQL кадра внутри такого же кадра (рекурсия) уже
+        учтены во внешнем.
+        """
+        totals = {}
+        for path, (calls, total, own, queries) in self.frames.items():
+            name = path[-1]
+            item = totals.setdefault(name, {
+                'name': name, 'calls': 0, 'total': 0.0, 'own': 0.0,
+                'queries': 0})
+            item['calls'] += calls
+            item['own'] += own
+            if name not in path[:-1]:
+                item['total'] += total
+                item['queries'] += queries
+        return sorted(
+            totals.values(), key=lambda item: item['total'], reverse=True)
+
+    def folded(self):
+        return ''.join(
+            f'{";".join(path)} {round(own * 1e6)}\n'
+            for path, (_, _, own, _) in self.frames.items())
+
+
+def _queries():
+    current = metrics.current()
+    return current.queries if current is not None else 0
+
+
+def _token(expression):
+    return expression.token.strip('\'"')
+
+
+def frame_name(node):
+    """Имя кадра узла шаблона или None, если узел не замеряется."""
+    if isinstance(node, template_base.VariableNode):
+        filters = node.filter_expression.filters
+        if filters:
+            return 'filter:' + '|'.join(
+                function.__name__ for function, _ in filters)
+        return None
+    if isinstance(node, BlockNode):
+        return f'block:{node.name}'
+    if isinstance(node, CacheNode):
+        return f'cache:{node.fragment_name}'
+    if isinstance(node, URLNode):
+        return f'url:{_token(node.view_name)}'
+    if isinstance(node, (InclusionNode, SimpleNode)):
+        return f'tag:{node.func.__name__}'
+    return None
+
+
+def _render_annotated(self, context):
+    profile = _profile.get()
+    name = profile and frame_name(self)
+    if not name:
+        return _original['render_annotated'](self, context)
+    with profile.frame(name):
+        return _original['render_annotated'](self, context)
+
+
+def _render_template(self, context):
+    profile = _profile.get()
+    if profile is None:
+        return _original['render'](self, context)
+    kind = 'template' if context.template is None else 'include'
+    with profile.frame(f'{kind}:{self.origin.template_name or self.name}'):
+        return _original['render'](self, context)
+
+
+def install():
+    """Подменить отрисовку узлов и шаблонов Django (один раз)."""
+    if _original:
+        return
+    _original['render_annotated'] = template_base.Node.render_annotated
+    _original['render'] = template_base.Template.render
+    template_base.Node.render_annotated = _render_annotated
+    template_base.Template.render = _render_template
+
+
+class TemplateProfilerMiddleware(MiddlewareMixin):
+    """Профилирует запросы с `?profile_templates` (при TEMPLATE_PROFILING)."""
+
+    def __init__(self, get_response=None):
+        if not settings.TEMPLATE_PROFILING:
+            raise MiddlewareNotUsed
+        install()
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        if PARAMETER in request.GET and metrics.allowed(request):
+            request._template_profile = Profile()
+            _profile.set(request._template_profile)
+
+    def process_response(self, request, response):
+        profile = getattr(request, '_template_profile', None)
+        _profile.set(None)
+        if profile is None or not profile.frames:
+            return response
+        path = dump(request, profile)
+        if (response.status_code == 200 and not response.streaming
+                and response.get('Content-Type', '').startswith(
+                    'text/html')):
+            nodes = [
+                {**node, 'total': node['total'] * 1000,
+                 'own': node['own'] * 1000}
+                for node in profile.nodes()
+            ]
+            panel = render_to_string(
+                'template_profile.html', {'nodes': nodes, 'path': path})
+            content = response.content.decode(response.charset)
+            position = content.rfind('</body>')
+            if position == -1:
+                position = len(content)
+            response.content = (
+                content[:position] + panel + content[position:])
+            if response.has_header('Content-Length'):
+                response['Content-Length'] = len(response.content)
+        return response
+
+
+def dump(request, profile):
+    """Записать стеки профиля в файл folded и вернуть его путь."""
+    os.makedirs(settings.TEMPLATE_PROFILE_DIR, exist_ok=True)
+    match = getattr(request, 'resolver_match', None)
+    view = re.sub(r'\W', '_', match.view_name if match else 'unresolved')
+    name = f'{time.strftime("%Y%m%d-%H%M%S")}-{view}-{id(profile):x}.folded'
+    path = os.path.join(settings.TEMPLATE_PROFILE_DIR, name)
+    with open(path, 'w') as stream:
+        stream.write(profile.folded())
+    return path
@@ -0,0 +1,93 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from ..asgi import application
+from ..asgi_bridge import WsgiToAsgi
+
+
+def echo(environ, start_response):
+    body = environ['wsgi.input'].read()
+    start_response('201 Created', [('Content-Type', 'text/plain')])
+    return [
+        f"{environ['REQUEST_METHOD']} {environ['PATH_INFO']}?"
+        f"{environ['QUERY_STRING']} {environ['CONTENT_TYPE']} "
+        f"{environ['HTTP_X_TEST']} ".encode('latin1'),
+        body,
+    ]
+
+
+def call(app, scope, body_parts=(b'',)):
+    async def scenario():
+        incoming = [
+            {'type': 'http.request', 'body': part,
+             'more_body': number < len(body_parts) - 1}
+            for number, part in enumerate(body_parts)
+        ]
+        messages = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            messages.append(message)
+
+        await app(scope, receive, send)
+        return messages
+    return asyncio.run(scenario())
+
+
+def http_scope(path, method='GET', query=b'', headers=()):
+    return {
+        'type': 'http', 'method': method, 'path': path,
+        'query_string': query, 'headers': list(headers),
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+    }
+
+
+class WsgiToAsgiTests(SimpleTestCase):
+    def test_request_and_response(self):
+        bridge = WsgiToAsgi(echo, max_workers=1)
+        scope = http_scope(
+            '/путь/', method='POST', query=b'a=1',
+            headers=[(b'content-type', b'text/plain'), (b'x-test', b'yes')])
+        messages = call(bridge, scope, [b'part1-', b'part2'])
+        self.assertEqual(messages[0]['status'], 201)
+        self.assertEqual(
+            messages[0]['headers'], [(b'content-type', b'text/plain')])
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        # Путь доходит до WSGI байтами UTF-8, прочитанными как latin-1
+        self.assertEqual(
+            body.decode(), 'POST /путь/?a=1 text/plain yes part1-part2')
+        self.assertFalse(messages[-1].get('more_body'))
+
+    def test_lifespan(self):
+        async def scenario():
+            incoming = [{'type': 'lifespan.startup'},
+                        {'type': 'lifespan.shutdown'}]
+            sent = []
+
+            async def receive():
+                return incoming.pop(0)
+
+            async def send(message):
+                sent.append(message['type'])
+
+            await WsgiToAsgi(echo, max_workers=1)(
+                {'type': 'lifespan'}, receive, send)
+            return sent
+        self.assertEqual(
+            asyncio.run(scenario()),
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+
+class AsgiApplicationTests(SimpleTestCase):
+    def test_pages_go_through_django(self):
+        messages = call(application, http_scope('/about/author/'))
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn(b'<html>', b''.join(
+            message.get('body', b'') for message in messages[1:]))
+
+    def test_events_are_served_natively(self):
+        messages = call(application, http_scope('/events/'))
+        self.assertEqual(messages[0]['status'], 204)
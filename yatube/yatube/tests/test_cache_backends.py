@@ -0,0 +1,128 @@
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from ..cache_backends import namespace_of, stats
+
+
+SHARED_DIR = tempfile.mkdtemp()
+
+
+def tiered(local):
+    return {
+        'BACKEND': 'yatube.cache_backends.TieredCache',
+        'OPTIONS': {
+            'ALIAS': local,
+            'LOCAL': local + '-l1',
+            'SHARED': 'shared',
+            'LOCAL_TIMEOUT': 60,
+            'SHARED_ONLY': ['feed-gen'],
+        },
+    }
+
+
+# Два «воркера» со своими L1 и общим файловым L2
+CACHES = {
+    'default': {'BACKEND': 'yatube.cache_backends.LocMemCache'},
+    'worker-a': tiered('worker-a'),
+    'worker-b': tiered('worker-b'),
+    'worker-a-l1': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'worker-a',
+    },
+    'worker-b-l1': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'worker-b',
+    },
+    'shared': {
+        'BACKEND': 'yatube.cache_backends.FileBasedCache',
+        'LOCATION': SHARED_DIR,
+        'OPTIONS': {'ALIAS': 'shared'},
+    },
+}
+
+
+@override_settings(CACHES=CACHES)
+class TieredCacheTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(SHARED_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.worker_a = caches['worker-a']
+        self.worker_b = caches['worker-b']
+        self.worker_a.clear()
+        self.worker_b.clear()
+        stats.reset()
+
+    def test_namespace_of(self):
+        keys = {
+            'feed-page:index:1:anon:abc': 'feed-page',
+            'template.cache.post_card.abc': 'template',
+            'sorl-thumbnail||image||abc': 'sorl-thumbnail',
+        }
+        for key, namespace in keys.items():
+            with self.subTest(key=key):
+                self.assertEqual(namespace_of(key), namespace)
+
+    def test_value_shared_between_workers(self):
+        self.worker_a.set('feed-page:x', 'page')
+        self.assertEqual(self.worker_b.get('feed-page:x'), 'page')
+        self.assertEqual(self.worker_b.get('feed-page:x'), 'page')
+        self.assertIsNone(self.worker_b.get('feed-page:missing'))
+
+        snapshot = stats.snapshot()
+        self.assertEqual(
+            snapshot[('worker-b', 'feed-page', 'hit_shared')], 1)
+        self.assertEqual(snapshot[('worker-b', 'feed-page', 'hit_local')], 1)
+        self.assertEqual(snapshot[('worker-b', 'feed-page', 'miss')], 1)
+
+    def test_local_tier_serves_recent_reads(self):
+        self.worker_a.set('feed-page:x', 'old')
+        self.worker_b.get('feed-page:x')
+        caches['shared'].set('feed-page:x', 'new')
+        self.assertEqual(self.worker_b.get('feed-page:x'), 'old')
+
+    # Счётчики поколений не должны застревать в L1 другого воркера
+    def test_shared_only_namespace_skips_local_tier(self):
+        self.worker_a.set('feed-gen:index', 1, None)
+        self.assertEqual(self.worker_b.get('feed-gen:index'), 1)
+        self.worker_a.incr('feed-gen:index')
+        self.assertEqual(self.worker_b.get('feed-gen:index'), 2)
+
+    def test_delete_and_add(self):
+        self.assertTrue(self.worker_a.add('feed-page:lock', 1))
+        self.assertFalse(self.worker_b.add('feed-page:lock', 1))
+        self.worker_b.delete('feed-page:lock')
+        self.assertFalse(self.worker_b.has_key('feed-page:lock'))
+
+    def test_add_is_atomic(self):
+        # Каждый поток открывает файл блокировки заново, как отдельный
+        # процесс: успешный add ровно один
+        shared = caches['shared']
+        with ThreadPoolExecutor(8) as pool:
+            added = list(pool.map(
+                lambda x: shared.add('feed-page:race', x), range(32)))
+        self.assertEqual(added.count(True), 1)
+
+    def test_incr_is_atomic(self):
+        shared = caches['shared']
+        shared.set('feed-gen:race', 0, None)
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(
+                lambda x: shared.incr('feed-gen:race'), range(200)))
+        self.assertEqual(shared.get('feed-gen:race'), 200)
+
+    def test_incr_keeps_expiry(self):
+        shared = caches['shared']
+        shared.set('feed-gen:forever', 1, None)
+        shared.incr('feed-gen:forever')
+        with open(shared._key_to_file('feed-gen:forever'), 'rb') as f:
+            self.assertIsNone(pickle.load(f))
+        with self.assertRaises(ValueError):
+            shared.incr('feed-gen:missing')
@@ -0,0 +1,124 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import OperationalError, connections, transaction
+from django.test import SimpleTestCase
+
+from ..db_backend.base import WriteQueue
+
+
+class WriteQueueTests(SimpleTestCase):
+    def test_first_in_first_out(self):
+        queue = WriteQueue()
+        queue.acquire(timeout=1)
+        order = []
+
+        def writer(number):
+            queue.acquire(timeout=5)
+            order.append(number)
+            queue.release()
+
+        threads = []
+        for number in range(3):
+            thread = threading.Thread(target=writer, args=[number])
+            thread.start()
+            threads.append(thread)
+            # Следующий писатель встаёт в очередь после предыдущего
+            while queue._next != number + 2:
+                pass
+        queue.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [0, 1, 2])
+
+    def test_timeout_leaves_queue(self):
+        queue = WriteQueue()
+        queue.acquire(timeout=1)
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            queue.acquire(timeout=0.01)
+        queue.release()
+        # Билет ушедшего писателя не задерживает следующего
+        queue.acquire(timeout=0.01)
+
+
+class DatabaseWrapperTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        connections.databases['file'] = {
+            'ENGINE': 'yatube.db_backend',
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+            'OPTIONS': {'pragmas': {'cache_size': -1000}},
+        }
+        self.addCleanup(self.remove_database)
+
+    def remove_database(self):
+        connections['file'].close()
+        del connections.databases['file']
+        if hasattr(connections._connections, 'file'):
+            delattr(connections._connections, 'file')
+
+    def pragma(self, name):
+        with connections['file'].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        # NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -1000)
+
+    def test_concurrent_transactions(self):
+        with connections['file'].cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (value INTEGER)')
+            cursor.execute('INSERT INTO counter VALUES (0)')
+        writers = 8
+        barrier = threading.Barrier(writers)
+        errors = []
+
+        def increment():
+            # Чтение и запись в одной транзакции: с обычным BEGIN её
+            # повышение до пишущей падает при чужой записи
+            barrier.wait()
+            try:
+                with transaction.atomic(using='file'):
+                    with connections['file'].cursor() as cursor:
+                        cursor.execute('SELECT value FROM counter')
+                        value = cursor.fetchone()[0]
+                        time.sleep(0.01)
+                        cursor.execute(
+                            'UPDATE counter SET value = %s', [value + 1])
+            except OperationalError as error:
+                errors.append(error)
+            finally:
+                connections['file'].close()
+
+        threads = [
+            threading.Thread(target=increment) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        with connections['file'].cursor() as cursor:
+            cursor.execute('SELECT value FROM counter')
+            self.assertEqual(cursor.fetchone()[0], writers)
+
+
+class BenchSqliteTests(SimpleTestCase):
+    def test_reports_both_backends(self):
+        out = StringIO()
+        call_command(
+            'bench_sqlite', requests=50, threads=4, posts=10, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            [line.split(':')[0] for line in lines],
+            ['django.db.backends.sqlite3', 'yatube.db_backend'])
+        self.assertIn('ошибок 0', lines[1])
@@ -0,0 +1,123 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..metrics import Registry, registry
+
+
+User = get_user_model()
+
+
+def sample(text, name, **labels):
+    """Значение метрики `name` с метками `labels` или None."""
+    pairs = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = re.escape(f'{name}{{{pairs}}}' if pairs else name)
+    match = re.search(rf'^{pattern} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        Post.objects.create(text='test-post', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def metrics(self, **extra):
+        response = self.client.get(reverse('metrics'), **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_metrics(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        self.client.get('/no-such-user/')
+        text = self.metrics()
+
+        self.assertEqual(sample(
+            text, 'yatube_request_duration_seconds_bucket',
+            view='index', le='+Inf'), 2)
+        self.assertEqual(sample(
+            text, 'yatube_requests_total',
+            method='GET', status='200', view='index'), 2)
+        self.assertEqual(sample(
+            text, 'yatube_requests_total',
+            method='GET', status='404', view='profile'), 1)
+        self.assertGreater(sample(
+            text, 'yatube_request_queries_sum', view='index'), 0)
+        self.assertGreater(sample(
+            text, 'yatube_request_query_seconds_total', view='index'), 0)
+        self.assertGreater(sample(
+            text, 'yatube_template_render_seconds_total', view='index'), 0)
+        self.assertGreater(sample(
+            text, 'yatube_response_size_bytes_sum', view='index'), 1000)
+        # Вторая страница ленты взята из кэша
+        self.assertGreater(sample(
+            text, 'yatube_request_cache_total',
+            outcome='hit', view='index'), 0)
+        self.assertIn('yatube_cache_requests_total{alias="default"', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        self.client.get(reverse('index'))
+        text = self.metrics()
+        buckets = re.findall(
+            r'^yatube_request_queries_bucket\{view="index",le="[^"]+"\} '
+            r'(\d+)$', text, re.MULTILINE)
+        counts = [int(value) for value in buckets]
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(counts[-1], 1)
+
+    def test_values_keep_precision(self):
+        local = Registry()
+        local.counter('requests_total', 'Ответы.')
+        local.counter('seconds_total', 'Секунды.')
+        local.inc('requests_total', {'view': 'index'}, 12345678)
+        local.inc('seconds_total', {'view': 'index'}, 1234.56789)
+        text = local.render()
+        self.assertIn('requests_total{view="index"} 12345678\n', text)
+        self.assertIn('seconds_total{view="index"} 1234.56789\n', text)
+
+    def test_internal_access_only(self):
+        url = reverse('metrics')
+        response = self.client.get(url, REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 403)
+        with self.settings(METRICS_TOKEN='test-token'):
+            response = self.client.get(
+                url, REMOTE_ADDR='203.0.113.5',
+                HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(response.status_code, 403)
+            self.metrics(
+                REMOTE_ADDR='203.0.113.5',
+                HTTP_AUTHORIZATION='Bearer test-token')
+            # Заголовок не из ASCII — отказ, а не ошибка сервера
+            response = self.client.get(
+                url, REMOTE_ADDR='203.0.113.5',
+                HTTP_AUTHORIZATION='Bearer тест')
+            self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_token_required_without_allowed_ips(self):
+        # Так настроен сайт вне DEBUG: адрес прокси ничего не открывает
+        url = reverse('metrics')
+        response = self.client.get(url, REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 403)
+        with self.settings(METRICS_TOKEN='test-token'):
+            self.metrics(HTTP_AUTHORIZATION='Bearer test-token')
+
+    @override_settings(METRICS_SLOW_REQUEST=0, METRICS_SLOW_QUERY_LOG=1)
+    def test_slow_request_log(self):
+        with self.assertLogs('yatube.metrics', 'WARNING') as logs:
+            self.client.get(reverse('index'))
+        message = logs.output[0]
+        self.assertIn('GET / (index)', message)
+        self.assertIn('SELECT', message)
+        self.assertIn('ещё запросов', message)
@@ -0,0 +1,128 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import F
+from django.test import Client, SimpleTestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+from .. import replicas
+from ..asgi import application
+from .test_asgi import call, http_scope
+
+
+User = get_user_model()
+
+
+class ReplicaSyncTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def test_sync(self):
+        source = sqlite3.connect(os.path.join(self.dir, 'primary.sqlite3'))
+        self.addCleanup(source.close)
+        with source:
+            source.execute('CREATE TABLE post (text TEXT)')
+            source.execute("INSERT INTO post VALUES ('first')")
+        path = os.path.join(self.dir, 'replica.sqlite3')
+
+        synced_at = replicas.sync(source, [path])
+        with source:
+            source.execute("INSERT INTO post VALUES ('second')")
+
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute('SELECT text FROM post').fetchall(), [('first',)])
+        self.assertEqual(
+            replica.execute(
+                f'SELECT synced_at FROM {replicas.HEARTBEAT_TABLE}'
+            ).fetchall(),
+            [(synced_at,)])
+
+
+# Реплика — настоящий второй файл SQLite, который заполняет replicas.sync
+@override_settings(
+    REPLICA_DATABASES=['replica'], REPLICA_CHECK_INTERVAL=0,
+    ASYNC_DB_THREADS=2)
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'replica.sqlite3')
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': self.path}
+        self.addCleanup(self.remove_replica)
+
+        self.user = User.objects.create_user(username='test-user')
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(text='test-post', author=self.author)
+        self.replicate()
+        # Правка без сигналов: её не видно только на реплике
+        Post.objects.filter(pk=self.post.pk).update(
+            text='changed', version=F('version') + 1)
+
+    def remove_replica(self):
+        connections['replica'].close()
+        del connections.databases['replica']
+        if hasattr(connections._connections, 'replica'):
+            delattr(connections._connections, 'replica')
+        replicas._heartbeats.clear()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {replicas.HEARTBEAT_TABLE}')
+
+    def replicate(self):
+        connection.ensure_connection()
+        replicas.sync(connection.connection, [self.path])
+
+    def get(self, url, client=None):
+        return (client or Client()).get(url).content.decode()
+
+    def test_pages_read_from_replica(self):
+        url = reverse('post', args=['author', self.post.pk])
+        self.assertIn('test-post', self.get(url))
+        self.assertIn(
+            'test-post', self.get(reverse('profile', args=['author'])))
+
+        self.replicate()
+        self.assertIn('changed', self.get(url))
+
+    def test_async_views_read_from_replica(self):
+        messages = call(application, http_scope(
+            reverse('post', args=['author', self.post.pk])))
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn(b'test-post', body)
+
+    def test_lagging_replica_is_skipped(self):
+        url = reverse('post', args=['author', self.post.pk])
+        with self.settings(REPLICA_MAX_LAG=0):
+            self.assertIn('changed', self.get(url))
+
+    def test_changed_page_is_read_from_primary(self):
+        Comment.objects.create(
+            post=self.post, author=self.user, text='test-comment')
+        page = self.get(reverse('post', args=['author', self.post.pk]))
+        self.assertIn('test-comment', page)
+        self.assertIn('changed', page)
+
+    def test_read_your_writes(self):
+        client = Client()
+        client.force_login(self.user)
+        self.replicate()
+        response = client.get(reverse('profile_follow', args=['author']))
+        self.assertIn(replicas.WRITE_COOKIE, response.cookies)
+
+        # Подписка уже видна автору запроса, но ещё не видна на реплике
+        self.assertIn('changed', self.get(reverse('follow_index'), client))
+        del client.cookies[replicas.WRITE_COOKIE]
+        self.assertNotIn('changed', self.get(reverse('follow_index'), client))
@@ -0,0 +1,115 @@
+import os
+import re
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+from ..template_profiler import Profile
+
+
+User = get_user_model()
+PROFILE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(TEMPLATE_PROFILING=True, TEMPLATE_PROFILE_DIR=PROFILE_DIR)
+class TemplateProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        group = Group.objects.create(title='test-group', slug='test-slug')
+        cls.post = Post.objects.create(
+            text='test-post', author=cls.user, group=group)
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='test-comment')
+        cls.url = reverse('post', kwargs={
+            'username': 'test-user', 'post_id': cls.post.pk})
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+
+    def dumps(self):
+        if not os.path.isdir(PROFILE_DIR):
+            return []
+        return os.listdir(PROFILE_DIR)
+
+    def test_panel_and_folded_stacks(self):
+        response = self.client.get(self.url, {'profile_templates': ''})
+        content = response.content.decode()
+        self.assertIn('id="template-profile"', content)
+        for frame in ('template:posts/post.html',
+                      'include:includes/post_item.html',
+                      'include:includes/comments.html',
+                      'include:includes/post_picture.html',
+                      'tag:post_picture', 'cache:post_card',
+                      'url:profile', 'filter:linebreaksbr',
+                      'block:content'):
+            self.assertIn(f'<code>{frame}</code>', content)
+        # Таблица — перед концом страницы
+        self.assertLess(
+            content.index('id="template-profile"'), content.index('</body>'))
+
+        dump, = self.dumps()
+        self.assertIn('post', dump)
+        with open(os.path.join(PROFILE_DIR, dump)) as stream:
+            lines = stream.read().splitlines()
+        for line in lines:
+            self.assertRegex(line, r'^template:posts/post\.html(;\S+)* \d+$')
+        self.assertTrue(any(
+            re.search(r';include:includes/comments\.html;'
+                      r'url:profile \d+$', line) for line in lines))
+
+    def test_other_requests_are_not_profiled(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('template-profile', response.content.decode())
+        response = self.client.get(
+            self.url, {'profile_templates': ''}, REMOTE_ADDR='203.0.113.5')
+        self.assertNotIn('template-profile', response.content.decode())
+        self.assertEqual(self.dumps(), [])
+
+    @override_settings(TEMPLATE_PROFILING=False)
+    def test_disabled(self):
+        response = self.client.get(self.url, {'profile_templates': ''})
+        self.assertNotIn('template-profile', response.content.decode())
+        self.assertEqual(self.dumps(), [])
+
+
+class ProfileTests(SimpleTestCase):
+    def test_nested_frames(self):
+        profile = Profile()
+        clock = iter(range(100))
+        queries = iter([0, 0, 1, 3, 3, 3])
+        with mock.patch('time.perf_counter', lambda: next(clock)), \
+                mock.patch('yatube.template_profiler._queries',
+                           lambda: next(queries)):
+            with profile.frame('template:page.html'):
+                with profile.frame('include:item.html'):
+                    with profile.frame('include:item.html'):
+                        pass
+        nodes = {node['name']: node for node in profile.nodes()}
+        page, item = nodes['template:page.html'], nodes['include:item.html']
+        self.assertEqual((page['calls'], page['total'], page['own']),
+                         (1, 5, 2))
+        # Вложенный такой же кадр входит во внешний
+        self.assertEqual((item['calls'], item['total'], item['own']),
+                         (2, 3, 3))
+        self.assertEqual((page['queries'], item['queries']), (3, 3))
+        self.assertEqual(profile.folded().splitlines(), [
+            'template:page.html;include:item.html;include:item.html '
+            '1000000',
+            'template:page.html;include:item.html 2000000',
+            'template:page.html 2000000',
+        ])